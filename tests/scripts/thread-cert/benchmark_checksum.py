@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+
+""" Benchmark of the IPv6 checksum calculation.
+
+Compares ipv6.calculate_checksum() with the list based implementation the
+ipv6 module used before, for payload sizes up to the IPv6 minimum MTU.
+Prints the number of checksums calculated per second.
+
+Usage:
+    python benchmark_checksum.py [iterations]
+"""
+
+import random
+import sys
+import time
+
+try:
+    from itertools import izip_longest as zip_longest
+except ImportError:
+    from itertools import zip_longest
+
+import ipv6
+
+
+def reference_calculate_checksum(data):
+    """ Reference implementation folding a list of halfwords. """
+    halfwords = [
+        ((byte0 << 8) | byte1)
+        for byte0, byte1 in zip_longest(data[::2], data[1::2], fillvalue=0x00)
+    ]
+
+    checksum = 0
+    for halfword in halfwords:
+        checksum += halfword
+        checksum = (checksum & 0xffff) + (checksum >> 16)
+
+    checksum ^= 0xffff
+
+    if checksum == 0:
+        return 0xffff
+    else:
+        return checksum
+
+
+def run(calculate_checksum, data, iterations):
+    start = time.time()
+    for _ in range(iterations):
+        calculate_checksum(data)
+    return time.time() - start
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    rand = random.Random(0)
+
+    print('%6s %20s %20s' % ('bytes', 'calculate [1/s]', 'reference [1/s]'))
+    for size in (48, 127, 512, 1280):
+        data = bytearray(rand.getrandbits(8) for _ in range(size))
+        assert ipv6.calculate_checksum(data) == reference_calculate_checksum(data)
+
+        results = []
+        for calculate_checksum in (ipv6.calculate_checksum, reference_calculate_checksum):
+            elapsed = run(calculate_checksum, data, iterations)
+            results.append(iterations / max(elapsed, 1e-9))
+        print('%6d %20d %20d' % (size, results[0], results[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+
+""" Benchmark of the VirtualTime event queue.
+
+Replays the event pattern produced by a mesh of simulated nodes: every node
+keeps re-arming its alarm and every radio frame is fanned out to all other
+nodes. Prints the number of events processed per second for the heap based
+EventQueue and for the sorted list the simulator used before.
+
+Usage:
+    python benchmark_simulator.py [rounds]
+"""
+
+import bisect
+import random
+import sys
+import time
+
+import simulator
+
+
+class SortedListEventQueue(object):
+    """ Reference implementation using a bisect-sorted list. """
+
+    def __init__(self):
+        self._events = []
+        self._sequence = 0
+
+    def push(self, event_time, *fields):
+        event = (event_time, self._sequence) + fields
+        self._sequence += 1
+        bisect.insort(self._events, event)
+        return event
+
+    def cancel(self, event):
+        self._events.remove(event)
+
+    def pop(self):
+        return self._events.pop(0)
+
+    def peek(self):
+        return self._events[0] if self._events else None
+
+
+def run(queue, nodes, rounds, seed=0):
+    rand = random.Random(seed)
+    schedule = [
+        (
+            [rand.randint(1, 100000) for _ in range(nodes)],
+            rand.randrange(nodes),
+            rand.randint(1, 1000),
+        )
+        for _ in range(rounds)
+    ]
+    alarms = [None] * nodes
+    now = 0
+    events = 0
+
+    start = time.time()
+    for alarm_delays, sender, frame_delay in schedule:
+        # Every node re-arms its alarm.
+        for node in range(nodes):
+            if alarms[node] is not None:
+                queue.cancel(alarms[node])
+            alarms[node] = queue.push(now + alarm_delays[node], node, 0)
+
+        # One node transmits a frame which is received by all other nodes.
+        now += frame_delay
+        for node in range(nodes):
+            if node != sender:
+                queue.push(now, node, 1)
+        queue.push(now, sender, 1)
+
+        # Deliver everything scheduled up to the frame.
+        event = queue.peek()
+        while event is not None and event[0] <= now:
+            queue.pop()
+            if event[3] == 0:
+                alarms[event[2]] = None
+            events += 1
+            event = queue.peek()
+
+    return events, time.time() - start
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    print('%6s %20s %20s' % ('nodes', 'EventQueue [ev/s]', 'sorted list [ev/s]'))
+    for nodes in (2, 16, 32, 128):
+        results = []
+        for queue_class in (simulator.EventQueue, SortedListEventQueue):
+            events, elapsed = run(queue_class(), nodes, rounds)
+            results.append(events / max(elapsed, 1e-9))
+        print('%6d %20d %20d' % (nodes, results[0], results[1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -28,12 +28,20 @@
 #
 
 import collections
-import io
 import struct
 
 from binascii import hexlify
 from enum import IntEnum
 
+import common
+
+# Seconds a binding is kept after the last message of its exchange
+# (RFC 7252, section 4.8.2)
+COAP_EXCHANGE_LIFETIME = 247
+
+# Maximum number of message id to URI path bindings
+COAP_MAX_BINDINGS = 4096
+
 
 class CoapMessageType(IntEnum):
     CON = 0  # Confirmable
@@ -133,7 +141,7 @@ class CoapOptionsFactory(object):
         options = []
 
         _type = 0
-        while data.tell() < len(data.getvalue()):
+        while common.bytes_left(data) > 0:
             option_header = CoapOptionHeader.from_bytes(data)
             if option_header.is_payload_marker:
                 break
@@ -286,6 +294,12 @@ class CoapMessageProxy(object):
     The main idea behind this class is to delay parsing payload. Due to architecture of the existing solution
     it is possible to process confirmation message before a request message. In such case it is not possible
     to get URI path to get proper payload parser.
+
+    The decoded payload is cached together with the URI path it was decoded for and is parsed again only if
+    the binding of the message changes. `payload_cache_hits` counts accesses served from the cache.
+
+    The binding known when the message is created is remembered, so the payload can still be decoded after
+    the binder expired it.
     """
 
     def __init__(
@@ -294,6 +308,7 @@ class CoapMessageProxy(object):
         message_info,
         mid_to_uri_path_binder,
         uri_path_based_payload_factories,
+        scope=None,
     ):
         self._coap_message = coap_message
         self._message_info = message_info
@@ -301,6 +316,14 @@ class CoapMessageProxy(object):
         self._uri_path_based_payload_factories = (
             uri_path_based_payload_factories
         )
+        self._scope = scope
+
+        self._binded_uri_path = None
+        self._get_binded_uri_path()
+
+        self._payload_uri_path = None
+        self._payload = None
+        self.payload_cache_hits = 0
 
     @property
     def version(self):
@@ -330,22 +353,41 @@ class CoapMessageProxy(object):
     def options(self):
         return self._coap_message.options
 
-    @property
-    def payload(self):
+    def _get_binded_uri_path(self):
         try:
-            binded_uri_path = self._mid_to_uri_path_binder.get_uri_path_for(
-                self.message_id, self.token
+            self._binded_uri_path = self._mid_to_uri_path_binder.get_uri_path_for(
+                self.message_id, self.token, self._scope
             )
+        except RuntimeError:
+            pass
+
+        return self._binded_uri_path
 
+    @property
+    def payload(self):
+        binded_uri_path = self._get_binded_uri_path()
+        if binded_uri_path is None:
+            return self._coap_message.payload
+
+        if self._payload_uri_path == binded_uri_path:
+            self.payload_cache_hits += 1
+            return self._payload
+
+        try:
             factory = self._uri_path_based_payload_factories[binded_uri_path]
 
-            return factory.parse(
-                io.BytesIO(self._coap_message.payload), self._message_info
+            payload = factory.parse(
+                common.BufferReader(self._coap_message.payload),
+                self._message_info,
             )
 
         except RuntimeError:
             return self._coap_message.payload
 
+        self._payload_uri_path = binded_uri_path
+        self._payload = payload
+        return payload
+
     @property
     def uri_path(self):
         return self._coap_message.uri_path
@@ -360,22 +402,73 @@ class CoapMessageProxy(object):
 
 class CoapMessageIdToUriPathBinder:
 
-    """ Class binds message id and token with URI path. """
+    """ Class binds message id and token with URI path.
 
-    def __init__(self):
-        self._uri_path_binds = collections.defaultdict(collections.defaultdict)
+    Bindings are scoped, message ids and tokens are only unique per client endpoint, so the factory uses the
+    client address as the scope. A binding expires `exchange_lifetime` seconds (capture time) after it was
+    last added, and the oldest bindings are evicted when there are more than `max_size` of them.
+    """
 
-    def add_uri_path_for(self, message_id, token, uri_path):
-        self._uri_path_binds[message_id][hexlify(token)] = uri_path
+    def __init__(
+        self,
+        exchange_lifetime=COAP_EXCHANGE_LIFETIME,
+        max_size=COAP_MAX_BINDINGS,
+    ):
+        self._uri_path_binds = collections.OrderedDict()
+        self._exchange_lifetime = exchange_lifetime
+        self._max_size = max_size
+
+        self._evictions = 0
+        self._expirations = 0
+        self._misses = 0
+
+    def _remove_expired_binds(self, timestamp):
+        deadline = timestamp - self._exchange_lifetime
+
+        while self._uri_path_binds:
+            key, (_, bind_timestamp) = next(iter(self._uri_path_binds.items()))
+            if bind_timestamp is None or bind_timestamp > deadline:
+                break
+
+            del self._uri_path_binds[key]
+            self._expirations += 1
+
+    def add_uri_path_for(
+        self, message_id, token, uri_path, scope=None, timestamp=None
+    ):
+        if timestamp is not None and self._exchange_lifetime is not None:
+            self._remove_expired_binds(timestamp)
+
+        key = (scope, message_id, bytes(token))
+
+        # Re-adding a binding makes it the most recent one
+        self._uri_path_binds.pop(key, None)
+        self._uri_path_binds[key] = (uri_path, timestamp)
+
+        while len(self._uri_path_binds) > self._max_size:
+            self._uri_path_binds.popitem(last=False)
+            self._evictions += 1
 
-    def get_uri_path_for(self, message_id, token):
+    def get_uri_path_for(self, message_id, token, scope=None):
         try:
-            return self._uri_path_binds[message_id][hexlify(token)]
+            return self._uri_path_binds[(scope, message_id, bytes(token))][0]
         except KeyError:
+            self._misses += 1
             raise RuntimeError(
                 "Could not find URI PATH for message_id: {} and token: {}".format(
                     message_id, hexlify(token)))
 
+    def stats(self):
+        return {
+            "size": len(self._uri_path_binds),
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "misses": self._misses,
+        }
+
+    def __len__(self):
+        return len(self._uri_path_binds)
+
 
 class CoapMessageFactory(object):
 
@@ -414,6 +507,21 @@ class CoapMessageFactory(object):
 
         return version, _type, token_length
 
+    def _client_address(self, code, message_info):
+        if message_info is None or message_info.source_ipv6 is None:
+            return None
+
+        # Requests are sent by the client, responses and empty messages by the server
+        if code._class == 0 and code.detail != 0:
+            client_address = message_info.source_ipv6
+        else:
+            client_address = message_info.destination_ipv6
+
+        if client_address is None:
+            return None
+
+        return client_address.packed
+
     def parse(self, data, message_info):
         version, _type, token_length = self._parse_initial_byte(
             data, message_info
@@ -425,10 +533,13 @@ class CoapMessageFactory(object):
 
         options = self._options_factory.parse(data, message_info)
 
+        scope = self._client_address(code, message_info)
+        timestamp = message_info.timestamp if message_info is not None else None
+
         uri_path = self._uri_path_from(options)
         if uri_path is not None:
             self._mid_to_uri_path_binder.add_uri_path_for(
-                message_id, token, uri_path
+                message_id, token, uri_path, scope, timestamp
             )
 
         coap_message = CoapMessage(
@@ -447,4 +558,5 @@ class CoapMessageFactory(object):
             message_info,
             self._mid_to_uri_path_binder,
             self._uri_path_based_payload_factories,
+            scope,
         )
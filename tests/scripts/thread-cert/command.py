@@ -39,6 +39,7 @@ import mesh_cop
 import mle
 
 from enum import IntEnum
+from tlvs_parsing import Tlvs
 
 
 class CheckType(IntEnum):
@@ -527,16 +528,14 @@ def check_router_id_cached(node, router_id, cached=True):
 def contains_tlv(sub_tlvs, tlv_type):
     """Verify if a specific type of tlv is included in a sub-tlv list.
     """
-    return any(isinstance(sub_tlv, tlv_type) for sub_tlv in sub_tlvs)
+    return Tlvs.wrap(sub_tlvs).contains(tlv_type)
 
 
 def contains_tlvs(sub_tlvs, tlv_types):
     """Verify if all types of tlv in a list are included in a sub-tlv list.
     """
-    return all(
-        (any(isinstance(sub_tlv, tlv_type) for sub_tlv in sub_tlvs))
-        for tlv_type in tlv_types
-    )
+    sub_tlvs = Tlvs.wrap(sub_tlvs)
+    return all(sub_tlvs.contains(tlv_type) for tlv_type in tlv_types)
 
 
 def check_secure_mle_key_id_mode(command_msg, key_id_mode):
@@ -634,9 +633,7 @@ def _check_address_registration(command_msg, CIDs=[]):
 
 
 def get_sub_tlv(tlvs, tlv_type):
-    for sub_tlv in tlvs:
-        if isinstance(sub_tlv, tlv_type):
-            return sub_tlv
+    return Tlvs.wrap(tlvs).get(tlv_type)
 
 
 def check_address_registration_tlv(addr_reg_tlv, address_set):
@@ -650,7 +647,7 @@ def check_address_registration_tlv(addr_reg_tlv, address_set):
 def assert_contains_tlv(tlvs, check_type, tlv_type):
     """Assert a tlv list contains specific tlv and return the first qualified.
     """
-    tlvs = [tlv for tlv in tlvs if isinstance(tlv, tlv_type)]
+    tlvs = Tlvs.wrap(tlvs).get_all(tlv_type)
     if check_type is CheckType.CONTAIN:
         assert tlvs
         return tlvs[0]
@@ -832,11 +829,9 @@ class NetworkDataCheck:
 
     def check(self, network_data_tlv):
         if self._prefixes_check is not None:
-            prefix_tlvs = [
-                tlv
-                for tlv in network_data_tlv.tlvs
-                if isinstance(tlv, network_data.Prefix)
-            ]
+            prefix_tlvs = Tlvs.wrap(network_data_tlv.tlvs).get_all(
+                network_data.Prefix
+            )
             self._prefixes_check.check(prefix_tlvs)
         if self._commissioning_data_check is not None:
             commissioning_data_tlv = assert_contains_tlv(
@@ -27,6 +27,7 @@
 #  POSSIBILITY OF SUCH DAMAGE.
 #
 
+import io
 import struct
 import sys
 
@@ -55,6 +56,7 @@ class MessageInfo(object):
 
         self.source_mac_address = None
         self.destination_mac_address = None
+        self.pan_id = None
 
         self._source_ipv6 = None
         self._destination_ipv6 = None
@@ -65,6 +67,9 @@ class MessageInfo(object):
         self.stable = None
         self.payload_length = 0
 
+        # Capture time of the frame in seconds
+        self.timestamp = None
+
     def _convert_value_to_ip_address(self, value):
         if isinstance(value, bytearray):
             value = bytes(value)
@@ -184,3 +189,121 @@ class MacAddress(object):
         return "MacAddress(mac_address=b'{}', type={})".format(
             hexlify(self.mac_address), MacAddressType(self._type)
         )
+
+
+class BufferReader(object):
+    """ Read-only stream over a window of a shared buffer.
+
+    The reader keeps a memoryview of the underlying data and an offset
+    cursor, so nested parsers (6LoWPAN -> IPv6 -> MLE -> TLVs) can hand out
+    sub-streams for headers and TLV values without copying the bytes they
+    cover. It implements the subset of the io.BytesIO API the factories use
+    (read, seek, tell, getvalue), so a BufferReader can be passed wherever a
+    BytesIO was expected.
+    """
+
+    def __init__(self, data, start=0, end=None):
+        if not isinstance(data, memoryview):
+            data = memoryview(data)
+
+        if end is None:
+            end = len(data)
+
+        self._view = data
+        self._start = start
+        self._end = end
+        self._position = start
+
+    def __len__(self):
+        return self._end - self._start
+
+    def remaining(self):
+        return self._end - self._position
+
+    def tell(self):
+        return self._position - self._start
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = self._start + offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._end + offset
+        else:
+            raise ValueError("Invalid whence value: {}".format(whence))
+
+        if position < self._start:
+            raise ValueError("Negative seek position: {}".format(position - self._start))
+
+        self._position = position
+        return self.tell()
+
+    def _slice_end(self, n):
+        if n is None or n < 0:
+            return self._end
+        return min(self._position + n, self._end)
+
+    def read(self, n=-1):
+        end = self._slice_end(n)
+        chunk = self._view[self._position:end].tobytes()
+        self._position = max(self._position, end)
+        return chunk
+
+    def read_view(self, n=-1):
+        """ Like read() but returns a memoryview instead of a bytes copy. """
+        end = self._slice_end(n)
+        chunk = self._view[self._position:end]
+        self._position = max(self._position, end)
+        return chunk
+
+    def read_stream(self, n=-1):
+        """ Return a BufferReader over the next n bytes and skip them. """
+        end = self._slice_end(n)
+        start = min(self._position, end)
+        self._position = max(self._position, end)
+        return BufferReader(self._view, start, end)
+
+    def peek(self, n=-1):
+        return self._view[self._position:self._slice_end(n)].tobytes()
+
+    def peek_byte(self):
+        if self._position >= self._end:
+            raise ValueError("Could not peek byte. End of buffer reached.")
+        return struct.unpack_from(">B", self._view, self._position)[0]
+
+    def getvalue(self):
+        return self._view[self._start:self._end].tobytes()
+
+    def getbuffer(self):
+        return self._view[self._start:self._end]
+
+
+def bytes_left(data):
+    """ Number of unread bytes in a BufferReader or io.BytesIO. """
+    if isinstance(data, BufferReader):
+        return data.remaining()
+
+    return len(data.getvalue()) - data.tell()
+
+
+def read_stream(data, length=-1):
+    """ Read length bytes from data as a stream for a nested parser.
+
+    A BufferReader shares its buffer with the returned sub-stream, any other
+    stream is read and wrapped.
+    """
+    if isinstance(data, BufferReader):
+        return data.read_stream(length)
+
+    return BufferReader(data.read(length))
+
+
+def peek_byte(data):
+    """ Return the next byte of data as an int without consuming it. """
+    if isinstance(data, BufferReader):
+        return data.peek_byte()
+
+    value = data.read(1)
+    data.seek(-len(value), io.SEEK_CUR)
+    return ord(value)
@@ -100,6 +100,9 @@ AQ_TIMEOUT = 3
 ADDRESS_QUERY_INITIAL_RETRY_DELAY = 15
 DEFAULT_CHILD_TIMEOUT = 6
 VIRTUAL_TIME = int(os.getenv('VIRTUAL_TIME', 0))
+# Set to 1 to decode captured frames only when a test inspects them. By
+# default every frame is decoded as soon as it is captured.
+LAZY_MESSAGE_DECODING = int(os.getenv('LAZY_MESSAGE_DECODING', 0))
 
 LEADER_NOTIFY_SED_BY_CHILD_UPDATE_REQUEST = True
 
@@ -240,19 +243,21 @@ def create_default_mle_tlvs_factories():
     }
 
 
-def create_default_mle_crypto_engine(master_key):
+def create_default_mle_crypto_engine(master_key, keyring=None):
     return net_crypto.CryptoEngine(
-        crypto_material_creator=net_crypto.MleCryptoMaterialCreator(master_key)
+        crypto_material_creator=net_crypto.MleCryptoMaterialCreator(
+            master_key, keyring=keyring
+        )
     )
 
 
-def create_default_mle_message_factory(master_key):
+def create_default_mle_message_factory(master_key, keyring=None):
     return mle.MleMessageFactory(
         aux_sec_hdr_factory=net_crypto.AuxiliarySecurityHeaderFactory(),
         mle_command_factory=mle.MleCommandFactory(
             tlvs_factories=create_default_mle_tlvs_factories()
         ),
-        crypto_engine=create_default_mle_crypto_engine(master_key),
+        crypto_engine=create_default_mle_crypto_engine(master_key, keyring),
     )
 
 
@@ -364,8 +369,10 @@ def create_default_ipv6_hop_by_hop_options_factory():
     )
 
 
-def create_default_based_on_src_dst_ports_udp_payload_factory(master_key):
-    mle_message_factory = create_default_mle_message_factory(master_key)
+def create_default_based_on_src_dst_ports_udp_payload_factory(
+    master_key, keyring=None
+):
+    mle_message_factory = create_default_mle_message_factory(master_key, keyring)
     coap_message_factory = create_default_coap_message_factory()
     dtls_message_factory = create_default_dtls_message_factory()
 
@@ -391,12 +398,12 @@ def create_default_ipv6_icmp_body_factories():
     }
 
 
-def create_default_ipv6_upper_layer_factories(master_key):
+def create_default_ipv6_upper_layer_factories(master_key, keyring=None):
     return {
         ipv6.IPV6_NEXT_HEADER_UDP: ipv6.UDPDatagramFactory(
             udp_header_factory=ipv6.UDPHeaderFactory(),
             udp_payload_factory=create_default_based_on_src_dst_ports_udp_payload_factory(
-                master_key
+                master_key, keyring
             ),
         ),
         ipv6.IPV6_NEXT_HEADER_ICMP: ipv6.ICMPv6Factory(
@@ -415,10 +422,10 @@ def create_default_ipv6_extension_headers_factories():
         hop_by_hop_options_factory=create_default_ipv6_hop_by_hop_options_factory())}
 
 
-def create_default_ipv6_packet_factory(master_key):
+def create_default_ipv6_packet_factory(master_key, keyring=None):
     return ipv6.IPv6PacketFactory(
         ehf=create_default_ipv6_extension_headers_factories(),
-        ulpf=create_default_ipv6_upper_layer_factories(master_key),
+        ulpf=create_default_ipv6_upper_layer_factories(master_key, keyring),
     )
 
 
@@ -442,21 +449,37 @@ def create_default_thread_context_manager():
 
 
 def create_default_lowpan_parser(
-    context_manager, master_key=DEFAULT_MASTER_KEY
+    context_manager, master_key=DEFAULT_MASTER_KEY, keyring=None
 ):
     return lowpan.LowpanParser(
         lowpan_mesh_header_factory=lowpan.LowpanMeshHeaderFactory(),
         lowpan_decompressor=create_default_lowpan_decompressor(context_manager),
         lowpan_fragements_buffers_manager=lowpan.LowpanFragmentsBuffersManager(),
-        ipv6_packet_factory=create_default_ipv6_packet_factory(master_key),
+        ipv6_packet_factory=create_default_ipv6_packet_factory(
+            master_key, keyring
+        ),
     )
 
 
-def create_default_thread_message_factory(master_key=DEFAULT_MASTER_KEY):
+def create_default_keyring(master_key=DEFAULT_MASTER_KEY):
+    keyring = net_crypto.KeyRing()
+    keyring.add_master_key(master_key)
+
+    return keyring
+
+
+def create_default_thread_message_factory(
+    master_key=DEFAULT_MASTER_KEY, keyring=None
+):
+    if keyring is None:
+        keyring = create_default_keyring(master_key)
+
     context_manager = create_default_thread_context_manager()
-    lowpan_parser = create_default_lowpan_parser(context_manager, master_key)
+    lowpan_parser = create_default_lowpan_parser(
+        context_manager, master_key, keyring
+    )
 
-    return message.MessageFactory(lowpan_parser=lowpan_parser)
+    return message.MessageFactory(lowpan_parser=lowpan_parser, keyring=keyring)
 
 
 def create_default_thread_sniffer():
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+
+""" Offline decoding of .pcap and .pcapng captures.
+
+Streams a capture frame by frame through the thread-cert decoder, so
+captures of any size are decoded in constant memory. When run as a script,
+prints the number of messages of each type and the decoding throughput.
+
+Usage:
+    python decode_pcap.py [-c CHANNEL] [-k MASTER_KEY[:PANID]] capture.pcap
+"""
+
+import argparse
+import binascii
+import collections
+import io
+import logging
+import struct
+import time
+
+import config
+import message
+import net_crypto
+import pcap
+
+# Channel reported for frames whose capture does not record it, e.g. .pcap
+# files
+DEFAULT_CHANNEL = 11
+
+logger = logging.getLogger("decode_pcap")
+
+
+def read_messages(filename, message_factory=None, channel=DEFAULT_CHANNEL, stats=None):
+    """ Decode messages of a capture.
+
+    Args:
+        filename (str): path of the .pcap or .pcapng file.
+        message_factory (MessageFactory): factory decoding the frames. The
+            default thread message factory if None.
+        channel (int): channel reported for frames whose capture does not
+            record one. A channel recorded in the capture is always used.
+        stats (collections.Counter): updated with the number of 'frames',
+            'bytes' and decoding 'errors'.
+
+    Yields:
+        message.Message: decoded messages in capture order.
+    """
+    if message_factory is None:
+        message_factory = config.create_default_thread_message_factory()
+
+    if stats is None:
+        stats = collections.Counter()
+
+    default_channel_byte = struct.pack(">B", channel)
+
+    with pcap.PcapReader(filename) as reader:
+        for frame, timestamp, frame_channel in reader.iter_with_channel():
+            stats['frames'] += 1
+            stats['bytes'] += len(frame)
+
+            if frame_channel is None:
+                channel_byte = default_channel_byte
+            else:
+                channel_byte = struct.pack(">B", frame_channel)
+
+            try:
+                messages = message_factory.create(
+                    io.BytesIO(channel_byte + frame), timestamp
+                )
+            except Exception as e:
+                stats['errors'] += 1
+                logger.debug("Frame {} at {}.{:06d}: {}".format(
+                    stats['frames'], timestamp[0], timestamp[1], e))
+                continue
+
+            for msg in messages:
+                yield msg
+
+
+def _parse_master_key(value):
+    """ Parse MASTER_KEY[:PANID] command line arguments. """
+    master_key, _, pan_id = value.partition(':')
+    master_key = bytearray(binascii.unhexlify(master_key))
+    pan_id = int(pan_id, 16) if pan_id else None
+    return master_key, pan_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('filename', help='.pcap or .pcapng file to decode')
+    parser.add_argument('-c', '--channel', type=int, default=DEFAULT_CHANNEL,
+                        help='channel of frames whose capture does not record it')
+    parser.add_argument('-k', '--master-key', type=_parse_master_key, action='append',
+                        default=[], metavar='MASTER_KEY[:PANID]',
+                        help='hex master key, optionally only for the given hex PAN ID. '
+                        'The default master key is used if not given.')
+    args = parser.parse_args()
+
+    keyring = net_crypto.KeyRing()
+    for master_key, pan_id in args.master_key or [(config.DEFAULT_MASTER_KEY, None)]:
+        keyring.add_master_key(master_key, pan_id)
+
+    message_factory = config.create_default_thread_message_factory(keyring=keyring)
+
+    stats = collections.Counter()
+    counts = collections.Counter()
+
+    start = time.time()
+    for msg in read_messages(args.filename, message_factory, args.channel, stats):
+        counts[msg.type] += 1
+    elapsed = max(time.time() - start, 1e-9)
+
+    for message_type in message.MessageType:
+        print("{:<10} {:>10}".format(message_type.name, counts[message_type]))
+    print("{:<10} {:>10}".format('errors', stats['errors']))
+    print("")
+    print("{} frames, {} messages in {:.3f} s".format(
+        stats['frames'], sum(counts.values()), elapsed))
+    print("{:.0f} frames/s, {:.3f} MB/s".format(
+        stats['frames'] / elapsed, stats['bytes'] / elapsed / 1e6))
+
+
+if __name__ == '__main__':
+    main()
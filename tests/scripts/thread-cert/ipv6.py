@@ -28,17 +28,14 @@
 #
 
 import abc
-import io
+import array
 import struct
 import sys
 
 from binascii import hexlify
 from ipaddress import ip_address
 
-try:
-    from itertools import izip_longest as zip_longest
-except ImportError:
-    from itertools import zip_longest
+import common
 
 
 # Next headers for IPv6 protocols
@@ -64,6 +61,57 @@ ICMP_ECHO_RESPONSE = 129
 HOP_LIMIT_DEFAULT = 64
 
 
+def _ones_complement_sum_from_bytes(data):
+    # A big-endian number is congruent to the sum of its 16-bit words modulo
+    # 0xffff, so a single pass in C gives the folded one's complement sum.
+    # 0xffff and 0 are both returned as 0, which calculate_checksum() maps to
+    # the same checksum.
+    return int.from_bytes(data, 'big') % 0xffff
+
+
+def _ones_complement_sum_from_array(data):
+    halfwords = array.array('H', data)
+    if sys.byteorder == 'little':
+        halfwords.byteswap()
+
+    checksum = sum(halfwords)
+    while checksum >> 16:
+        checksum = (checksum & 0xffff) + (checksum >> 16)
+
+    return checksum
+
+
+if hasattr(int, 'from_bytes'):
+    _ones_complement_sum = _ones_complement_sum_from_bytes
+else:
+    _ones_complement_sum = _ones_complement_sum_from_array
+
+
+def ones_complement_sum(data):
+    """ Calculate the folded 16-bit one's complement sum of data bytes.
+
+    Args:
+        data (bytes): input data, padded with a zero byte if of odd length.
+
+    Returns:
+        int: sum, where 0 and 0xffff are equivalent.
+    """
+    if len(data) % 2:
+        data = bytes(data) + b'\x00'
+
+    return _ones_complement_sum(bytes(data))
+
+
+def checksum_from_sum(checksum_sum):
+    """ Return the checksum for the given one's complement sum. """
+    checksum = checksum_sum ^ 0xffff
+
+    if checksum == 0:
+        return 0xffff
+    else:
+        return checksum
+
+
 def calculate_checksum(data):
     """ Calculate checksum from data bytes.
 
@@ -76,24 +124,35 @@ def calculate_checksum(data):
     Returns:
         int: calculated checksum
     """
-    # Create halfwords from data bytes. Example: data[0] = 0x01, data[1] =
-    # 0xb2 => 0x01b2
-    halfwords = [
-        ((byte0 << 8) | byte1)
-        for byte0, byte1 in zip_longest(data[::2], data[1::2], fillvalue=0x00)
-    ]
-
-    checksum = 0
-    for halfword in halfwords:
-        checksum += halfword
-        checksum = (checksum & 0xffff) + (checksum >> 16)
+    return checksum_from_sum(ones_complement_sum(data))
 
-    checksum ^= 0xffff
 
-    if checksum == 0:
-        return 0xffff
-    else:
-        return checksum
+def update_checksum(checksum, old_data, new_data):
+    """ Update checksum after a part of the data changed.
+
+    How to update checksum incrementally (RFC 1624, eqn. 3):
+        https://tools.ietf.org/html/rfc1624#section-3
+
+    Args:
+        checksum (int): checksum of the data before the change.
+        old_data (bytes): replaced bytes, starting at an even offset.
+        new_data (bytes): new bytes, of the same length as old_data.
+
+    Returns:
+        int: checksum of the changed data.
+    """
+    if len(old_data) != len(new_data):
+        raise ValueError("Replaced and new data lengths differ")
+
+    checksum_sum = (
+        (checksum ^ 0xffff)
+        + (ones_complement_sum(old_data) ^ 0xffff)
+        + ones_complement_sum(new_data)
+    )
+    checksum_sum = (checksum_sum & 0xffff) + (checksum_sum >> 16)
+    checksum_sum = (checksum_sum & 0xffff) + (checksum_sum >> 16)
+
+    return checksum_from_sum(checksum_sum)
 
 
 class PacketFactory(object):
@@ -410,8 +469,18 @@ class IPv6Packet(ConvertibleToBytes):
     """
 
     def __init__(
-        self, ipv6_header, upper_layer_protocol, extension_headers=None
+        self,
+        ipv6_header,
+        upper_layer_protocol,
+        extension_headers=None,
+        upper_layer_protocol_bytes=None,
     ):
+        """
+        Args:
+            upper_layer_protocol_bytes (bytes): bytes the upper layer protocol
+                was parsed from. If given, the checksum is calculated and
+                verified from them instead of serializing the packet again.
+        """
         self.ipv6_header = ipv6_header
 
         self.upper_layer_protocol = upper_layer_protocol
@@ -422,21 +491,61 @@ class IPv6Packet(ConvertibleToBytes):
 
         self._update_next_header_values_in_headers()
 
-        if not upper_layer_protocol.is_valid_checksum():
+        self._received_checksum_valid = None
+
+        if upper_layer_protocol_bytes is not None:
+            # The received checksum field is part of the sum: a valid
+            # checksum makes it 0xffff, an elided one (zero) makes it the
+            # sum of everything else.
+            checksum_sum = self._pseudo_header_sum(
+                len(upper_layer_protocol_bytes)
+            ) + ones_complement_sum(upper_layer_protocol_bytes)
+            checksum_sum = (checksum_sum & 0xffff) + (checksum_sum >> 16)
+
+            if not upper_layer_protocol.is_valid_checksum():
+                self.upper_layer_protocol.checksum = checksum_from_sum(
+                    checksum_sum
+                )
+                self._received_checksum_valid = True
+            else:
+                self._received_checksum_valid = checksum_sum in (0, 0xffff)
+
+        elif not upper_layer_protocol.is_valid_checksum():
             self.upper_layer_protocol.checksum = self.calculate_checksum()
 
-    def _validate_checksum(self):
-        checksum = self.calculate_checksum()
+    def verify_checksum(self):
+        """ Verify the checksum of the upper layer protocol.
+
+        Packets created by IPv6PacketFactory are verified against the
+        received bytes, other packets are serialized to calculate it.
 
-        if self.upper_layer_protocol.checksum != checksum:
+        Returns:
+            bool
+        """
+        if self._received_checksum_valid is not None:
+            return self._received_checksum_valid
+
+        return self.upper_layer_protocol.checksum == self.calculate_checksum()
+
+    def _validate_checksum(self):
+        if not self.verify_checksum():
             raise RuntimeError(
                 "Could not create IPv6 packet. "
                 "Invalid checksum: {}!={}".format(
-                    self.upper_layer_protocol.checksum, checksum
+                    self.upper_layer_protocol.checksum,
+                    self.calculate_checksum(),
                 )
             )
 
-        self.upper_layer_protocol.checksum = checksum
+    def _pseudo_header_sum(self, payload_length):
+        pseudo_header = IPv6PseudoHeader(
+            self.ipv6_header.source_address,
+            self.ipv6_header.destination_address,
+            payload_length,
+            self.upper_layer_protocol.type,
+        )
+
+        return ones_complement_sum(pseudo_header.to_bytes())
 
     def _update_payload_length_value_in_ipv6_header(self):
         self.ipv6_header.payload_length = len(self.upper_layer_protocol) + sum(
@@ -464,16 +573,12 @@ class IPv6Packet(ConvertibleToBytes):
 
         self.upper_layer_protocol.checksum = saved_checksum
 
-        pseudo_header = IPv6PseudoHeader(
-            self.ipv6_header.source_address,
-            self.ipv6_header.destination_address,
-            len(upper_layer_protocol_bytes),
-            self.upper_layer_protocol.type,
-        )
+        checksum_sum = self._pseudo_header_sum(
+            len(upper_layer_protocol_bytes)
+        ) + ones_complement_sum(upper_layer_protocol_bytes)
+        checksum_sum = (checksum_sum & 0xffff) + (checksum_sum >> 16)
 
-        return calculate_checksum(
-            pseudo_header.to_bytes() + upper_layer_protocol_bytes
-        )
+        return checksum_from_sum(checksum_sum)
 
     def to_bytes(self):
         self._update_payload_length_value_in_ipv6_header()
@@ -1001,11 +1106,20 @@ class IPv6PacketFactory(PacketFactory):
             data, ipv6_header.next_header, message_info
         )
 
+        upper_layer_protocol_start = data.tell()
+        upper_layer_protocol_bytes = data.read()
+        data.seek(upper_layer_protocol_start)
+
         upper_layer_protocol = self._parse_upper_layer_protocol(
             data, next_header, message_info
         )
 
-        return IPv6Packet(ipv6_header, upper_layer_protocol, extension_headers)
+        return IPv6Packet(
+            ipv6_header,
+            upper_layer_protocol,
+            extension_headers,
+            upper_layer_protocol_bytes,
+        )
 
 
 class HopByHopOptionsFactory(object):
@@ -1030,7 +1144,7 @@ class HopByHopOptionsFactory(object):
     def parse(self, data, message_info):
         options = []
 
-        while data.tell() < len(data.getvalue()):
+        while common.bytes_left(data) > 0:
             option_header = HopByHopOptionHeader.from_bytes(data)
 
             if option_header.type == self._one_byte_padding:
@@ -1046,11 +1160,10 @@ class HopByHopOptionsFactory(object):
                     option_header.type
                 )
 
-                option_data = data.read(option_header.length)
+                option_data = common.read_stream(data, option_header.length)
 
                 option = HopByHopOption(
-                    option_header,
-                    factory.parse(io.BytesIO(option_data), message_info),
+                    option_header, factory.parse(option_data, message_info)
                 )
 
                 options.append(option)
@@ -1079,10 +1192,10 @@ class HopByHopFactory(PacketFactory):
             self._calculate_extension_header_length(hdr_ext_len) - 2
         )
 
-        hop_by_hop_data = data.read(hop_by_hop_length)
+        hop_by_hop_data = common.read_stream(data, hop_by_hop_length)
 
         options = self._hop_by_hop_options_factory.parse(
-            io.BytesIO(hop_by_hop_data), message_info
+            hop_by_hop_data, message_info
         )
 
         hop_by_hop = HopByHop(next_header, options, hdr_ext_len)
@@ -1152,9 +1265,7 @@ class UDPDatagramFactory(PacketFactory):
         header = self._udp_header_factory.parse(data, message_info)
 
         # Update message payload length: UDP header (8B) + payload length
-        message_info.payload_length += len(header) + (
-            len(data.getvalue()) - data.tell()
-        )
+        message_info.payload_length += len(header) + common.bytes_left(data)
 
         message_info.src_port = header.src_port
         message_info.dst_port = header.dst_port
@@ -1198,9 +1309,7 @@ class ICMPv6Factory(PacketFactory):
 
         factory = self._get_icmpv6_body_factory(header.type)
 
-        message_info.payload_length += len(header) + (
-            len(data.getvalue()) - data.tell()
-        )
+        message_info.payload_length += len(header) + common.bytes_left(data)
 
         return ICMPv6(header, factory.parse(data, message_info))
 
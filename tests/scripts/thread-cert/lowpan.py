@@ -27,14 +27,22 @@
 #  POSSIBILITY OF SUCH DAMAGE.
 #
 
-import io
+import bisect
+import collections
 import ipaddress
 import struct
 import sys
+import time
 
 import common
 import ipv6
 
+# Seconds after which an incomplete datagram is dropped (RFC 4944, section 5.3)
+LOWPAN_REASSEMBLY_TIMEOUT = 60
+
+# Maximum number of datagrams being reassembled at the same time
+LOWPAN_MAX_REASSEMBLIES = 64
+
 
 class LowpanIPHC:
     """
@@ -211,10 +219,10 @@ class LowpanHopByHopFactory:
     def parse(self, data, next_header, message_info):
         ext_header_length = ord(data.read(1))
 
-        ext_header_data = data.read(ext_header_length)
+        ext_header_data = common.read_stream(data, ext_header_length)
 
         options = self._hop_by_hop_options_factory.parse(
-            io.BytesIO(ext_header_data), message_info
+            ext_header_data, message_info
         )
 
         ext_header = ipv6.HopByHop(next_header, options)
@@ -862,11 +870,6 @@ class LowpanDecompressor:
     def _is_udp_header(self, header_first_byte):
         return ((header_first_byte >> 4) & 0x0F) == 0x0F
 
-    def _peek_n_bytes(self, data, n):
-        read_data = data.read(n)
-        data.seek(-n, io.SEEK_CUR)
-        return read_data
-
     def _is_next_header_compressed(self, header):
         return header.next_header is None
 
@@ -883,8 +886,8 @@ class LowpanDecompressor:
 
         if self._is_next_header_compressed(ipv6_header):
 
-            while data.tell() < len(data.getvalue()):
-                header_first_byte = ord(self._peek_n_bytes(data, 1))
+            while common.bytes_left(data) > 0:
+                header_first_byte = common.peek_byte(data)
 
                 if self._is_ipv6_extension_header(header_first_byte):
                     extension_header = self._lowpan_extension_headers_factory.parse(
@@ -1005,20 +1008,50 @@ class LowpanFragmentationHeader(object):
 
 
 class LowpanFragmentsBuffer(object):
+    """ Reassembly buffer of one fragmented datagram.
+
+    Received byte ranges are kept as a sorted list of disjoint [start, end)
+    intervals, so checking whether the datagram is complete does not depend
+    on its size.
+    """
+
     def __init__(self, buffer_size):
-        self._buffer = [None] * buffer_size
+        self._buffer = bytearray(buffer_size)
+        self._received = []
         self._position = 0
 
+    def _mark_received(self, start, end):
+        if start == end:
+            return
+
+        intervals = self._received
+        index = bisect.bisect_left(intervals, (start, start))
+
+        # Merge with the preceding interval if it touches the new one
+        if index > 0 and intervals[index - 1][1] >= start:
+            index -= 1
+            start = intervals[index][0]
+            end = max(end, intervals[index][1])
+
+        last = index
+        while last < len(intervals) and intervals[last][0] <= end:
+            end = max(end, intervals[last][1])
+            last += 1
+
+        intervals[index:last] = [(start, end)]
+
     def write(self, data):
-        if (self._position + len(data)) > len(self._buffer):
+        end = self._position + len(data)
+
+        if end > len(self._buffer):
             raise ValueError(
                 "Write failure. Data length is bigger than the destination buffer length."
             )
 
-        for i, byte in enumerate(data):
-            self._buffer[self._position + i] = byte
+        self._buffer[self._position:end] = data
+        self._mark_received(self._position, end)
 
-        self._position += len(data)
+        self._position = end
         return len(data)
 
     def seek(self, offset):
@@ -1033,33 +1066,73 @@ class LowpanFragmentsBuffer(object):
         return self._position
 
     def whole_packet_received(self):
-        return all([byte is not None for byte in self._buffer])
+        if not self._buffer:
+            return True
+
+        return self._received == [(0, len(self._buffer))]
 
     def read(self):
+        """ Return the reassembled datagram. The buffer is not copied. """
         if not self.whole_packet_received():
             raise ValueError(
                 "Only a part of the packet has been stored in the buffer."
             )
 
-        return bytearray(self._buffer)
+        return self._buffer
 
     def __len__(self):
         return len(self._buffer)
 
 
 class LowpanFragmentsBuffersManager(object):
-    def __init__(self):
-        self._fragments_buffers = {}
+    """ Keeps reassembly buffers of the datagrams being received.
+
+    Buffers are kept in least recently used order. A buffer which did not get
+    a fragment for `reassembly_timeout` seconds is dropped, and the least
+    recently used one is evicted when more than `max_reassemblies` datagrams
+    are in progress, so lost fragments do not keep buffers forever.
+
+    Time is taken from the capture timestamp of the frame (`MessageInfo.timestamp`)
+    so that offline decoding ages buffers like the capture did. `clock` is only
+    used for frames without a timestamp.
+    """
+
+    def __init__(
+        self,
+        reassembly_timeout=LOWPAN_REASSEMBLY_TIMEOUT,
+        max_reassemblies=LOWPAN_MAX_REASSEMBLIES,
+        clock=time.time,
+    ):
+        self._fragments_buffers = collections.OrderedDict()
+        self._reassembly_timeout = reassembly_timeout
+        self._max_reassemblies = max_reassemblies
+        self._clock = clock
+
+        self.timed_out = 0
+        self.evicted = 0
 
     def _create_key(self, message_info, datagram_tag):
-        key = (
-            bytes(message_info.source_mac_address.mac_address)
-            + bytes(message_info.destination_mac_address.mac_address)
-            + bytes(datagram_tag)
+        return (
+            bytes(message_info.source_mac_address.mac_address),
+            bytes(message_info.destination_mac_address.mac_address),
+            datagram_tag,
         )
-        return key
 
-    def _allocate_fragments_buffer(self, key, datagram_size):
+    def _remove_timed_out_buffers(self, now):
+        if self._reassembly_timeout is None:
+            return
+
+        deadline = now - self._reassembly_timeout
+
+        while self._fragments_buffers:
+            key, (_, last_update) = next(iter(self._fragments_buffers.items()))
+            if last_update > deadline:
+                break
+
+            del self._fragments_buffers[key]
+            self.timed_out += 1
+
+    def _allocate_fragments_buffer(self, key, datagram_size, now):
         if datagram_size is None or datagram_size < 0:
             raise ValueError(
                 "Could not allocate fragments buffer. Invalid datagram size: {}".format(
@@ -1069,23 +1142,39 @@ class LowpanFragmentsBuffersManager(object):
 
         fragments_buffer = LowpanFragmentsBuffer(datagram_size)
 
-        self._fragments_buffers[key] = fragments_buffer
+        self._fragments_buffers[key] = (fragments_buffer, now)
+
+        while len(self._fragments_buffers) > self._max_reassemblies:
+            self._fragments_buffers.popitem(last=False)
+            self.evicted += 1
+
         return fragments_buffer
 
     def get_fragments_buffer(
         self, message_info, datagram_tag, datagram_size=None
     ):
+        now = message_info.timestamp
+        if now is None:
+            now = self._clock()
+        self._remove_timed_out_buffers(now)
+
         key = self._create_key(message_info, datagram_tag)
 
-        if key not in self._fragments_buffers:
-            self._allocate_fragments_buffer(key, datagram_size)
+        entry = self._fragments_buffers.pop(key, None)
+        if entry is None:
+            return self._allocate_fragments_buffer(key, datagram_size, now)
 
-        return self._fragments_buffers[key]
+        fragments_buffer = entry[0]
+        self._fragments_buffers[key] = (fragments_buffer, now)
+        return fragments_buffer
 
     def free_fragments_buffer(self, message_info, datagram_tag):
         key = self._create_key(message_info, datagram_tag)
 
-        del self._fragments_buffers[key]
+        self._fragments_buffers.pop(key, None)
+
+    def __len__(self):
+        return len(self._fragments_buffers)
 
 
 class LowpanParser(object):
@@ -1103,11 +1192,6 @@ class LowpanParser(object):
         )
         self._ipv6_packet_factory = ipv6_packet_factory
 
-    def _peek_n_bytes(self, data, n):
-        data_bytes = data.read(n)
-        data.seek(-n, io.SEEK_CUR)
-        return data_bytes
-
     def _is_mesh_header(self, first_byte):
         return ((first_byte >> 6) & 0x03) == 0x02
 
@@ -1155,7 +1239,7 @@ class LowpanParser(object):
         fragments_buffer.write(uncompressed_data)
 
         if fragments_buffer.whole_packet_received():
-            data = io.BytesIO(fragments_buffer.read())
+            data = common.BufferReader(fragments_buffer.read())
 
             self._lowpan_fragments_buffers_manager.free_fragments_buffer(
                 message_info, fragmentation_header.datagram_tag
@@ -1180,7 +1264,7 @@ class LowpanParser(object):
         fragments_buffer.write(data.read())
 
         if fragments_buffer.whole_packet_received():
-            data = io.BytesIO(fragments_buffer.read())
+            data = common.BufferReader(fragments_buffer.read())
 
             self._lowpan_fragments_buffers_manager.free_fragments_buffer(
                 message_info, fragmentation_header.datagram_tag
@@ -1195,26 +1279,33 @@ class LowpanParser(object):
             data, message_info
         )
 
-        uncompressed_data = data.read()
+        uncompressed_data = common.read_stream(data).getbuffer()
 
-        decompressed_data = bytearray([])
+        # Collect the pieces first and copy them once, the IPv6 header goes
+        # in front when the payload length is known.
+        chunks = [None]
 
         for extension_header in extension_headers:
-            decompressed_data += extension_header.to_bytes()
+            chunks.append(extension_header.to_bytes())
 
         if udp_header is not None:
             udp_header.payload_length = len(uncompressed_data)
 
-            decompressed_data += udp_header.to_bytes()
+            chunks.append(udp_header.to_bytes())
+
+        chunks.append(uncompressed_data)
 
-        decompressed_data += uncompressed_data
+        ipv6_header.payload_length = sum(len(chunk) for chunk in chunks[1:])
 
-        ipv6_header.payload_length = len(decompressed_data)
+        chunks[0] = ipv6_header.to_bytes()
 
-        decompressed_data = ipv6_header.to_bytes() + decompressed_data
+        # bytearray.join() does not accept a memoryview on Python 2.
+        packet = bytearray()
+        for chunk in chunks:
+            packet.extend(chunk)
 
         return self._ipv6_packet_factory.parse(
-            io.BytesIO(decompressed_data), message_info
+            common.BufferReader(packet), message_info
         )
 
     def set_lowpan_context(self, cid, prefix):
@@ -1222,8 +1313,8 @@ class LowpanParser(object):
 
     def parse(self, data, message_info):
 
-        while data.tell() < len(data.getvalue()):
-            first_byte = ord(self._peek_n_bytes(data, n=1))
+        while common.bytes_left(data) > 0:
+            first_byte = common.peek_byte(data)
 
             if self._is_mesh_header(first_byte):
                 mesh_header = self._lowpan_mesh_header_factory.parse(
@@ -33,6 +33,7 @@
 
 import io
 import struct
+import threading
 
 import config
 from common import MacAddress, MacAddressType, MessageInfo
@@ -43,21 +44,94 @@ from net_crypto import (
 )
 
 
+# Seconds (capture time) after which a device descriptor not refreshed by an
+# MLE message is dropped. None keeps descriptors until their short address
+# is reassigned, since a device can stay silent on MLE for longer than any
+# fixed timeout while still sending secured data frames.
+DEVICE_DESCRIPTOR_TIMEOUT = None
+
+
 class DeviceDescriptors:
 
-    """Class representing 802.15.4 Device Descriptors."""
+    """Class representing 802.15.4 Device Descriptors.
 
-    device_descriptors = {}
+    Maps short addresses to extended addresses per PAN so secured frames sent
+    from a short address can be decrypted. Each MessageFactory owns its table,
+    and the table can be shared by several decode threads.
 
-    @classmethod
-    def add(cls, short_address, extended_address):
-        short_address = cls._get_short_address_value(short_address)
-        cls.device_descriptors[short_address] = extended_address
+    When a device shows up with a new short address (RLOC16 reassignment) its
+    old mapping is removed, and when a short address is given to another
+    device the mapping is replaced. If `timeout` is given, descriptors not
+    refreshed for `timeout` seconds of capture time are dropped on lookup.
+    """
 
-    @classmethod
-    def get_extended(cls, short_address):
-        short_address = cls._get_short_address_value(short_address)
-        return cls.device_descriptors[short_address]
+    def __init__(self, timeout=DEVICE_DESCRIPTOR_TIMEOUT):
+        self._lock = threading.Lock()
+        self._timeout = timeout
+
+        # (pan_id, short address) -> (extended address, last seen)
+        self._descriptors = {}
+        # (pan_id, extended address bytes) -> short address
+        self._short_addresses = {}
+
+        self.reassignments = 0
+
+    def add(self, short_address, extended_address, pan_id=None, timestamp=None):
+        short_address = self._get_short_address_value(short_address)
+        extended_key = (pan_id, bytes(extended_address.mac_address))
+
+        with self._lock:
+            previous_short_address = self._short_addresses.get(extended_key)
+            if previous_short_address not in (None, short_address):
+                del self._descriptors[(pan_id, previous_short_address)]
+                self.reassignments += 1
+
+            previous = self._descriptors.get((pan_id, short_address))
+            if previous is not None:
+                previous_key = (pan_id, bytes(previous[0].mac_address))
+                if previous_key != extended_key:
+                    del self._short_addresses[previous_key]
+                    self.reassignments += 1
+
+            self._descriptors[(pan_id, short_address)] = (
+                extended_address, timestamp
+            )
+            self._short_addresses[extended_key] = short_address
+
+    def get_extended(self, short_address, pan_id=None, timestamp=None):
+        short_address = self._get_short_address_value(short_address)
+
+        with self._lock:
+            key = (pan_id, short_address)
+            if key not in self._descriptors:
+                key = (None, short_address)
+
+            try:
+                extended_address, last_seen = self._descriptors[key]
+            except KeyError:
+                raise KeyError(
+                    "Unknown short address: 0x{:04x}".format(short_address)
+                )
+
+            if self._is_expired(last_seen, timestamp):
+                del self._descriptors[key]
+                del self._short_addresses[
+                    (key[0], bytes(extended_address.mac_address))
+                ]
+                raise KeyError(
+                    "Device descriptor of 0x{:04x} expired".format(short_address)
+                )
+
+            return extended_address
+
+    def _is_expired(self, last_seen, timestamp):
+        if self._timeout is None or last_seen is None or timestamp is None:
+            return False
+
+        return timestamp - last_seen > self._timeout
+
+    def __len__(self):
+        return len(self._descriptors)
 
     @staticmethod
     def _get_short_address_value(short_address):
@@ -161,7 +235,22 @@ class MacFrame:
 
     IEEE802154_VERSION_2015 = 0x02
 
-    def parse(self, data):
+    # Crypto engines are stateless, so a single one per master key is shared
+    # by all parsed frames.
+    _crypto_engines = {}
+
+    @classmethod
+    def _get_crypto_engine(cls, master_key):
+        key = bytes(master_key)
+        engine = cls._crypto_engines.get(key)
+        if engine is None:
+            engine = CryptoEngine(MacCryptoMaterialCreator(master_key))
+            cls._crypto_engines[key] = engine
+        return engine
+
+    def parse(
+        self, data, crypto_engine=None, device_descriptors=None, timestamp=None
+    ):
         """Parse a MAC 802.15.4 frame
 
         Format of MAC 802.15.4 Frame:
@@ -185,6 +274,11 @@ class MacFrame:
         are parsed.
         And after parsing everything, build MacHeader and MacPayload with
         the things parsed.
+
+        Secured frames are decrypted with the given crypto engine, or with
+        the default master key if it is None. The extended source address of
+        a secured frame sent from a short address is looked up in
+        device_descriptors, at capture time timestamp.
         """
         mhr_start = data.tell()
 
@@ -319,6 +413,7 @@ class MacFrame:
             message_info.aux_sec_hdr_bytes = aux_sec_hdr_bytes
             message_info.extra_open_fields = extra_open_fields
             message_info.mhr_bytes = mhr_bytes
+            message_info.pan_id = dest_pan_id
 
             open_payload = []
             private_payload = payload
@@ -332,17 +427,22 @@ class MacFrame:
                     message_info.open_payload_length = 1
 
             if src_address.type == MacAddressType.SHORT:
-                message_info.source_mac_address = DeviceDescriptors.get_extended(
-                    src_address).mac_address
+                if device_descriptors is None:
+                    raise KeyError(
+                        "Could not find extended address of 0x{:04x}. "
+                        "No device descriptors.".format(src_address.rloc)
+                    )
+
+                message_info.source_mac_address = device_descriptors.get_extended(
+                    src_address, dest_pan_id, timestamp).mac_address
             else:
                 message_info.source_mac_address = src_address.mac_address
 
-            sec_obj = CryptoEngine(
-                MacCryptoMaterialCreator(config.DEFAULT_MASTER_KEY)
-            )
+            if crypto_engine is None:
+                crypto_engine = self._get_crypto_engine(config.DEFAULT_MASTER_KEY)
             self.payload = MacPayload(
                 bytearray(open_payload)
-                + sec_obj.decrypt(private_payload, mic, message_info)
+                + crypto_engine.decrypt(private_payload, mic, message_info)
             )
 
         else:
@@ -33,6 +33,7 @@ import io
 import struct
 
 from network_data import SubTlvsFactory
+from tlvs_parsing import Tlvs
 import common
 
 
@@ -882,7 +883,7 @@ class DiscoveryResponseFactory(object):
 class MeshCopCommand(object):
     def __init__(self, _type, tlvs):
         self._type = _type
-        self._tlvs = tlvs
+        self._tlvs = Tlvs.wrap(tlvs)
 
     @property
     def type(self):
@@ -27,10 +27,11 @@
 #  POSSIBILITY OF SUCH DAMAGE.
 #
 
-import io
+import collections
 import ipaddress
 import struct
 import sys
+import traceback
 
 import coap
 import common
@@ -38,6 +39,9 @@ import dtls
 import ipv6
 import mac802154
 import mle
+import net_crypto
+
+from tlvs_parsing import Tlvs
 
 from enum import IntEnum
 
@@ -91,7 +95,7 @@ class Message(object):
     def try_extract_dtls_messages(self):
         """Extract multiple dtls messages that are sent in a single UDP datagram
         """
-        if self.type != MessageType.DTLS:
+        if self.type != MessageType.DTLS or not isinstance(self.dtls, list):
             return [self.clone()]
 
         assert isinstance(self.dtls, list)
@@ -189,9 +193,7 @@ class Message(object):
         if self.type != MessageType.MLE:
             raise ValueError("Invalid message type. Expected MLE message.")
 
-        for tlv in self.mle.command.tlvs:
-            if isinstance(tlv, tlv_class_type):
-                return tlv
+        return self.mle.command.tlvs.get(tlv_class_type)
 
     def assertMleMessageIsType(self, command_type):
         if self.type != MessageType.MLE:
@@ -211,13 +213,9 @@ class Message(object):
         if self.type != MessageType.MLE:
             raise ValueError("Invalid message type. Expected MLE message.")
 
-        contains_tlv = False
-        for tlv in self.mle.command.tlvs:
-            if isinstance(tlv, tlv_class_type):
-                contains_tlv = True
-                break
+        tlv = self.mle.command.tlvs.get(tlv_class_type)
 
-        assert contains_tlv
+        assert tlv is not None
         return tlv
 
     def assertAssignedRouterQuantity(self, router_quantity):
@@ -239,25 +237,13 @@ class Message(object):
         if self.type != MessageType.MLE:
             raise ValueError("Invalid message type. Expected MLE message.")
 
-        contains_tlv = False
-        for tlv in self.mle.command.tlvs:
-            if isinstance(tlv, tlv_class_type):
-                contains_tlv = True
-                break
-
-        assert contains_tlv is False
+        assert self.mle.command.tlvs.contains(tlv_class_type) is False
 
     def assertMleMessageContainsOptionalTlv(self, tlv_class_type):
         if self.type != MessageType.MLE:
             raise ValueError("Invalid message type. Expected MLE message.")
 
-        contains_tlv = False
-        for tlv in self.mle.command.tlvs:
-            if isinstance(tlv, tlv_class_type):
-                contains_tlv = True
-                break
-
-        if contains_tlv:
+        if self.mle.command.tlvs.contains(tlv_class_type):
             print(
                 "MleMessage contains optional TLV: {}".format(tlv_class_type)
             )
@@ -272,42 +258,24 @@ class Message(object):
         if self.type != MessageType.COAP:
             raise ValueError("Invalid message type. Expected CoAP message.")
 
-        for tlv in self.coap.payload:
-            if isinstance(tlv, tlv_class_type):
-                return tlv
+        return Tlvs.wrap(self.coap.payload).get(tlv_class_type)
 
     def assertCoapMessageContainsTlv(self, tlv_class_type):
         if self.type != MessageType.COAP:
             raise ValueError("Invalid message type. Expected CoAP message.")
 
-        contains_tlv = False
-        for tlv in self.coap.payload:
-            if isinstance(tlv, tlv_class_type):
-                contains_tlv = True
-                break
-
-        assert contains_tlv
+        assert Tlvs.wrap(self.coap.payload).contains(tlv_class_type)
 
     def assertCoapMessageDoesNotContainTlv(self, tlv_class_type):
         if self.type != MessageType.COAP:
             raise ValueError("Invalid message type. Expected COAP message.")
 
-        contains_tlv = False
-        for tlv in self.coap.payload:
-            if isinstance(tlv, tlv_class_type):
-                contains_tlv = True
-                break
-
-        assert contains_tlv is False
+        assert Tlvs.wrap(self.coap.payload).contains(tlv_class_type) is False
 
     def assertCoapMessageContainsOptionalTlv(self, tlv_class_type):
         if self.type != MessageType.COAP:
             raise ValueError("Invalid message type. Expected CoAP message.")
 
-        for tlv in self.coap.payload:
-            if isinstance(tlv, tlv_class_type):
-                break
-
         print(
             "CoapMessage doesn't contain optional TLV: {}".format(
                 tlv_class_type
@@ -372,43 +340,256 @@ class Message(object):
     def __repr__(self):
         if (
             self.type == MessageType.DTLS
+            and not isinstance(self.dtls, list)
             and self.dtls.content_type == dtls.ContentType.HANDSHAKE
         ):
             return "Message(type={})".format(str(self.dtls.handshake_type))
         return "Message(type={})".format(MessageType(self.type).name)
 
 
+class LazyMessage(Message):
+    """ Message which keeps the raw frame and decodes it on first access.
+
+    Decoding is stateful (6LoWPAN reassembly, device descriptors, CoAP URI
+    path bindings), so the first access decodes this frame and every frame
+    captured before it through the factory that created it. The decoded
+    layers are then identical to the ones produced by MessageFactory.create().
+
+    MessagesSet drops frames which could not be decoded and splits datagrams
+    carrying several DTLS records, as MessageFactory.create() does.
+    """
+
+    def __init__(self, message_factory, data, timestamp=None):
+        super(LazyMessage, self).__init__()
+        self._message_factory = message_factory
+        self._data = data
+        self._timestamp = timestamp
+        self._decoded = False
+        self._decode_failed = False
+
+    @property
+    def data(self):
+        return self._data
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+    @property
+    def is_decoded(self):
+        return self._decoded
+
+    @property
+    def decode_failed(self):
+        """ True if the frame was decoded and produced no message. """
+        self.decode()
+        return self._decode_failed
+
+    def decode(self):
+        if not self._decoded:
+            self._message_factory.decode_lazy_messages(until=self)
+
+    def _set_decoded(self, messages):
+        """ Adopt the layers of the messages decoded from this frame. """
+        self._decoded = True
+        self._data = None
+
+        if not messages:
+            self._decode_failed = True
+            return
+
+        msg = messages[0]
+        self._type = msg._type
+        self._channel = msg._channel
+        self._mac_header = msg._mac_header
+        self._ipv6_packet = msg._ipv6_packet
+        self._coap = msg._coap
+        self._mle = msg._mle
+        self._icmp = msg._icmp
+        self._dtls = msg._dtls
+
+        if len(messages) > 1:
+            # Keep all DTLS records so that they can still be split by
+            # try_extract_dtls_messages().
+            self._dtls = [m._dtls for m in messages]
+
+    def clone(self):
+        self.decode()
+        return super(LazyMessage, self).clone()
+
+    @property
+    def type(self):
+        self.decode()
+        return self._type
+
+    @property
+    def channel(self):
+        self.decode()
+        return self._channel
+
+    @property
+    def mac_header(self):
+        self.decode()
+        return self._mac_header
+
+    @property
+    def ipv6_packet(self):
+        self.decode()
+        return self._ipv6_packet
+
+    @property
+    def coap(self):
+        self.decode()
+        return self._coap
+
+    @property
+    def mle(self):
+        self.decode()
+        return self._mle
+
+    @property
+    def icmp(self):
+        self.decode()
+        return self._icmp
+
+    @property
+    def dtls(self):
+        self.decode()
+        return self._dtls
+
+    def __repr__(self):
+        if not self._decoded:
+            return "LazyMessage(timestamp={})".format(self._timestamp)
+        if self._decode_failed:
+            return "LazyMessage(timestamp={}, decode failed)".format(
+                self._timestamp
+            )
+        return super(LazyMessage, self).__repr__()
+
+
+class MessagesIndex(object):
+    """ Positions of messages by key, in capture order.
+
+    Queries take the position of the first message not consumed yet. As that
+    position only moves forward, the head of every list of positions only
+    moves forward too and lookups are amortized O(1).
+    """
+
+    def __init__(self):
+        self._positions = collections.defaultdict(list)
+        self._heads = collections.defaultdict(int)
+
+    def add(self, key, position):
+        self._positions[key].append(position)
+
+    def positions(self, key, cursor):
+        """ Yields positions of the key, starting at the cursor. """
+        positions = self._positions.get(key)
+        if not positions:
+            return
+
+        head = self._heads[key]
+        while head < len(positions) and positions[head] < cursor:
+            head += 1
+        self._heads[key] = head
+
+        for position in positions[head:]:
+            yield position
+
+    def first(self, key, cursor):
+        return next(self.positions(key, cursor), None)
+
+    def last(self, key, cursor):
+        positions = self._positions.get(key)
+        if not positions or positions[-1] < cursor:
+            return None
+        return positions[-1]
+
+
 class MessagesSet(object):
+    """ Messages sent by a node, consumed in capture order.
+
+    The next_*() methods consume every message up to and including the one
+    they return. Messages are never removed from the list: a cursor marks the
+    first message not consumed yet, and messages are indexed by type, MLE
+    command type, CoAP URI path and ICMP type on the first lookup.
+    """
+
     def __init__(self, messages, commissioning_messages=[]):
         self._messages = messages
         self._commissioning_messages = commissioning_messages
+        self._cursor = 0
+
+        self._indexed = False
+        self._by_type = MessagesIndex()
+        self._by_mle_command_type = MessagesIndex()
+        self._by_coap_uri_path = MessagesIndex()
+        self._by_icmp_type = MessagesIndex()
 
     @property
     def messages(self):
-        return self._messages
+        """ Messages not consumed yet. """
+        self._build_indexes()
+        return self._messages[self._cursor:]
 
     @property
     def commissioning_messages(self):
         return self._commissioning_messages
 
-    def next_coap_message(self, code, uri_path=None, assert_enabled=True):
-        message = None
-
-        while self.messages:
-            m = self.messages.pop(0)
+    def _build_indexes(self):
+        if self._indexed:
+            return
 
-            if m.type != MessageType.COAP:
+        # Drop frames which could not be decoded and split datagrams carrying
+        # several DTLS records, so that lazy messages give the same list as
+        # the ones decoded by MessageFactory.create().
+        messages = self._messages[:self._cursor]
+        for m in self._messages[self._cursor:]:
+            if isinstance(m, LazyMessage) and m.decode_failed:
                 continue
+            if m.type == MessageType.DTLS and isinstance(m.dtls, list):
+                messages.extend(m.try_extract_dtls_messages())
+            else:
+                messages.append(m)
+        self._messages = messages
 
-            if uri_path is not None and m.coap.uri_path != uri_path:
-                continue
+        for position in range(self._cursor, len(messages)):
+            m = messages[position]
+            self._by_type.add(m.type, position)
 
-            else:
-                if not m.coap.code.is_equal_dotted(code):
-                    continue
+            if m.type == MessageType.MLE:
+                self._by_mle_command_type.add(m.mle.command.type, position)
+            elif m.type == MessageType.COAP:
+                self._by_coap_uri_path.add(m.coap.uri_path, position)
+            elif m.type == MessageType.ICMP:
+                self._by_icmp_type.add(m.icmp.header.type, position)
+
+        self._indexed = True
+
+    def _consume(self, position):
+        """ Consume messages up to the position, all messages if None. """
+        if position is None:
+            self._cursor = len(self._messages)
+            return None
+
+        self._cursor = position + 1
+        return self._messages[position]
+
+    def next_coap_message(self, code, uri_path=None, assert_enabled=True):
+        self._build_indexes()
+
+        if uri_path is not None:
+            positions = self._by_coap_uri_path.positions(uri_path, self._cursor)
+        else:
+            positions = self._by_type.positions(MessageType.COAP, self._cursor)
+
+        found = None
+        for position in positions:
+            if self._messages[position].coap.code.is_equal_dotted(code):
+                found = position
+                break
 
-            message = m
-            break
+        message = self._consume(found)
 
         if assert_enabled:
             assert (
@@ -427,19 +608,10 @@ class MessagesSet(object):
         Returns:
             message.Message: the last Mle Message with specified type.
         """
-        message = None
-        size = len(self.messages)
-
-        for i in range(size - 1, -1, -1):
-            m = self.messages[i]
-
-            if m.type != MessageType.MLE:
-                continue
+        self._build_indexes()
 
-            # for command_type in command_types:
-            if m.mle.command.type == command_type:
-                message = m
-                break
+        position = self._by_mle_command_type.last(command_type, self._cursor)
+        message = self._messages[position] if position is not None else None
 
         if assert_enabled:
             assert (
@@ -464,43 +636,33 @@ class MessagesSet(object):
         return message
 
     def next_mle_message_of_one_of_command_types(self, *command_types):
-        message = None
-
-        while self.messages:
-            m = self.messages.pop(0)
-
-            if m.type != MessageType.MLE:
-                continue
+        self._build_indexes()
 
-            command_found = False
+        positions = [
+            self._by_mle_command_type.first(command_type, self._cursor)
+            for command_type in command_types
+        ]
+        positions = [position for position in positions if position is not None]
 
-            for command_type in command_types:
-                if m.mle.command.type == command_type:
-                    command_found = True
-                    break
+        return self._consume(min(positions) if positions else None)
 
-            if command_found:
-                message = m
-                break
+    def next_message(self, assert_enabled=True):
+        self._build_indexes()
 
-        return message
+        if self._cursor >= len(self._messages):
+            raise IndexError("No more messages")
 
-    def next_message(self, assert_enabled=True):
-        message = self.messages.pop(0)
+        message = self._consume(self._cursor)
         if assert_enabled:
             assert message is not None, "Could not find next Message"
         return message
 
     def next_message_of(self, message_type, assert_enabled=True):
-        message = None
-
-        while self.messages:
-            m = self.messages.pop(0)
-            if m.type != message_type:
-                continue
+        self._build_indexes()
 
-            message = m
-            break
+        message = self._consume(
+            self._by_type.first(message_type, self._cursor)
+        )
 
         if assert_enabled:
             assert (
@@ -516,10 +678,10 @@ class MessagesSet(object):
         return self.next_message_of(MessageType.COMMAND)
 
     def next_dtls_message(self, content_type, handshake_type=None):
-        while self.messages:
-            msg = self.messages.pop(0)
-            if msg.type != MessageType.DTLS:
-                continue
+        self._build_indexes()
+
+        for position in self._by_type.positions(MessageType.DTLS, self._cursor):
+            msg = self._messages[position]
             if msg.dtls.content_type != content_type:
                 continue
             if (
@@ -527,7 +689,9 @@ class MessagesSet(object):
                 and msg.dtls.handshake_type != handshake_type
             ):
                 continue
-            return msg
+            return self._consume(position)
+
+        self._consume(None)
 
         t = (
             handshake_type
@@ -539,81 +703,157 @@ class MessagesSet(object):
         )
 
     def contains_icmp_message(self):
-        for m in self.messages:
-            if m.type == MessageType.ICMP:
-                return True
-
-        return False
+        self._build_indexes()
+        return self._by_type.last(MessageType.ICMP, self._cursor) is not None
 
     def get_icmp_message(self, icmp_type):
-        for m in self.messages:
-            if m.type != MessageType.ICMP:
-                continue
+        self._build_indexes()
 
-            if m.icmp.header.type == icmp_type:
-                return m
+        position = self._by_icmp_type.first(icmp_type, self._cursor)
+        if position is None:
+            return None
 
-        return None
+        return self._messages[position]
 
     def contains_mle_message(self, command_type):
-        for m in self.messages:
-            if m.type != MessageType.MLE:
-                continue
-
-            if m.mle.command.type == command_type:
-                return True
-
-        return False
+        self._build_indexes()
+        return (
+            self._by_mle_command_type.last(command_type, self._cursor)
+            is not None
+        )
 
     def does_not_contain_coap_message(self):
-        for m in self.messages:
-            if m.type != MessageType.COAP:
-                continue
-
-            return False
-
-        return True
+        self._build_indexes()
+        return self._by_type.last(MessageType.COAP, self._cursor) is None
 
     def clone(self):
         """Make a copy of current MessageSet.
         """
-        return MessagesSet(self.messages[:], self.commissioning_messages[:])
+        return MessagesSet(self.messages, self.commissioning_messages[:])
 
     def __repr__(self):
         return str(self.messages)
 
 
 class MessageFactory:
-    def __init__(self, lowpan_parser):
+    def __init__(self, lowpan_parser, keyring=None, device_descriptors=None):
+        """
+        Args:
+            lowpan_parser (LowpanParser)
+            keyring (KeyRing): master keys used to decrypt MAC frames. The
+                default master key is used if None.
+            device_descriptors (DeviceDescriptors): short to extended address
+                table learnt from MLE messages. A new one is created if None.
+        """
         self._lowpan_parser = lowpan_parser
+        self._lazy_messages = collections.deque()
 
-    def _add_device_descriptors(self, message):
-        for tlv in message.mle.command.tlvs:
+        if device_descriptors is None:
+            device_descriptors = mac802154.DeviceDescriptors()
+        self._device_descriptors = device_descriptors
 
-            if isinstance(tlv, mle.SourceAddress):
-                mac802154.DeviceDescriptors.add(
-                    tlv.address, message.mac_header.src_address
-                )
+        self._keyring = keyring
+        if keyring is not None:
+            self._mac_crypto_engine = net_crypto.CryptoEngine(
+                net_crypto.MacCryptoMaterialCreator(keyring=keyring)
+            )
+        else:
+            self._mac_crypto_engine = None
 
-            if isinstance(tlv, mle.Address16):
-                mac802154.DeviceDescriptors.add(
-                    tlv.address, message.mac_header.dest_address
-                )
+    @property
+    def keyring(self):
+        return self._keyring
+
+    @property
+    def device_descriptors(self):
+        return self._device_descriptors
 
-    def _parse_mac_frame(self, data):
+    def _add_device_descriptors(self, message, timestamp):
+        tlvs = message.mle.command.tlvs
+        pan_id = message.mac_header.dest_pan_id
+
+        for tlv in tlvs.get_all(mle.SourceAddress):
+            self._device_descriptors.add(
+                tlv.address, message.mac_header.src_address, pan_id, timestamp
+            )
+
+        for tlv in tlvs.get_all(mle.Address16):
+            self._device_descriptors.add(
+                tlv.address, message.mac_header.dest_address, pan_id, timestamp
+            )
+
+    def _parse_mac_frame(self, data, timestamp):
         mac_frame = mac802154.MacFrame()
-        mac_frame.parse(data)
+        mac_frame.parse(
+            data, self._mac_crypto_engine, self._device_descriptors, timestamp
+        )
         return mac_frame
 
     def set_lowpan_context(self, cid, prefix):
+        # Frames captured so far must be decoded with the previous context
+        self.decode_lazy_messages()
         self._lowpan_parser.set_lowpan_context(cid, prefix)
 
-    def create(self, data):
+    def create_lazy(self, data, timestamp=None):
+        """ Create a message which is decoded on first access.
+
+        Args:
+            data (bytes): raw frame, prefixed with the channel byte.
+            timestamp (tuple): capture time of the frame, (sec, usec).
+
+        Returns:
+            LazyMessage: the not yet decoded message.
+        """
+        message = LazyMessage(self, bytes(data), timestamp)
+        self._lazy_messages.append(message)
+        return message
+
+    def decode_lazy_messages(self, until=None):
+        """ Decode pending lazy messages in capture order.
+
+        Args:
+            until (LazyMessage): last message to decode. All pending messages
+                are decoded if None.
+        """
+        while self._lazy_messages:
+            message = self._lazy_messages.popleft()
+
+            # Ignore any exceptions
+            try:
+                messages = self.create(
+                    common.BufferReader(message.data), message.timestamp
+                )
+            except Exception as e:
+                # Just print the exception to the console
+                print("EXCEPTION: %s" % e)
+                traceback.print_exc()
+                messages = []
+
+            message._set_decoded(messages)
+
+            if message is until:
+                break
+
+    def _timestamp_to_seconds(self, timestamp):
+        if isinstance(timestamp, tuple):
+            return timestamp[0] + timestamp[1] / 1000000.0
+
+        return timestamp
+
+    def create(self, data, timestamp=None):
+        """ Decode a captured frame.
+
+        Args:
+            data (BytesIO): channel byte followed by the 802.15.4 frame.
+            timestamp: capture time as a pcap (sec, usec) tuple or in seconds.
+        """
         message = Message()
         message.channel = struct.unpack(">B", data.read(1))
 
+        timestamp = self._timestamp_to_seconds(timestamp)
+
         # Parse MAC header
-        mac_frame = self._parse_mac_frame(data)
+        mac_frame = self._parse_mac_frame(data, timestamp)
         message.mac_header = mac_frame.header
 
         if message.mac_header.frame_type != mac802154.MacHeader.FrameType.DATA:
@@ -622,9 +862,11 @@ class MessageFactory:
         message_info = common.MessageInfo()
         message_info.source_mac_address = message.mac_header.src_address
         message_info.destination_mac_address = message.mac_header.dest_address
+        message_info.pan_id = message.mac_header.dest_pan_id
+        message_info.timestamp = timestamp
 
         # Create stream with 6LoWPAN datagram
-        lowpan_payload = io.BytesIO(mac_frame.payload.data)
+        lowpan_payload = common.BufferReader(mac_frame.payload.data)
 
         ipv6_packet = self._lowpan_parser.parse(lowpan_payload, message_info)
         if ipv6_packet is None:
@@ -633,6 +875,6 @@ class MessageFactory:
         message.ipv6_packet = ipv6_packet
 
         if message.type == MessageType.MLE:
-            self._add_device_descriptors(message)
+            self._add_device_descriptors(message, timestamp)
 
         return message.try_extract_dtls_messages()
@@ -27,13 +27,14 @@
 #  POSSIBILITY OF SUCH DAMAGE.
 #
 
-import io
 import struct
 
 from binascii import hexlify
 
 import common
 
+from tlvs_parsing import Tlvs
+
 from enum import IntEnum
 
 
@@ -367,7 +368,7 @@ class Route64Factory:
 
         link_quality_and_route_data = []
 
-        while data.tell() < len(data.getvalue()):
+        while common.bytes_left(data) > 0:
             link_quality_and_route_data.append(
                 self._lqrd_factory.parse(data, message_info)
             )
@@ -659,9 +660,9 @@ class ConnectivityFactory:
         id_sequence = ord(data.read(1))
         active_routers = ord(data.read(1))
 
-        sed_data = io.BytesIO(data.read(3))
+        sed_data = common.read_stream(data, 3)
 
-        if len(sed_data.getvalue()) > 0:
+        if len(sed_data) > 0:
             sed_buffer_size = struct.unpack(">H", sed_data.read(2))[0]
             sed_datagram_count = ord(sed_data.read(1))
         else:
@@ -835,9 +836,8 @@ class AddressRegistrationFactory:
     def parse(self, data, message_info):
         addresses = []
 
-        while data.tell() < len(data.getvalue()):
-            compressed = (ord(data.read(1)) >> 7) & 0x01
-            data.seek(-1, io.SEEK_CUR)
+        while common.bytes_left(data) > 0:
+            compressed = (common.peek_byte(data) >> 7) & 0x01
 
             if compressed:
                 addresses.append(
@@ -1069,7 +1069,7 @@ class TimeParameterFactory:
 class MleCommand(object):
     def __init__(self, _type, tlvs):
         self._type = _type
-        self._tlvs = tlvs
+        self._tlvs = Tlvs.wrap(tlvs)
 
     @property
     def type(self):
@@ -1114,17 +1114,17 @@ class MleCommandFactory:
     def _parse_tlv(self, data, message_info):
         _type = TlvType(ord(data.read(1)))
         length = self._get_length(data)
-        value = data.read(length)
+        value = common.read_stream(data, length)
 
         factory = self._get_tlv_factory(_type)
 
-        return factory.parse(io.BytesIO(value), message_info)
+        return factory.parse(value, message_info)
 
     def parse(self, data, message_info):
         cmd_type = CommandType(ord(data.read(1)))
         tlvs = []
 
-        while data.tell() < len(data.getvalue()):
+        while common.bytes_left(data) > 0:
             tlv = self._parse_tlv(data, message_info)
             tlvs.append(tlv)
 
@@ -1173,11 +1173,9 @@ class MleMessageFactory:
     def _create_mle_secured_message(self, data, message_info):
         aux_sec_hdr = self._aux_sec_hdr_factory.parse(data, message_info)
 
-        enc_data_length = len(data.getvalue())
-
         enc_data = bytearray(
             data.read(
-                enc_data_length - data.tell() - self._crypto_engine.mic_length
+                common.bytes_left(data) - self._crypto_engine.mic_length
             )
         )
         mic = bytearray(data.read())
@@ -1185,7 +1183,7 @@ class MleMessageFactory:
         dec_data = self._crypto_engine.decrypt(enc_data, mic, message_info)
 
         command = self._mle_command_factory.parse(
-            io.BytesIO(dec_data), message_info
+            common.BufferReader(dec_data), message_info
         )
 
         return MleMessageSecured(aux_sec_hdr, command, mic)
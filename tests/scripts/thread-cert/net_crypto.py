@@ -27,9 +27,11 @@
 #  POSSIBILITY OF SUCH DAMAGE.
 #
 
+import collections
 import hmac
 import hashlib
 import struct
+import threading
 
 from binascii import hexlify
 
@@ -93,37 +95,220 @@ class CryptoEngine:
         return bytearray(dec_data)
 
 
-class CryptoMaterialCreator(object):
+class KeyScheduleCache(object):
+
+    """ Bounded cache of MLE and MAC keys derived from a master key.
+
+    Keys only depend on the master key and the key sequence counter, which
+    rarely changes during a capture, so the HMAC-SHA256 computation can be
+    shared by all frames and all crypto material creators.
+    """
 
     _salt = b'Thread'
 
-    def __init__(self, master_key):
+    DEFAULT_MAX_SIZE = 64
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE):
+        self._max_size = max_size
+        self._keys = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _derive_keys(self, master_key, sequence_counter):
+        """ Generate MLE and MAC keys.
+
+        Read more: 7.1.4. Key Generation - Thread v1.1 Specification Final
+
+        Args:
+            master_key (bytes)
+            sequence_counter (int)
+
+        Returns:
+            tuple: MLE and MAC as bytes
+
         """
+        s = struct.pack(">L", sequence_counter) + self._salt
+        d = hmac.new(master_key, s, digestmod=hashlib.sha256).digest()
+
+        return d[:16], d[16:]
+
+    def get_keys(self, master_key, sequence_counter):
+        """ Return MLE and MAC keys, deriving them on a cache miss.
+
         Args:
             master_key (bytearray)
+            sequence_counter (int)
+
+        Returns:
+            tuple: MLE and MAC as bytes
 
         """
-        self.master_key = master_key
+        key = (bytes(master_key), sequence_counter)
+
+        with self._lock:
+            keys = self._keys.get(key)
+            if keys is not None:
+                self.hits += 1
+                # Mark as the most recently used entry
+                del self._keys[key]
+                self._keys[key] = keys
+                return keys
 
-    def _generate_keys(self, sequence_counter):
+            self.misses += 1
+
+        keys = self._derive_keys(*key)
+
+        with self._lock:
+            self._keys[key] = keys
+            while len(self._keys) > self._max_size:
+                self._keys.popitem(last=False)
+
+        return keys
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+
+key_schedule_cache = KeyScheduleCache()
+
+
+class KeyRing(object):
+
+    """ Master keys of the Thread networks present in a capture.
+
+    Keys are looked up by PAN ID and by the key sequence counter carried in
+    the Auxiliary Security Header (Key Source or Key Index), so the right key
+    is found without trial decryption. A master key added without a PAN ID
+    is used for frames of any network which has no key of its own.
+
+    A master key can be bound to explicit sequence counters, e.g. to follow
+    a master key change within a network. Keys of bound sequence counters
+    are derived once when the master key is added.
+    """
+
+    def __init__(self, key_schedule_cache=key_schedule_cache):
+        """
+        Args:
+            key_schedule_cache (KeyScheduleCache)
+
+        """
+        self._key_schedule_cache = key_schedule_cache
+
+        # (pan_id, sequence_counter) -> (mle_key, mac_key)
+        self._keys = {}
+
+        # pan_id -> master key used for any other sequence counter
+        self._master_keys = {}
+
+    def add_master_key(self, master_key, pan_id=None, sequence_counters=None):
+        """ Add a master key.
+
+        Args:
+            master_key (bytearray)
+            pan_id (int): PAN ID of the network. The key applies to all
+                networks if None.
+            sequence_counters (iterable): key sequence counters the master key
+                is bound to. The key applies to all sequence counters, which
+                are not bound to another master key, if None.
+
+        """
+        master_key = bytes(master_key)
+
+        if sequence_counters is None:
+            self._master_keys[pan_id] = master_key
+            return
+
+        for sequence_counter in sequence_counters:
+            self._keys[(pan_id, sequence_counter)] = self._key_schedule_cache.get_keys(
+                master_key, sequence_counter
+            )
+
+    @property
+    def master_key(self):
+        """ Master key used for all networks, None if not set. """
+        return self._master_keys.get(None)
+
+    def get_keys(self, sequence_counter, pan_id=None):
+        """ Return MLE and MAC keys.
+
+        Args:
+            sequence_counter (int)
+            pan_id (int)
+
+        Returns:
+            tuple: MLE and MAC as bytes
+
+        Raises:
+            KeyError: if no master key matches.
+
+        """
+        keys = self._keys.get((pan_id, sequence_counter))
+        if keys is not None:
+            return keys
+
+        master_key = self._master_keys.get(pan_id)
+        if master_key is None:
+            if pan_id is not None:
+                return self.get_keys(sequence_counter)
+
+            raise KeyError(
+                "No master key for key sequence {}".format(sequence_counter)
+            )
+
+        return self._key_schedule_cache.get_keys(master_key, sequence_counter)
+
+    def __len__(self):
+        return len(self._master_keys) + len(self._keys)
+
+
+class CryptoMaterialCreator(object):
+
+    def __init__(
+        self, master_key=None, key_schedule_cache=key_schedule_cache, keyring=None
+    ):
+        """
+        Args:
+            master_key (bytearray): used when keyring is None.
+            key_schedule_cache (KeyScheduleCache)
+            keyring (KeyRing)
+
+        """
+        if keyring is None:
+            keyring = KeyRing(key_schedule_cache)
+            if master_key is not None:
+                keyring.add_master_key(master_key)
+
+        self._keyring = keyring
+
+    @property
+    def master_key(self):
+        return self._keyring.master_key
+
+    @property
+    def keyring(self):
+        return self._keyring
+
+    def _generate_keys(self, sequence_counter, pan_id=None):
         """ Generate MLE and MAC keys.
 
         Read more: 7.1.4. Key Generation - Thread v1.1 Specification Final
 
         Args:
             sequence_counter (int)
+            pan_id (int)
 
         Returns:
             tuple: MLE and MAC as bytes
 
         """
-        k = self.master_key
-        s = struct.pack(">L", sequence_counter) + self._salt
-        d = hmac.new(k, s, digestmod=hashlib.sha256).digest()
-
-        mle = d[:16]
-        mac = d[16:]
-        return mle, mac
+        return self._keyring.get_keys(sequence_counter, pan_id)
 
     def create_key_and_nonce_and_authenticated_data(self, message_info):
         raise NotImplementedError
@@ -134,13 +319,17 @@ class CryptoMaterialCreator(object):
 
 
 class MacCryptoMaterialCreator(CryptoMaterialCreator):
-    def __init__(self, master_key):
+    def __init__(
+        self, master_key=None, key_schedule_cache=key_schedule_cache, keyring=None
+    ):
         """
         Args:
-            master_key (bytearray)
+            master_key (bytearray): used when keyring is None.
+            key_schedule_cache (KeyScheduleCache)
+            keyring (KeyRing)
 
         """
-        super(MacCryptoMaterialCreator, self).__init__(master_key)
+        super(MacCryptoMaterialCreator, self).__init__(master_key, key_schedule_cache, keyring)
 
     def _create_nonce(self, eui64, frame_counter, security_level):
         """ Create CCM Nonce required by AES-128 CCM for encryption and decryption.
@@ -178,7 +367,7 @@ class MacCryptoMaterialCreator(CryptoMaterialCreator):
 
     def create_key_and_nonce_and_authenticated_data(self, message_info):
         _, mac_key = self._generate_keys(
-            message_info.aux_sec_hdr.sequence_counter
+            message_info.aux_sec_hdr.sequence_counter, message_info.pan_id
         )
 
         nonce = self._create_nonce(
@@ -201,13 +390,17 @@ class MacCryptoMaterialCreator(CryptoMaterialCreator):
 
 
 class MleCryptoMaterialCreator(CryptoMaterialCreator):
-    def __init__(self, master_key):
+    def __init__(
+        self, master_key=None, key_schedule_cache=key_schedule_cache, keyring=None
+    ):
         """
         Args:
-            master_key (bytearray)
+            master_key (bytearray): used when keyring is None.
+            key_schedule_cache (KeyScheduleCache)
+            keyring (KeyRing)
 
         """
-        super(MleCryptoMaterialCreator, self).__init__(master_key)
+        super(MleCryptoMaterialCreator, self).__init__(master_key, key_schedule_cache, keyring)
 
     def _create_nonce(self, source_eui64, frame_counter, security_level):
         """ Create CCM Nonce required by AES-128 CCM for encryption and decryption.
@@ -252,7 +445,7 @@ class MleCryptoMaterialCreator(CryptoMaterialCreator):
 
     def create_key_and_nonce_and_authenticated_data(self, message_info):
         mle_key, _ = self._generate_keys(
-            message_info.aux_sec_hdr.sequence_counter
+            message_info.aux_sec_hdr.sequence_counter, message_info.pan_id
         )
 
         nonce = self._create_nonce(
@@ -27,13 +27,12 @@
 #  POSSIBILITY OF SUCH DAMAGE.
 #
 
-import io
 import math
 import struct
 
 from binascii import hexlify
 from enum import IntEnum
-from tlvs_parsing import SubTlvsFactory
+from tlvs_parsing import SubTlvsFactory, Tlvs
 
 import common
 
@@ -61,23 +60,23 @@ class NetworkDataSubTlvsFactory(SubTlvsFactory):
     def parse(self, data, message_info):
         sub_tlvs = []
 
-        while data.tell() < len(data.getvalue()):
+        while common.bytes_left(data) > 0:
             data_byte = ord(data.read(1))
 
             stable = data_byte & 0x01
             _type = (data_byte >> 1) & 0x7F
 
             length = ord(data.read(1))
-            value = data.read(length)
+            value = common.read_stream(data, length)
 
             factory = self._get_factory(_type)
 
             message_info.stable = stable
-            tlv = factory.parse(io.BytesIO(value), message_info)
+            tlv = factory.parse(value, message_info)
 
             sub_tlvs.append(tlv)
 
-        return sub_tlvs
+        return Tlvs(sub_tlvs)
 
 
 class Route(object):
@@ -124,7 +123,7 @@ class RoutesFactory(object):
     def parse(self, data, message_info):
         routes = []
 
-        while data.tell() < len(data.getvalue()):
+        while common.bytes_left(data) > 0:
             route = self._route_factory.parse(data, message_info)
 
             routes.append(route)
@@ -223,7 +222,7 @@ class PrefixFactory(object):
         prefix = bytearray(data.read(self._bits_to_bytes(prefix_length)))
 
         sub_tlvs = self._sub_tlvs_factory.parse(
-            io.BytesIO(data.read()), message_info
+            common.read_stream(data), message_info
         )
 
         return Prefix(
@@ -403,7 +402,7 @@ class CommissioningDataFactory(object):
 
     def parse(self, data, message_info):
         sub_tlvs = self._sub_tlvs_factory.parse(
-            io.BytesIO(data.read()), message_info
+            common.read_stream(data), message_info
         )
 
         return CommissioningData(sub_tlvs, message_info.stable)
@@ -491,7 +490,7 @@ class ServiceFactory(object):
         service_data = data.read(service_data_length)
 
         sub_tlvs = self._sub_tlvs_factory.parse(
-            io.BytesIO(data.read()), message_info
+            common.read_stream(data), message_info
         )
 
         return Service(
@@ -28,8 +28,11 @@
 #
 
 import config
+import errno
+import fcntl
 import ipaddress
 import os
+import select
 import sys
 import pexpect
 import pexpect.popen_spawn
@@ -40,12 +43,137 @@ import time
 import unittest
 
 
+class CliSpawn(pexpect.popen_spawn.PopenSpawn):
+    """ PopenSpawn reading the CLI output from a non-blocking pipe.
+
+    PopenSpawn moves the output to a queue in a reader thread, so there is
+    nothing to wait on but a timeout. Reading the pipe directly makes the
+    output a file descriptor the simulator can wait on together with its
+    socket, and expect() returns as soon as the awaited line arrives.
+
+    This relies on PopenSpawn internals (_read_incoming, _buf, _decoder and
+    _read_reached_eof), which is why requirements.txt pins pexpect.
+    test_node.py checks the class against an echo child process.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super(CliSpawn, self).__init__(*args, **kwargs)
+
+        fd = self.fileno()
+        flags = fcntl.fcntl(fd, fcntl.F_GETFL)
+        fcntl.fcntl(fd, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+    def _read_incoming(self):
+        # The output is read in read_nonblocking() instead of a thread
+        pass
+
+    def fileno(self):
+        return self.proc.stdout.fileno()
+
+    def _read_pipe(self, size):
+        try:
+            data = os.read(self.fileno(), size)
+        except OSError as e:
+            if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                raise
+            return self.string_type()
+
+        if not data:
+            self._read_reached_eof = True
+            return self.string_type()
+
+        return self._decoder.decode(data, final=False)
+
+    def read_nonblocking(self, size, timeout):
+        if timeout == -1:
+            timeout = self.timeout
+
+        buf = self._buf
+        if not buf and not self._read_reached_eof:
+            buf = self._read_pipe(size)
+
+            if not buf and timeout:
+                select.select([self.fileno()], [], [], timeout)
+                buf = self._read_pipe(size)
+
+        if not buf and self._read_reached_eof:
+            self.flag_eof = True
+            raise pexpect.EOF('End Of File (EOF).')
+
+        r, self._buf = buf[:size], buf[size:]
+
+        self._log(r, 'read')
+        return r
+
+
+def send_commands_to_nodes(node_commands):
+    """ Send CLI commands to several nodes and process them in one pass.
+
+    The commands of every node are written first and the simulator then runs
+    until all nodes have processed them, instead of one round trip per
+    command and node.
+
+    Args:
+        node_commands (list): (node, [CLI command lines]) pairs.
+
+    Returns:
+        list: the output lines of each command, per node, in the given order.
+
+    Raises:
+        RuntimeError: when a command replied with an error. The replies of
+            all nodes are read before raising.
+    """
+    if not node_commands:
+        return []
+
+    for node, cmds in node_commands:
+        node.send_command('\n'.join(cmds), go=False)
+
+    node_commands[0][0].simulator.go(
+        0, nodeid=[node.nodeid for node, _ in node_commands]
+    )
+
+    outputs = []
+    errors = []
+    for node, cmds in node_commands:
+        try:
+            outputs.append(node._read_command_replies(cmds))
+        except RuntimeError as e:
+            outputs.append(None)
+            errors.append(str(e))
+
+    if errors:
+        raise RuntimeError('; '.join(errors))
+
+    return outputs
+
+
 class Node:
-    def __init__(self, nodeid, is_mtd=False, simulator=None):
+    # CLI commands which only read state and keep the state cache valid
+    _STATE_QUERY_COMMANDS = frozenset([
+        '?', 'channel', 'childtimeout', 'contextreusedelay', 'eidcache',
+        'eui64', 'extaddr', 'ipaddr', 'joiner id', 'keysequence counter',
+        'leaderweight', 'masterkey', 'networkname', 'panid', 'partitionid',
+        'rloc16', 'state',
+    ])
+
+    def __init__(self, nodeid, is_mtd=False, simulator=None, state_cache=None):
+        """
+        Args:
+            state_cache (bool): cache extaddr, EUI64, RLOC16 and the address
+                list until a state-changing command is sent or the simulated
+                time advances. Enabled by NODE_STATE_CACHE=1 if None.
+        """
         self.nodeid = nodeid
         self.verbose = int(float(os.getenv('VERBOSE', 0)))
         self.node_type = os.getenv('NODE_TYPE', 'sim')
         self.simulator = simulator
+
+        if state_cache is None:
+            state_cache = os.getenv('NODE_STATE_CACHE', '0') == '1'
+        self._state_cache_enabled = state_cache
+        self._state_cache = {}
+        self._state_cache_time = None
         if self.simulator:
             self.simulator.add_node(self)
 
@@ -84,7 +212,7 @@ class Node:
         cmd += ' %d' % nodeid
         print("%s" % cmd)
 
-        self.pexpect = pexpect.popen_spawn.PopenSpawn(cmd, timeout=4)
+        self.pexpect = CliSpawn(cmd, timeout=4)
 
         # Add delay to ensure that the process is ready to receive commands.
         timeout = 0.4
@@ -129,21 +257,30 @@ class Node:
         self.debug(int(os.getenv('DEBUG', '0')))
 
     def _expect(self, pattern, timeout=-1, *args, **kwargs):
-        """ Process simulator events until expected the pattern. """
+        """ Process simulator events until expected the pattern.
+
+        Between attempts the simulator waits for the node output together
+        with its own events, so a match is found as soon as the output
+        arrives instead of on the next polling period.
+        """
         if timeout == -1:
             timeout = self.pexpect.timeout
 
         assert timeout > 0
 
-        while timeout > 0:
+        deadline = time.time() + timeout
+
+        while True:
             try:
-                return self.pexpect.expect(pattern, 0.1, *args, **kwargs)
+                return self.pexpect.expect(pattern, 0, *args, **kwargs)
             except pexpect.TIMEOUT:
-                timeout -= 0.1
-                self.simulator.go(0)
+                timeout = deadline - time.time()
                 if timeout <= 0:
                     raise
 
+                self.simulator.go(0)
+                self.simulator.wait_readable([self.pexpect.fileno()], timeout)
+
     def __init_soc(self, nodeid):
         """ Initialize a System-on-a-chip node connected via UART. """
         import fdpexpect
@@ -236,13 +373,82 @@ class Node:
         assert len(payload) == payload_len
         return (direction, type, payload)
 
+    def _state_cache_clock(self):
+        # Only a virtual time simulator tells when the network could have changed
+        return getattr(self.simulator, 'current_time', None)
+
+    def _get_cached_state(self, key):
+        if not self._state_cache_enabled:
+            return None
+
+        now = self._state_cache_clock()
+        if now is None or now != self._state_cache_time:
+            self._state_cache = {}
+            self._state_cache_time = now
+            return None
+
+        return self._state_cache.get(key)
+
+    def _cache_state(self, key, value):
+        if self._state_cache_enabled:
+            self._get_cached_state(key)
+            self._state_cache[key] = value
+
+    def invalidate_state_cache(self):
+        self._state_cache = {}
+
     def send_command(self, cmd, go=True):
+        if self._state_cache and any(
+            line not in self._STATE_QUERY_COMMANDS for line in cmd.split('\n')
+        ):
+            self.invalidate_state_cache()
+
         print("%d: %s" % (self.nodeid, cmd))
         self.pexpect.send(cmd + '\n')
         if go:
             self.simulator.go(0, nodeid=self.nodeid)
         sys.stdout.flush()
 
+    def send_commands(self, cmds, go=True):
+        """ Send CLI commands in one write and wait for all their replies.
+
+        Args:
+            cmds (list): CLI command lines.
+
+        Returns:
+            list: output lines of each command, without `Done`.
+
+        Raises:
+            RuntimeError: when a command replied with an error. The replies of
+                all commands are read before raising.
+        """
+        self.send_command('\n'.join(cmds), go=go)
+        return self._read_command_replies(cmds)
+
+    def _read_command_replies(self, cmds):
+        outputs = []
+        errors = []
+
+        for cmd in cmds:
+            i = self._expect([r'Done\r?\n', r'(Error [^\r\n]*)\r?\n'])
+
+            lines = self.pexpect.before.decode('utf-8').splitlines()
+            lines = [line for line in lines if line.strip()]
+            # Drop the echo of the command
+            if lines and lines[0].strip().endswith(cmd):
+                lines = lines[1:]
+            outputs.append(lines)
+
+            if i == 1:
+                errors.append('%s: %s' % (
+                    cmd, self.pexpect.match.groups()[0].decode('utf-8')))
+
+        if errors:
+            raise RuntimeError(
+                'Node %d: %s' % (self.nodeid, ', '.join(errors)))
+
+        return outputs
+
     def get_commands(self):
         self.send_command('?')
         self._expect('Commands:')
@@ -333,11 +539,18 @@ class Node:
         self._expect('Done')
 
     def get_addr16(self):
-        self.send_command('rloc16')
+        addr16 = self._get_cached_state('rloc16')
+        if addr16 is None:
+            self.send_command('rloc16')
+            addr16 = self._read_addr16()
+        return addr16
+
+    def _read_addr16(self):
         i = self._expect('([0-9a-fA-F]{4})')
         if i == 0:
             addr16 = int(self.pexpect.match.groups()[0], 16)
         self._expect('Done')
+        self._cache_state('rloc16', addr16)
         return addr16
 
     def get_router_id(self):
@@ -345,21 +558,26 @@ class Node:
         return rloc16 >> 10
 
     def get_addr64(self):
-        self.send_command('extaddr')
-        i = self._expect('([0-9a-fA-F]{16})')
-        if i == 0:
-            addr64 = self.pexpect.match.groups()[0].decode("utf-8")
-
-        self._expect('Done')
+        addr64 = self._get_cached_state('extaddr')
+        if addr64 is None:
+            self.send_command('extaddr')
+            addr64 = self._read_ext_address('extaddr')
         return addr64
 
     def get_eui64(self):
-        self.send_command('eui64')
+        addr64 = self._get_cached_state('eui64')
+        if addr64 is None:
+            self.send_command('eui64')
+            addr64 = self._read_ext_address('eui64')
+        return addr64
+
+    def _read_ext_address(self, key):
         i = self._expect('([0-9a-fA-F]{16})')
         if i == 0:
             addr64 = self.pexpect.match.groups()[0].decode("utf-8")
 
         self._expect('Done')
+        self._cache_state(key, addr64)
         return addr64
 
     def get_joiner_id(self):
@@ -524,8 +742,14 @@ class Node:
         self._expect('Done')
 
     def get_addrs(self):
+        addrs = self._get_cached_state('ipaddr')
+        if addrs is None:
+            self.send_command('ipaddr')
+            addrs = self._read_addrs()
+        return list(addrs)
+
+    def _read_addrs(self):
         addrs = []
-        self.send_command('ipaddr')
 
         while True:
             i = self._expect([r'(\S+(:\S*)+)\r?\n', 'Done'])
@@ -534,8 +758,26 @@ class Node:
             elif i == 1:
                 break
 
+        self._cache_state('ipaddr', tuple(addrs))
         return addrs
 
+    def prefetch_state(self):
+        """ Read extaddr, EUI64, RLOC16 and the address list in one CLI exchange.
+
+        The values are stored in the state cache if it is enabled.
+
+        Returns:
+            dict: the values keyed by CLI command.
+        """
+        self.send_command('extaddr\neui64\nrloc16\nipaddr')
+
+        return {
+            'extaddr': self._read_ext_address('extaddr'),
+            'eui64': self._read_ext_address('eui64'),
+            'rloc16': self._read_addr16(),
+            'ipaddr': self._read_addrs(),
+        }
+
     def get_addr(self, prefix):
         network = ipaddress.ip_network(u'%s' % str(prefix))
         addrs = self.get_addrs()
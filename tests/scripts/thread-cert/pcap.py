@@ -27,25 +27,125 @@
 #  POSSIBILITY OF SUCH DAMAGE.
 #
 
-""" Module to provide codec utilities for .pcap formatters. """
 
+""" Module to provide codec utilities for .pcap and .pcapng formatters. """
+
+import os
 import struct
 import time
 
 DLT_IEEE802_15_4 = 195
+DLT_IEEE802_15_4_NOFCS = 230
+DLT_IEEE802_15_4_TAP = 283
 PCAP_MAGIC_NUMBER = 0xA1B2C3D4
+PCAP_MAGIC_NUMBER_NANOSEC = 0xA1B23C4D
 PCAP_VERSION_MAJOR = 2
 PCAP_VERSION_MINOR = 4
 
+PCAP_HEADER_LENGTH = 24
+PCAP_RECORD_HEADER_LENGTH = 16
+
+PCAPNG_BLOCK_TYPE_SHB = 0x0A0D0D0A
+PCAPNG_BLOCK_TYPE_IDB = 0x00000001
+PCAPNG_BLOCK_TYPE_EPB = 0x00000006
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_VERSION_MAJOR = 1
+PCAPNG_VERSION_MINOR = 0
+
+PCAPNG_OPTION_END = 0
+PCAPNG_OPTION_IF_NAME = 2
+PCAPNG_OPTION_IF_TSRESOL = 9
+
+TAP_TLV_FCS_TYPE = 0
+TAP_TLV_CHANNEL_ASSIGNMENT = 3
+TAP_FCS_TYPE_16_BIT_CRC = 1
+
+# Size of the write buffer in bytes
+PCAP_BUFFER_SIZE = int(os.getenv('PCAP_BUFFER_SIZE', 64 * 1024))
+
+# Buffered frames are written to the file at least this often, in seconds.
+# 0 writes every frame immediately.
+PCAP_FLUSH_INTERVAL = float(os.getenv('PCAP_FLUSH_INTERVAL', 1.0))
+
+# Start a new file after this many bytes, 0 disables size based rotation
+PCAP_ROTATE_SIZE = int(os.getenv('PCAP_ROTATE_SIZE', 0))
+
+# Start a new file after this many seconds of capture time, 0 disables time
+# based rotation
+PCAP_ROTATE_INTERVAL = int(os.getenv('PCAP_ROTATE_INTERVAL', 0))
+
+# Write .pcapng files with one interface per node instead of .pcap files
+PCAPNG = int(os.getenv('PCAPNG', 0))
+
 
 class PcapCodec(object):
-    """ Utility class for .pcap formatters. """
+    """ Utility class for .pcap formatters.
+
+    Frames are buffered, the buffer is written to the file by the first append
+    after flush_interval seconds and by flush(). The capture continues in a new file, named <filename>.<n>.pcap,
+    once the current one reaches rotate_size bytes or spans rotate_interval
+    seconds of capture time.
+    """
+
+    EXTENSION = 'pcap'
+
+    _record_header_struct = struct.Struct("<LLLL")
+
+    def __init__(
+        self,
+        filename,
+        buffer_size=PCAP_BUFFER_SIZE,
+        flush_interval=PCAP_FLUSH_INTERVAL,
+        rotate_size=PCAP_ROTATE_SIZE,
+        rotate_interval=PCAP_ROTATE_INTERVAL,
+    ):
+        self._filename = filename
+        self._buffer_size = buffer_size
+        self._flush_interval = flush_interval
+        self._rotate_size = rotate_size
+        self._rotate_interval = rotate_interval
+
+        # Reused for every frame to avoid building a new header each time
+        self._record_header = bytearray(self._record_header_struct.size)
+
+        self._file_index = 0
+        self._pcap_file = None
+        self._open_file()
 
-    def __init__(self, filename):
-        self._pcap_file = open('%s.pcap' % filename, 'wb')
-        self._pcap_file.write(self.encode_header())
         self._epoch = time.time()
 
+    @property
+    def filename(self):
+        """ Path of the file currently written. """
+        if self._file_index == 0:
+            return '%s.%s' % (self._filename, self.EXTENSION)
+        return '%s.%d.%s' % (self._filename, self._file_index, self.EXTENSION)
+
+    def _open_file(self):
+        self._pcap_file = open(self.filename, 'wb', self._buffer_size)
+        self._file_size = 0
+        self._file_start = None
+        self._write(self.encode_header())
+        self.flush()
+
+    def _write(self, data):
+        self._pcap_file.write(data)
+        self._file_size += len(data)
+
+    def _rotate_if_needed(self, sec):
+        if self._file_start is None:
+            self._file_start = sec
+            return
+
+        if (self._rotate_size and self._file_size >= self._rotate_size) or (
+            self._rotate_interval
+            and sec - self._file_start >= self._rotate_interval
+        ):
+            self._pcap_file.close()
+            self._file_index += 1
+            self._open_file()
+            self._file_start = sec
+
     def encode_header(self):
         """ Returns a pcap file header. """
         return struct.pack(
@@ -67,20 +167,372 @@ class PcapCodec(object):
         pcap_frame += frame
         return pcap_frame
 
-    def _get_timestamp(self):
-        """ Returns the internal timestamp. """
-        timestamp = time.time() - self._epoch
+    def _write_frame(self, frame, sec, usec, nodeid):
+        length = len(frame) - 1
+        self._record_header_struct.pack_into(
+            self._record_header, 0, sec, usec, length, length
+        )
+        self._write(self._record_header)
+        self._write(memoryview(frame)[1:])
+
+    def get_timestamp(self, now=None):
+        """ Returns the timestamp of the given time relative to the epoch.
+
+        Args:
+            now (float): time as returned by time.time(). Current time if None.
+        """
+        if now is None:
+            now = time.time()
+        timestamp = now - self._epoch
         timestamp_sec = int(timestamp)
         timestamp_usec = int((timestamp - timestamp_sec) * 1000000)
         return timestamp_sec, timestamp_usec
 
-    def append(self, frame, timestamp=None):
-        """ Appends a frame. """
+    def append(self, frame, timestamp=None, nodeid=None):
+        """ Appends a frame.
+
+        Args:
+            frame (bytes): frame prefixed with the channel byte.
+            timestamp (tuple): (sec, usec) of the frame. Current time if None.
+            nodeid (int): id of the node which sent the frame.
+        """
         if timestamp is None:
-            timestamp = self._get_timestamp()
-        pkt = self.encode_frame(frame, *timestamp)
-        self._pcap_file.write(pkt)
+            timestamp = self.get_timestamp()
+
+        self._rotate_if_needed(timestamp[0])
+        self._write_frame(frame, timestamp[0], timestamp[1], nodeid)
+
+        if time.time() - self._last_flush >= self._flush_interval:
+            self.flush()
+
+    def flush(self):
+        """ Writes buffered frames to the file. """
         self._pcap_file.flush()
+        self._last_flush = time.time()
+
+    def close(self):
+        if not self._pcap_file.closed:
+            self._pcap_file.close()
 
     def __del__(self):
+        if self._pcap_file is not None:
+            self.close()
+
+
+class PcapngCodec(PcapCodec):
+    """ Utility class for .pcapng formatters.
+
+    Every node gets its own interface, described when its first frame is
+    written, so captures can be filtered by node. Frames carry their channel
+    in an IEEE 802.15.4 TAP header.
+    """
+
+    EXTENSION = 'pcapng'
+
+    # Block header, TAP header, FCS type TLV and channel assignment TLV
+    _record_header_struct = struct.Struct("<LLLLLLL" + "BBH" + "HHB3x" + "HHHB1x")
+
+    def __init__(self, filename, *args, **kwargs):
+        # Interface ids by node id, in order of creation
+        self._interfaces = {}
+        super(PcapngCodec, self).__init__(filename, *args, **kwargs)
+
+    def _open_file(self):
+        super(PcapngCodec, self)._open_file()
+
+        # Describe the interfaces again so that ids stay the same in all files
+        for nodeid, _ in sorted(self._interfaces.items(), key=lambda item: item[1]):
+            self._write(self.encode_interface_description(nodeid))
+
+    def _encode_block(self, block_type, body):
+        padding = -len(body) % 4
+        length = 12 + len(body) + padding
+        return (
+            struct.pack("<LL", block_type, length)
+            + body
+            + b'\x00' * padding
+            + struct.pack("<L", length)
+        )
+
+    def _encode_option(self, code, value):
+        padding = -len(value) % 4
+        return struct.pack("<HH", code, len(value)) + value + b'\x00' * padding
+
+    def encode_header(self):
+        """ Returns a pcapng Section Header Block. """
+        body = struct.pack(
+            "<LHHq",
+            PCAPNG_BYTE_ORDER_MAGIC,
+            PCAPNG_VERSION_MAJOR,
+            PCAPNG_VERSION_MINOR,
+            -1,
+        )
+        return self._encode_block(PCAPNG_BLOCK_TYPE_SHB, body)
+
+    def encode_interface_description(self, nodeid):
+        """ Returns a pcapng Interface Description Block of the node. """
+        name = 'node%d' % nodeid if nodeid is not None else 'sniffer'
+
+        body = struct.pack("<HHL", DLT_IEEE802_15_4_TAP, 0, 0)
+        body += self._encode_option(PCAPNG_OPTION_IF_NAME, name.encode('ascii'))
+        body += self._encode_option(PCAPNG_OPTION_IF_TSRESOL, struct.pack("<B", 6))
+        body += self._encode_option(PCAPNG_OPTION_END, b'')
+        return self._encode_block(PCAPNG_BLOCK_TYPE_IDB, body)
+
+    def _interface_id(self, nodeid):
+        interface_id = self._interfaces.get(nodeid)
+        if interface_id is None:
+            interface_id = len(self._interfaces)
+            self._interfaces[nodeid] = interface_id
+            self._write(self.encode_interface_description(nodeid))
+        return interface_id
+
+    def encode_frame(self, frame, sec, usec, nodeid=None):
+        """ Returns a pcapng Enhanced Packet Block of the given frame. """
+        header = bytearray(self._record_header_struct.size)
+        trailer = self._pack_record_header(
+            header, self._interfaces.get(nodeid, 0), frame, sec, usec
+        )
+        return bytes(header) + bytes(frame[1:]) + trailer
+
+    def _pack_record_header(self, header, interface_id, frame, sec, usec):
+        """ Fills the record header and returns the padding and trailer. """
+        channel = struct.unpack_from("<B", frame)[0]
+        captured_length = 20 + len(frame) - 1
+        padding = -captured_length % 4
+        block_length = self._record_header_struct.size + len(frame) - 1 + padding + 4
+        timestamp = sec * 1000000 + usec
+
+        self._record_header_struct.pack_into(
+            header,
+            0,
+            PCAPNG_BLOCK_TYPE_EPB,
+            block_length,
+            interface_id,
+            timestamp >> 32,
+            timestamp & 0xFFFFFFFF,
+            captured_length,
+            captured_length,
+            # TAP header
+            0,
+            0,
+            20,
+            # FCS type TLV
+            TAP_TLV_FCS_TYPE,
+            1,
+            TAP_FCS_TYPE_16_BIT_CRC,
+            # Channel assignment TLV
+            TAP_TLV_CHANNEL_ASSIGNMENT,
+            3,
+            channel,
+            0,
+        )
+
+        return b'\x00' * padding + struct.pack("<L", block_length)
+
+    def _write_frame(self, frame, sec, usec, nodeid):
+        interface_id = self._interface_id(nodeid)
+        trailer = self._pack_record_header(
+            self._record_header, interface_id, frame, sec, usec
+        )
+        self._write(self._record_header)
+        self._write(memoryview(frame)[1:])
+        self._write(trailer)
+
+
+def create_codec(filename):
+    """ Returns the codec selected by the PCAP* environment variables. """
+    if PCAPNG:
+        return PcapngCodec(filename)
+    return PcapCodec(filename)
+
+
+class PcapReader(object):
+    """ Streaming reader of .pcap and .pcapng files with 802.15.4 frames.
+
+    Frames are read one by one, so captures of any size are read in
+    constant memory.
+    """
+
+    def __init__(self, filename):
+        self._pcap_file = open(filename, 'rb')
+        try:
+            self._parse_header()
+        except Exception:
+            self._pcap_file.close()
+            raise
+
+    def _parse_header(self):
+        header = self._pcap_file.read(PCAP_HEADER_LENGTH)
+        if len(header) < PCAP_HEADER_LENGTH:
+            raise ValueError("Truncated pcap file header")
+
+        if struct.unpack("<L", header[:4])[0] == PCAPNG_BLOCK_TYPE_SHB:
+            self._parse_section_header(header)
+            return
+
+        for endianness in ('<', '>'):
+            magic_number = struct.unpack(endianness + 'L', header[:4])[0]
+            if magic_number in (PCAP_MAGIC_NUMBER, PCAP_MAGIC_NUMBER_NANOSEC):
+                break
+        else:
+            raise ValueError("Not a pcap file")
+
+        self._pcapng = False
+        self._endianness = endianness
+        self._nanosec = magic_number == PCAP_MAGIC_NUMBER_NANOSEC
+
+        self.link_type = struct.unpack(endianness + 'L', header[20:24])[0]
+        self._check_link_type(self.link_type)
+
+    def _parse_section_header(self, header):
+        for endianness in ('<', '>'):
+            byte_order_magic = struct.unpack(endianness + 'L', header[8:12])[0]
+            if byte_order_magic == PCAPNG_BYTE_ORDER_MAGIC:
+                break
+        else:
+            raise ValueError("Not a pcapng file")
+
+        self._pcapng = True
+        self._endianness = endianness
+
+        # Link type and timestamp resolution of each interface
+        self._interfaces = []
+
+        block_length = struct.unpack(endianness + 'L', header[4:8])[0]
+        self._pcap_file.read(block_length - PCAP_HEADER_LENGTH)
+
+    def _check_link_type(self, link_type):
+        if link_type not in (
+            DLT_IEEE802_15_4,
+            DLT_IEEE802_15_4_NOFCS,
+            DLT_IEEE802_15_4_TAP,
+        ):
+            raise ValueError("Unsupported link type: {}".format(link_type))
+
+    def __iter__(self):
+        """ Yields (frame, (sec, usec)) tuples.
+
+        Frames always end with the FCS. A truncated last record, e.g. of a
+        capture still being written, is ignored.
+        """
+        for frame, timestamp, _ in self.iter_with_channel():
+            yield frame, timestamp
+
+    def iter_with_channel(self):
+        """ Yields (frame, (sec, usec), channel) tuples.
+
+        The channel is the one recorded in the IEEE 802.15.4 TAP header of
+        the frame, None if the capture does not record it.
+        """
+        if self._pcapng:
+            records = self._read_pcapng_records()
+        else:
+            records = self._read_pcap_records()
+
+        for link_type, frame, timestamp in records:
+            channel = None
+            if link_type == DLT_IEEE802_15_4_TAP:
+                tap_length = struct.unpack_from("<H", frame, 2)[0]
+                channel = self._parse_tap_channel(frame, tap_length)
+                frame = frame[tap_length:]
+            elif link_type == DLT_IEEE802_15_4_NOFCS:
+                frame += b'\x00\x00'
+
+            yield frame, timestamp, channel
+
+    @staticmethod
+    def _parse_tap_channel(frame, tap_length):
+        offset = 4
+        while offset + 4 <= tap_length:
+            tlv_type, length = struct.unpack_from("<HH", frame, offset)
+            if tlv_type == TAP_TLV_CHANNEL_ASSIGNMENT and length >= 2:
+                return struct.unpack_from("<H", frame, offset + 4)[0]
+            offset += 4 + length + (-length % 4)
+
+        return None
+
+    def _read_pcap_records(self):
+        record_header = struct.Struct(self._endianness + 'LLLL')
+
+        while True:
+            header = self._pcap_file.read(PCAP_RECORD_HEADER_LENGTH)
+            if len(header) < PCAP_RECORD_HEADER_LENGTH:
+                return
+
+            sec, usec, incl_len, _ = record_header.unpack(header)
+
+            frame = self._pcap_file.read(incl_len)
+            if len(frame) < incl_len:
+                return
+
+            if self._nanosec:
+                usec //= 1000
+
+            yield self.link_type, frame, (sec, usec)
+
+    def _read_pcapng_records(self):
+        block_header = struct.Struct(self._endianness + 'LL')
+
+        while True:
+            header = self._pcap_file.read(block_header.size)
+            if len(header) < block_header.size:
+                return
+
+            block_type, block_length = block_header.unpack(header)
+
+            body = self._pcap_file.read(block_length - block_header.size)
+            if len(body) < block_length - block_header.size:
+                return
+
+            if block_type == PCAPNG_BLOCK_TYPE_IDB:
+                self._interfaces.append(self._parse_interface_description(body))
+
+            elif block_type == PCAPNG_BLOCK_TYPE_EPB:
+                yield self._parse_enhanced_packet(body)
+
+            elif block_type == PCAPNG_BLOCK_TYPE_SHB:
+                # A new section describes its interfaces again
+                self._interfaces = []
+
+    def _parse_interface_description(self, body):
+        link_type = struct.unpack_from(self._endianness + 'H', body)[0]
+        self._check_link_type(link_type)
+
+        units_per_second = 1000000
+        offset = 8
+        while offset + 4 <= len(body) - 4:
+            code, length = struct.unpack_from(self._endianness + 'HH', body, offset)
+            if code == PCAPNG_OPTION_END:
+                break
+            if code == PCAPNG_OPTION_IF_TSRESOL:
+                tsresol = struct.unpack_from('B', body, offset + 4)[0]
+                if tsresol & 0x80:
+                    units_per_second = 2 ** (tsresol & 0x7F)
+                else:
+                    units_per_second = 10 ** tsresol
+            offset += 4 + length + (-length % 4)
+
+        return link_type, units_per_second
+
+    def _parse_enhanced_packet(self, body):
+        interface_id, timestamp_high, timestamp_low, captured_length = struct.unpack_from(
+            self._endianness + 'LLLL', body
+        )
+        link_type, units_per_second = self._interfaces[interface_id]
+
+        timestamp = (timestamp_high << 32) | timestamp_low
+        sec = timestamp // units_per_second
+        usec = (timestamp % units_per_second) * 1000000 // units_per_second
+
+        frame = body[20:20 + captured_length]
+        return link_type, frame, (sec, usec)
+
+    def close(self):
         self._pcap_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
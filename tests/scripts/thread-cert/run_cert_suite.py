@@ -0,0 +1,389 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+""" Parallel runner of the thread-cert suite.
+
+Runs the Cert_*.py scripts in a pool of workers. Each worker owns a unique
+PORT_OFFSET, so the simulators, nodes and sniffers of concurrent tests use
+disjoint ports, and each test writes its capture to its own TEST_NAME. The
+offsets are locked the same way as by the automake test driver, so the
+runner can share a machine with `make check -j`.
+
+Tests are started longest first, using the durations recorded by previous
+runs, so the last tests to finish are short ones. Results are printed like
+the automake driver does and can be written as JUnit XML and JSON reports.
+
+Usage:
+    python run_cert_suite.py [-j JOBS] [--junit FILE] [--json FILE] [TEST ...]
+"""
+
+import argparse
+import glob
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from multiprocessing.pool import ThreadPool
+from xml.sax.saxutils import escape, quoteattr
+
+try:
+    import Queue
+except ImportError:
+    import queue as Queue
+
+# File with the durations of the tests recorded by previous runs
+DURATIONS_FILE = '.cert_durations.json'
+
+# Lock directories shared with third_party/openthread-test-driver
+OFFSET_LOCK_PATH = '/tmp/offset'
+
+# Seconds after which a test is killed
+DEFAULT_TIMEOUT = 1800
+
+# Exit statuses of the automake test protocol
+EXIT_SKIP = 77
+EXIT_HARD_ERROR = 99
+
+
+class PortOffsets(object):
+    """ Pool of PORT_OFFSET values locked for the workers of this run. """
+
+    def __init__(self, count, lock_path=None):
+        self._lock_path = lock_path or OFFSET_LOCK_PATH
+        self._offsets = Queue.Queue()
+        self._locked = []
+        self._lock = threading.Lock()
+        self._next_offset = 0
+
+        for _ in range(count):
+            self._offsets.put(self._lock_next())
+
+    def _lock_dir(self, offset):
+        return '%s.%d.lock.d' % (self._lock_path, offset)
+
+    def _lock_next(self):
+        with self._lock:
+            while True:
+                offset = self._next_offset
+                self._next_offset += 1
+                try:
+                    os.mkdir(self._lock_dir(offset))
+                except OSError:
+                    continue
+                self._locked.append(offset)
+                return offset
+
+    def acquire(self):
+        return self._offsets.get()
+
+    def release(self, offset):
+        self._offsets.put(offset)
+
+    def retire(self, offset):
+        """ Replace an offset which may still be used by a killed test.
+
+        The ports of a timed-out test can be held for a while after the kill,
+        so its offset stays locked but is not given to another test.
+        """
+        self._offsets.put(self._lock_next())
+
+    def close(self):
+        for offset in self._locked:
+            os.rmdir(self._lock_dir(offset))
+        self._locked = []
+
+
+class TestResult(object):
+
+    def __init__(self, name, status, exit_status, duration, log_file):
+        self.name = name
+        self.status = status
+        self.exit_status = exit_status
+        self.duration = duration
+        self.log_file = log_file
+
+    @property
+    def failed(self):
+        return self.status not in ('PASS', 'SKIP')
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'status': self.status,
+            'exit_status': self.exit_status,
+            'duration': round(self.duration, 3),
+            'log': self.log_file,
+        }
+
+
+def load_durations(filename):
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def save_durations(filename, durations, results):
+    durations = dict(durations)
+    for result in results:
+        if result.status in ('PASS', 'FAIL'):
+            durations[result.name] = round(result.duration, 3)
+
+    with open(filename, 'w') as f:
+        json.dump(durations, f, indent=2, sort_keys=True)
+
+
+def schedule(tests, durations):
+    """ Order tests longest first. Tests without a recorded duration are
+    assumed to be as long as the longest known one, so they start early. """
+    default = max(durations.values()) if durations else 0
+    return sorted(
+        tests, key=lambda test: (-durations.get(_test_name(test), default), test)
+    )
+
+
+def _test_name(test):
+    return os.path.splitext(os.path.basename(test))[0]
+
+
+def _status_from(exit_status):
+    if exit_status == 0:
+        return 'PASS'
+    elif exit_status == EXIT_SKIP:
+        return 'SKIP'
+    elif exit_status == EXIT_HARD_ERROR:
+        return 'ERROR'
+    elif exit_status is None:
+        return 'TIMEOUT'
+    return 'FAIL'
+
+
+def _remove_flash_files(offset):
+    for pattern in ('tmp/%d_*.flash', 'tmp/%d_*.data', 'tmp/%d_*.swap'):
+        for filename in glob.glob(pattern % offset):
+            os.remove(filename)
+
+
+def _kill_process_group(process):
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def run_test(test, port_offsets, output_dir, timeout=DEFAULT_TIMEOUT, env=None):
+    """ Run one test script with a PORT_OFFSET of the pool. """
+    name = _test_name(test)
+    log_file = os.path.join(output_dir, name + '.log')
+
+    test_env = dict(os.environ if env is None else env)
+    test_env.setdefault('VERBOSE', '1')
+    test_env['TEST_NAME'] = os.path.join(output_dir, name)
+
+    offset = port_offsets.acquire()
+    timed_out = False
+    try:
+        test_env['PORT_OFFSET'] = str(offset)
+
+        start = time.time()
+        with open(log_file, 'w') as log:
+            # The test runs in its own session, so the simulator and nodes it
+            # spawned are killed with it on timeout.
+            process = subprocess.Popen(
+                [sys.executable, test], stdout=log, stderr=subprocess.STDOUT,
+                env=test_env, preexec_fn=os.setsid)
+
+            timer = threading.Timer(timeout, _kill_process_group, [process])
+            timer.start()
+            try:
+                exit_status = process.wait()
+            finally:
+                timed_out = not timer.is_alive()
+                timer.cancel()
+        duration = time.time() - start
+
+        _remove_flash_files(offset)
+    finally:
+        if timed_out:
+            port_offsets.retire(offset)
+        else:
+            port_offsets.release(offset)
+
+    status = _status_from(None if timed_out else exit_status)
+
+    with open(log_file, 'a') as log:
+        log.write('%s %s (exit status: %s)\n' % (status, name, exit_status))
+
+    return TestResult(name, status, exit_status, duration, log_file)
+
+
+def run_suite(tests, jobs, output_dir='.', timeout=DEFAULT_TIMEOUT,
+              durations_file=DURATIONS_FILE, on_result=None):
+    """ Run the tests in a pool of jobs workers.
+
+    Returns:
+        list: TestResult of each test, in the order of the given tests.
+    """
+    durations = load_durations(durations_file) if durations_file else {}
+    ordered_tests = schedule(tests, durations)
+    jobs = max(1, min(jobs, len(ordered_tests)))
+
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    port_offsets = PortOffsets(jobs)
+    pool = ThreadPool(jobs)
+    try:
+        results = {}
+        for result in pool.imap_unordered(
+                lambda test: run_test(test, port_offsets, output_dir, timeout),
+                ordered_tests):
+            results[result.name] = result
+            if on_result is not None:
+                on_result(result)
+    finally:
+        pool.close()
+        pool.join()
+        port_offsets.close()
+
+    results = [results[_test_name(test)] for test in tests]
+
+    if durations_file:
+        save_durations(durations_file, durations, results)
+
+    return results
+
+
+def write_json_report(filename, results, elapsed):
+    report = {
+        'elapsed': round(elapsed, 3),
+        'summary': _summary(results),
+        'tests': [result.to_dict() for result in results],
+    }
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def write_junit_report(filename, results, elapsed):
+    summary = _summary(results)
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<testsuite name="thread-cert" tests="%d" failures="%d" errors="%d" skipped="%d" time="%.3f">' % (
+            len(results), summary.get('FAIL', 0) + summary.get('TIMEOUT', 0),
+            summary.get('ERROR', 0), summary.get('SKIP', 0), elapsed),
+    ]
+    for result in results:
+        lines.append('  <testcase classname="thread-cert" name=%s time="%.3f">' % (
+            quoteattr(result.name), result.duration))
+        if result.status == 'SKIP':
+            lines.append('    <skipped/>')
+        elif result.status == 'ERROR':
+            lines.append('    <error message=%s/>' % quoteattr(
+                'exit status %s, see %s' % (result.exit_status, result.log_file)))
+        elif result.failed:
+            lines.append('    <failure message=%s>%s</failure>' % (
+                quoteattr('%s, see %s' % (result.status, result.log_file)),
+                escape(_log_tail(result.log_file))))
+        lines.append('  </testcase>')
+    lines.append('</testsuite>')
+
+    with open(filename, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+
+def _log_tail(log_file, lines=50):
+    try:
+        with open(log_file) as f:
+            return ''.join(f.readlines()[-lines:])
+    except IOError:
+        return ''
+
+
+def _summary(results):
+    summary = {}
+    for result in results:
+        summary[result.status] = summary.get(result.status, 0) + 1
+    return summary
+
+
+def _default_jobs():
+    try:
+        import multiprocessing
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('tests', nargs='*',
+                        help='test scripts to run, all Cert_*.py if none')
+    parser.add_argument('-j', '--jobs', type=int, default=_default_jobs(),
+                        help='number of tests run in parallel')
+    parser.add_argument('-o', '--output-dir', default='.',
+                        help='directory of the logs and captures')
+    parser.add_argument('-t', '--timeout', type=float, default=DEFAULT_TIMEOUT,
+                        help='seconds after which a test is killed')
+    parser.add_argument('--durations', default=DURATIONS_FILE,
+                        help='file with the recorded test durations')
+    parser.add_argument('--junit', help='write a JUnit XML report')
+    parser.add_argument('--json', help='write a JSON report')
+    args = parser.parse_args()
+
+    tests = args.tests or sorted(glob.glob('Cert_*.py'))
+
+    def print_result(result):
+        print('%s: %s (%.1f s)' % (result.status, result.name, result.duration))
+        sys.stdout.flush()
+
+    start = time.time()
+    results = run_suite(tests, args.jobs, args.output_dir, args.timeout,
+                        args.durations, print_result)
+    elapsed = time.time() - start
+
+    if args.junit:
+        write_junit_report(args.junit, results, elapsed)
+    if args.json:
+        write_json_report(args.json, results, elapsed)
+
+    summary = _summary(results)
+    print('')
+    print('# TOTAL: %d in %.1f s' % (len(results), elapsed))
+    for status in ('PASS', 'SKIP', 'FAIL', 'TIMEOUT', 'ERROR'):
+        print('# %s: %d' % (status, summary.get(status, 0)))
+
+    return 1 if any(result.failed for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
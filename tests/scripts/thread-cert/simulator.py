@@ -28,8 +28,10 @@
 #
 
 import binascii
-import bisect
+import collections
+import heapq
 import os
+import select
 import socket
 import struct
 import traceback
@@ -40,6 +42,7 @@ import config
 import mesh_cop
 import message
 import pcap
+import simulator_transport
 
 
 def dbg_print(*args):
@@ -47,6 +50,84 @@ def dbg_print(*args):
         print(args)
 
 
+class EventQueue(object):
+    """ Priority queue of simulator events ordered by (time, sequence).
+
+    Events are tuples whose first two fields are the event time and a
+    sequence number allocated by the queue, so events scheduled for the same
+    time are delivered in insertion order. Cancelled events are left in the
+    heap as tombstones and dropped lazily when they reach the top, or all at
+    once when they make up more than half of the heap.
+    """
+
+    COMPACT_THRESHOLD = 64
+
+    def __init__(self):
+        self._heap = []
+        self._cancelled = set()
+        self._sequence = 0
+
+    def push(self, event_time, *fields):
+        """ Schedule an event and return it.
+
+        Args:
+            event_time (int): time of the event in microseconds.
+            fields: remaining event fields (address, type, length, data).
+
+        Returns:
+            tuple: the scheduled event, which can be passed to cancel().
+        """
+        event = (event_time, self._sequence) + fields
+        self._sequence += 1
+        heapq.heappush(self._heap, event)
+        return event
+
+    def cancel(self, event):
+        """ Cancel a previously scheduled event. """
+        self._cancelled.add(event[1])
+
+        if (
+            len(self._cancelled) > self.COMPACT_THRESHOLD
+            and len(self._cancelled) * 2 > len(self._heap)
+        ):
+            self._heap = [
+                e for e in self._heap if e[1] not in self._cancelled
+            ]
+            heapq.heapify(self._heap)
+            self._cancelled.clear()
+
+    def _drop_cancelled(self):
+        heap = self._heap
+        cancelled = self._cancelled
+        while heap and heap[0][1] in cancelled:
+            cancelled.remove(heapq.heappop(heap)[1])
+
+    def peek(self):
+        """ Return the earliest pending event without removing it, or None. """
+        if self._cancelled:
+            self._drop_cancelled()
+        return self._heap[0] if self._heap else None
+
+    def pop(self):
+        """ Remove and return the earliest pending event. """
+        if self._cancelled:
+            self._drop_cancelled()
+        return heapq.heappop(self._heap)
+
+    def __len__(self):
+        return len(self._heap) - len(self._cancelled)
+
+    def __iter__(self):
+        """ Iterate over pending events in delivery order. """
+        return iter(
+            sorted(
+                event
+                for event in self._heap
+                if event[1] not in self._cancelled
+            )
+        )
+
+
 class BaseSimulator(object):
     def __init__(self):
         self._nodes = {}
@@ -75,6 +156,16 @@ class BaseSimulator(object):
     def stop(self):
         raise NotImplementedError
 
+    def wait_readable(self, fds, timeout):
+        """ Wait until one of the file descriptors is readable.
+
+        Returns:
+            bool: True if one of fds is readable, False on timeout or when
+                the simulator has events to process first.
+        """
+        readable, _, _ = select.select(fds, [], [], timeout)
+        return bool(readable)
+
     def read_cert_messages_in_commissioning_log(self, nodeids):
         for nodeid in nodeids:
             node = self._nodes[nodeid]
@@ -144,21 +235,21 @@ class VirtualTime(BaseSimulator):
 
     def __init__(self):
         super(VirtualTime, self).__init__()
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
         ip = '127.0.0.1'
         self.port = self.BASE_PORT + (self.PORT_OFFSET * self.MAX_NODES)
-        self.sock.bind((ip, self.port))
+
+        transport_factory = simulator_transport.SimulatorTransportFactory()
+        self._transport = transport_factory.create_transport()
+        self._transport.open((ip, self.port))
 
         self.devices = {}
-        self.event_queue = []
-        # there could be events scheduled at exactly the same time
-        self.event_sequence = 0
+        self.event_queue = EventQueue()
         self.current_time = 0
         self.current_event = None
         self.awake_devices = set()
 
-        self._pcap = pcap.PcapCodec(os.getenv('TEST_NAME', 'current'))
+        self._pcap = pcap.create_codec(os.getenv('TEST_NAME', 'current'))
         # the addr for spinel-cli sending OT_SIM_EVENT_POSTCMD
         self._spinel_cli_addr = (ip, self.BASE_PORT + self.port)
         self.current_nodeid = None
@@ -167,19 +258,27 @@ class VirtualTime(BaseSimulator):
         self._message_factory = config.create_default_thread_message_factory()
 
     def __del__(self):
-        if self.sock:
+        if self._transport.is_opened:
             self.stop()
 
     def stop(self):
-        self.sock.close()
-        self.sock = None
+        self._transport.close()
+        self._pcap.flush()
 
-    def _add_message(self, nodeid, message):
+    def _add_message(self, nodeid, message, timestamp=None):
         addr = ('127.0.0.1', self.port + nodeid)
 
+        if config.LAZY_MESSAGE_DECODING:
+            self.devices[addr]['msgs'].append(
+                self._message_factory.create_lazy(message, timestamp)
+            )
+            return
+
         # Ignore any exceptions
         try:
-            messages = self._message_factory.create(io.BytesIO(message))
+            messages = self._message_factory.create(
+                io.BytesIO(message), timestamp
+            )
             self.devices[addr]['msgs'] += messages
 
         except Exception as e:
@@ -231,45 +330,49 @@ class VirtualTime(BaseSimulator):
             return ('127.0.0.1', self.port + nodeid)
 
     def _next_event_time(self):
-        if len(self.event_queue) == 0:
+        event = self.event_queue.peek()
+        if event is None:
             return self.END_OF_TIME
         else:
-            return self.event_queue[0][0]
+            return event[self.EVENT_TIME]
 
     def receive_events(self):
         """ Receive events until all devices are asleep. """
+        pending = collections.deque()
         while True:
-            if (
-                self.current_event
-                or len(self.awake_devices)
-                or (
-                    self._next_event_time() > self._pause_time
-                    and self.current_nodeid
-                )
-            ):
-                self.sock.settimeout(self.BLOCK_TIMEOUT)
-                try:
-                    msg, addr = self.sock.recvfrom(self.MAX_MESSAGE)
-                except socket.error:
-                    # print debug information on failure
-                    print('Current nodeid:')
-                    print(self.current_nodeid)
-                    print('Current awake:')
-                    print(self.awake_devices)
-                    print('Current time:')
-                    print(self.current_time)
-                    print('Current event:')
-                    print(self.current_event)
-                    print('Events:')
-                    for event in self.event_queue:
-                        print(event)
-                    raise
-            else:
-                self.sock.settimeout(0)
-                try:
-                    msg, addr = self.sock.recvfrom(self.MAX_MESSAGE)
-                except socket.error:
-                    break
+            if not pending:
+                if (
+                    self.current_event
+                    or len(self.awake_devices)
+                    or (
+                        self._next_event_time() > self._pause_time
+                        and self.current_nodeid
+                    )
+                ):
+                    try:
+                        pending.extend(
+                            self._transport.recv(self.BLOCK_TIMEOUT)
+                        )
+                    except socket.error:
+                        # print debug information on failure
+                        print('Current nodeid:')
+                        print(self.current_nodeid)
+                        print('Current awake:')
+                        print(self.awake_devices)
+                        print('Current time:')
+                        print(self.current_time)
+                        print('Current event:')
+                        print(self.current_event)
+                        print('Events:')
+                        for event in self.event_queue:
+                            print(event)
+                        raise
+                else:
+                    pending.extend(self._transport.recv(0))
+                    if not pending:
+                        break
+
+            msg, addr = pending.popleft()
 
             if addr != self._spinel_cli_addr and addr not in self.devices:
                 self.devices[addr] = {}
@@ -299,14 +402,12 @@ class VirtualTime(BaseSimulator):
             if type == self.OT_SIM_EVENT_ALARM_FIRED:
                 # remove any existing alarm event for device
                 if self.devices[addr]['alarm']:
-                    self.event_queue.remove(self.devices[addr]['alarm'])
+                    self.event_queue.cancel(self.devices[addr]['alarm'])
                     # print "-- Remove\t", self.devices[addr]['alarm']
 
                 # add alarm event to event queue
-                event = (event_time, self.event_sequence, addr, type, datalen)
-                self.event_sequence += 1
+                event = self.event_queue.push(event_time, addr, type, datalen)
                 # print "-- Enqueue\t", event, delay, self.current_time
-                bisect.insort(self.event_queue, event)
                 self.devices[addr]['alarm'] = event
 
                 self.awake_devices.discard(addr)
@@ -323,34 +424,17 @@ class VirtualTime(BaseSimulator):
                 # add radio receive events event queue
                 for device in self.devices:
                     if device != addr and self._is_radio(device):
-                        event = (
-                            event_time,
-                            self.event_sequence,
-                            device,
-                            type,
-                            datalen,
-                            data,
+                        event = self.event_queue.push(
+                            event_time, device, type, datalen, data
                         )
-                        self.event_sequence += 1
                         # print "-- Enqueue\t", event
-                        bisect.insort(self.event_queue, event)
 
-                self._pcap.append(
-                    data, (event_time // 1000000, event_time % 1000000)
-                )
-                self._add_message(addr[1] - self.port, data)
+                timestamp = (event_time // 1000000, event_time % 1000000)
+                self._pcap.append(data, timestamp, addr[1] - self.port)
+                self._add_message(addr[1] - self.port, data, timestamp)
 
                 # add radio transmit done events to event queue
-                event = (
-                    event_time,
-                    self.event_sequence,
-                    addr,
-                    type,
-                    datalen,
-                    data,
-                )
-                self.event_sequence += 1
-                bisect.insort(self.event_queue, event)
+                self.event_queue.push(event_time, addr, type, datalen, data)
 
                 self.awake_devices.add(addr)
 
@@ -360,16 +444,13 @@ class VirtualTime(BaseSimulator):
                 if radio_addr not in self.devices:
                     self.awake_devices.add(radio_addr)
 
-                event = (
+                self.event_queue.push(
                     event_time,
-                    self.event_sequence,
                     radio_addr,
                     self.OT_SIM_EVENT_UART_WRITE,
                     datalen,
                     data,
                 )
-                self.event_sequence += 1
-                bisect.insort(self.event_queue, event)
 
                 self.awake_devices.add(addr)
 
@@ -379,16 +460,13 @@ class VirtualTime(BaseSimulator):
                 if core_addr not in self.devices:
                     self.awake_devices.add(core_addr)
 
-                event = (
+                self.event_queue.push(
                     event_time,
-                    self.event_sequence,
                     core_addr,
                     self.OT_SIM_EVENT_RADIO_SPINEL_WRITE,
                     datalen,
                     data,
                 )
-                self.event_sequence += 1
-                bisect.insort(self.event_queue, event)
 
                 self.awake_devices.add(addr)
 
@@ -399,22 +477,21 @@ class VirtualTime(BaseSimulator):
                     self.current_nodeid = None
 
     def _send_message(self, message, addr):
-        while True:
-            try:
-                sent = self.sock.sendto(message, addr)
-            except socket.error:
-                traceback.print_exc()
-                time.sleep(0)
-            else:
-                break
-        assert sent == len(message)
+        self._transport.send(message, addr)
+
+    def wait_readable(self, fds, timeout):
+        transport_fd = self._transport.fileno()
+        readable, _, _ = select.select(
+            list(fds) + [transport_fd], [], [], timeout
+        )
+        return any(fd != transport_fd for fd in readable)
 
     def process_next_event(self):
         assert self.current_event is None
         assert self._next_event_time() < self.END_OF_TIME
 
         # process next event
-        event = self.event_queue.pop(0)
+        event = self.event_queue.pop()
 
         if len(event) == 5:
             event_time, sequence, addr, type, datalen = event
@@ -470,11 +547,27 @@ class VirtualTime(BaseSimulator):
         self.awake_devices.clear()
 
     def go(self, duration, nodeid=None):
+        """ Run the simulation for duration seconds.
+
+        Args:
+            nodeid (int or list): node(s) which were just sent a CLI command
+                and must process it before the simulation pauses.
+        """
         assert self.current_time == self._pause_time
+
+        if isinstance(nodeid, (list, tuple, set)) and self.NCP_SIM:
+            # spinel-cli reports one processed command at a time
+            for one_nodeid in nodeid:
+                self.go(0, one_nodeid)
+            nodeid = None
+
         duration = int(duration) * 1000000
         dbg_print('running for %d us' % duration)
         self._pause_time += duration
-        if nodeid:
+        if isinstance(nodeid, (list, tuple, set)):
+            for one_nodeid in nodeid:
+                self.awake_devices.add(self._core_addr_from(one_nodeid))
+        elif nodeid:
             if self.NCP_SIM:
                 self.current_nodeid = nodeid
             self.awake_devices.add(self._core_addr_from(nodeid))
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+
+import errno
+import select
+import socket
+import traceback
+
+
+class SimulatorTransport(object):
+    """ Interface for transport that exchanges events with simulated nodes.
+
+    Every event is a single datagram carrying the `=QBH` event header
+    followed by the event payload. Implementations are free to batch
+    datagrams as long as ordering per peer is preserved.
+    """
+
+    def open(self, address):
+        """ Open transport and bind it to the address.
+
+        Args:
+            address (tuple): local (ip, port) to bind to.
+
+        Raises:
+            RuntimeError: when transport is already opened.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """ Close transport.
+
+        Raises:
+            RuntimeError: when transport is already closed.
+        """
+        raise NotImplementedError
+
+    @property
+    def is_opened(self):
+        """ Check if transport is opened.
+
+        Returns:
+            bool: True if the transport is opened, False in otherwise
+        """
+        raise NotImplementedError
+
+    def fileno(self):
+        """ File descriptor which becomes readable when events arrive. """
+        raise NotImplementedError
+
+    def send(self, data, address):
+        """ Queue data to be sent to the address.
+
+        Queued data is written out by flush() and, at the latest, before the
+        transport waits for incoming data.
+
+        Args:
+            data (bytes): outcoming data.
+            address (tuple): destination (ip, port).
+        """
+        raise NotImplementedError
+
+    def flush(self):
+        """ Write out all queued data. """
+        raise NotImplementedError
+
+    def recv(self, timeout):
+        """ Receive all pending datagrams.
+
+        Args:
+            timeout (float): seconds to wait for the first datagram. Zero
+                makes the call return immediately and ignore socket errors.
+
+        Returns:
+            list: (data, address) tuples in arrival order. Empty only when
+                timeout is zero and nothing is pending.
+
+        Raises:
+            socket.timeout: when nothing arrived within a non-zero timeout.
+        """
+        raise NotImplementedError
+
+
+class SimulatorSocketTransport(SimulatorTransport):
+    """ Non-blocking UDP socket implementation of simulator transport.
+
+    The socket is never switched between blocking and non-blocking mode.
+    Readiness is checked with select() and each wakeup drains every datagram
+    already queued in the socket receive buffer.
+    """
+
+    MAX_MESSAGE = 1024
+
+    def __init__(self):
+        self._socket = None
+        self._send_queue = []
+
+    def __del__(self):
+        if not self.is_opened:
+            return
+
+        self.close()
+
+    def open(self, address):
+        if self.is_opened:
+            raise RuntimeError("Transport is already opened.")
+
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setblocking(False)
+        self._socket.bind(address)
+
+    def close(self):
+        if not self.is_opened:
+            raise RuntimeError("Transport is closed.")
+
+        self._socket.close()
+        self._socket = None
+        self._send_queue = []
+
+    @property
+    def is_opened(self):
+        return bool(self._socket is not None)
+
+    def fileno(self):
+        return self._socket.fileno()
+
+    def send(self, data, address):
+        self._send_queue.append((data, address))
+
+    def _sendto(self, data, address):
+        while True:
+            try:
+                sent = self._socket.sendto(data, address)
+            except socket.error as e:
+                if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    traceback.print_exc()
+                select.select([], [self._socket], [])
+            else:
+                break
+        assert sent == len(data)
+
+    def flush(self):
+        send_queue, self._send_queue = self._send_queue, []
+        for data, address in send_queue:
+            self._sendto(data, address)
+
+    def _drain(self, ignore_errors=False):
+        datagrams = []
+        while True:
+            try:
+                datagrams.append(self._socket.recvfrom(self.MAX_MESSAGE))
+            except socket.error as e:
+                if e.args[0] not in (errno.EAGAIN, errno.EWOULDBLOCK) and not ignore_errors:
+                    raise
+                return datagrams
+
+    def recv(self, timeout):
+        self.flush()
+
+        # A non-blocking poll ends on any socket error, like a failed
+        # recvfrom() with a zero timeout always did.
+        datagrams = self._drain(ignore_errors=(timeout == 0))
+        if datagrams or timeout == 0:
+            return datagrams
+
+        readable, _, _ = select.select([self._socket], [], [], timeout)
+        if not readable:
+            raise socket.timeout("No event received in %s seconds" % timeout)
+
+        return self._drain()
+
+
+class SimulatorTransportFactory(object):
+    def create_transport(self):
+        return SimulatorSocketTransport()
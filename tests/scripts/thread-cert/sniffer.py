@@ -33,6 +33,7 @@ import logging
 import os
 import pcap
 import threading
+import time
 import traceback
 
 try:
@@ -48,12 +49,35 @@ class Sniffer:
 
     """ Class representing the Sniffing node, whose main task is listening
         and logging message exchange performed by other nodes.
+
+        Frames flow through a pipeline so that receiving never waits for
+        decoding:
+
+            receive thread -> dispatcher thread -> decode thread -> buckets
+
+        The receive thread only timestamps frames and buffers them. The
+        dispatcher writes them to the pcap file in arrival order and hands
+        them to the decode thread. A single decode thread owns the message
+        factory and decodes all frames in arrival order, as state learnt from
+        one node (e.g. device descriptors from MLE frames) is needed to decode
+        frames of other nodes.
     """
 
     logger = logging.getLogger("sniffer.Sniffer")
 
     RECV_BUFFER_SIZE = 4096
 
+    # Maximum number of received frames waiting for the dispatcher
+    RAW_QUEUE_SIZE = 4096
+
+    # Frames decoded later than this after reception are counted as late
+    LATE_THRESHOLD = 1.0
+
+    # Maximum time get_messages_sent_by() waits for pending frames
+    DECODE_WAIT_TIMEOUT = 5.0
+
+    QUEUE_POLL_INTERVAL = 0.1
+
     def __init__(self, message_factory):
         """
         Args:
@@ -62,52 +86,144 @@ class Sniffer:
 
         self._message_factory = message_factory
 
-        self._pcap = pcap.PcapCodec(os.getenv('TEST_NAME', 'current'))
+        self._pcap = pcap.create_codec(os.getenv('TEST_NAME', 'current'))
 
         # Create transport
         transport_factory = sniffer_transport.SnifferTransportFactory()
         self._transport = transport_factory.create_transport()
 
-        self._thread = None
+        self._threads = []
         self._thread_alive = threading.Event()
         self._thread_alive.clear()
 
+        self._raw_frames = Queue.Queue(self.RAW_QUEUE_SIZE)
+        self._decode_queue = Queue.Queue()
+
         self._buckets = collections.defaultdict(Queue.Queue)
 
-    def _sniffer_main_loop(self):
-        """ Sniffer main loop. """
+        # Per node sequence numbers of received and of decoded frames
+        self._condition = threading.Condition()
+        self._received_seq = collections.defaultdict(int)
+        self._decoded_seq = collections.defaultdict(int)
 
-        self.logger.debug("Sniffer started.")
+        self._counters = collections.Counter()
+
+    @property
+    def counters(self):
+        """ Pipeline counters.
+
+        Returns:
+            dict: number of 'received', 'dropped', 'decoded', 'late' and
+                'errors' frames.
+        """
+        with self._condition:
+            return {
+                name: self._counters[name]
+                for name in ('received', 'dropped', 'decoded', 'late', 'errors')
+            }
+
+    def _receive_main_loop(self):
+        """ Receive frames, timestamp them and hand them to the dispatcher. """
+
+        while self._thread_alive.is_set():
+            try:
+                data, nodeid = self._transport.recv(self.RECV_BUFFER_SIZE)
+            except Exception:
+                if not self._thread_alive.is_set():
+                    break
+                raise
+
+            received_at = time.time()
+            timestamp = self._pcap.get_timestamp(received_at)
+
+            with self._condition:
+                self._counters['received'] += 1
+                seq = self._received_seq[nodeid] + 1
+
+                try:
+                    self._raw_frames.put_nowait(
+                        (nodeid, seq, received_at, timestamp, data)
+                    )
+                except Queue.Full:
+                    self._counters['dropped'] += 1
+                    continue
+
+                self._received_seq[nodeid] = seq
+
+    def _dispatch_main_loop(self):
+        """ Write frames to the pcap file and hand them to the decode thread. """
 
         while self._thread_alive.is_set():
-            data, nodeid = self._transport.recv(self.RECV_BUFFER_SIZE)
+            try:
+                frame = self._raw_frames.get(timeout=self.QUEUE_POLL_INTERVAL)
+            except Queue.Empty:
+                continue
+
+            nodeid, _, _, timestamp, data = frame
+            self._pcap.append(data, timestamp, nodeid)
+
+            self._decode_queue.put(frame)
 
-            self._pcap.append(data)
+    def _decode_main_loop(self):
+        """ Decode frames of all nodes in arrival order. """
+
+        while self._thread_alive.is_set():
+            try:
+                nodeid, seq, received_at, timestamp, data = self._decode_queue.get(
+                    timeout=self.QUEUE_POLL_INTERVAL
+                )
+            except Queue.Empty:
+                continue
 
             # Ignore any exceptions
             try:
-                messages = self._message_factory.create(io.BytesIO(data))
+                messages = self._message_factory.create(
+                    io.BytesIO(data), timestamp
+                )
                 self.logger.debug("Received messages: {}".format(messages))
-                for msg in messages:
-                    self._buckets[nodeid].put(msg)
-
             except Exception as e:
                 # Just print the exception to the console
                 print("EXCEPTION: %s" % e)
                 traceback.print_exc()
+                messages = []
+                error = True
+            else:
+                error = False
 
-        self.logger.debug("Sniffer stopped.")
+            with self._condition:
+                # Frames are decoded in arrival order, so they complete in
+                # sequence.
+                assert seq == self._decoded_seq[nodeid] + 1
+
+                for msg in messages:
+                    self._buckets[nodeid].put(msg)
+
+                self._decoded_seq[nodeid] = seq
+                self._counters['decoded'] += 1
+                if error:
+                    self._counters['errors'] += 1
+                if time.time() - received_at > self.LATE_THRESHOLD:
+                    self._counters['late'] += 1
+
+                self._condition.notify_all()
 
     def start(self):
         """ Start sniffing. """
 
-        self._thread = threading.Thread(target=self._sniffer_main_loop)
-        self._thread.daemon = True
+        self.logger.debug("Sniffer started.")
+
+        self._threads = [
+            threading.Thread(target=self._receive_main_loop),
+            threading.Thread(target=self._dispatch_main_loop),
+            threading.Thread(target=self._decode_main_loop),
+        ]
 
         self._transport.open()
 
         self._thread_alive.set()
-        self._thread.start()
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
 
     def stop(self):
         """ Stop sniffing. """
@@ -116,12 +232,34 @@ class Sniffer:
 
         self._transport.close()
 
-        self._thread.join()
-        self._thread = None
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+        self._pcap.flush()
+
+        self.logger.debug("Sniffer stopped.")
 
     def set_lowpan_context(self, cid, prefix):
         self._message_factory.set_lowpan_context(cid, prefix)
 
+    def _wait_for_decoding(self, nodeid):
+        """ Wait until frames already received from the node are decoded. """
+        deadline = time.time() + self.DECODE_WAIT_TIMEOUT
+
+        with self._condition:
+            received_seq = self._received_seq[nodeid]
+            while self._decoded_seq[nodeid] < received_seq:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self.logger.warning(
+                        "Node {}: {} frames not decoded in time".format(
+                            nodeid, received_seq - self._decoded_seq[nodeid]
+                        )
+                    )
+                    break
+                self._condition.wait(remaining)
+
     def get_messages_sent_by(self, nodeid):
         """ Get sniffed messages.
 
@@ -134,6 +272,8 @@ class Sniffer:
         Returns:
             MessagesSet: a set with received messages.
         """
+        self._wait_for_decoding(nodeid)
+
         bucket = self._buckets[nodeid]
         messages = []
 
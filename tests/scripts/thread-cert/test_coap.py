@@ -33,6 +33,7 @@ import string
 import unittest
 
 import coap
+import common
 
 
 def any_delta():
@@ -517,6 +518,163 @@ class TestCoapMessageIdToUriPathBinder(unittest.TestCase):
             RuntimeError, binder.get_uri_path_for, message_id, token
         )
 
+    def test_should_match_token_bytes_when_get_uri_path_for_is_called_with_other_bytes_type(
+            self):
+        # GIVEN
+        message_id = any_message_id()
+        token = any_token()
+        uri_path = any_uri_path()
+
+        binder = coap.CoapMessageIdToUriPathBinder()
+        binder.add_uri_path_for(message_id, bytearray(token), uri_path)
+
+        # THEN
+        self.assertEqual(
+            uri_path, binder.get_uri_path_for(message_id, bytes(token))
+        )
+
+    def test_should_keep_binds_of_different_scopes_apart_when_add_uri_path_for_is_called(
+            self):
+        # GIVEN
+        message_id = any_message_id()
+        token = any_token()
+
+        binder = coap.CoapMessageIdToUriPathBinder()
+
+        # WHEN
+        binder.add_uri_path_for(message_id, token, "/a/as", scope=b"node1")
+        binder.add_uri_path_for(message_id, token, "/a/aq", scope=b"node2")
+
+        # THEN
+        self.assertEqual(
+            "/a/as", binder.get_uri_path_for(message_id, token, b"node1")
+        )
+        self.assertEqual(
+            "/a/aq", binder.get_uri_path_for(message_id, token, b"node2")
+        )
+        self.assertRaises(
+            RuntimeError, binder.get_uri_path_for, message_id, token
+        )
+        self.assertEqual(1, binder.stats()["misses"])
+
+    def test_should_expire_binds_when_exchange_lifetime_passed_in_capture_time(
+            self):
+        # GIVEN
+        token = any_token()
+
+        binder = coap.CoapMessageIdToUriPathBinder(exchange_lifetime=247)
+        binder.add_uri_path_for(1, token, "/a/as", timestamp=10.0)
+        binder.add_uri_path_for(2, token, "/a/aq", timestamp=100.0)
+
+        # WHEN
+        binder.add_uri_path_for(3, token, "/a/sd", timestamp=300.0)
+
+        # THEN
+        self.assertRaises(RuntimeError, binder.get_uri_path_for, 1, token)
+        self.assertEqual("/a/aq", binder.get_uri_path_for(2, token))
+        self.assertEqual(
+            {"size": 2, "evictions": 0, "expirations": 1, "misses": 1},
+            binder.stats(),
+        )
+
+    def test_should_evict_oldest_binds_when_max_size_exceeded(self):
+        # GIVEN
+        token = any_token()
+
+        binder = coap.CoapMessageIdToUriPathBinder(max_size=2)
+
+        # WHEN
+        for message_id in range(3):
+            binder.add_uri_path_for(message_id, token, any_uri_path())
+
+        # THEN
+        self.assertEqual(2, len(binder))
+        self.assertEqual(1, binder.stats()["evictions"])
+        self.assertRaises(RuntimeError, binder.get_uri_path_for, 0, token)
+
+
+class TestCoapMessageProxy(unittest.TestCase):
+    def _create_counting_payload_factory(self, parsed):
+        class CountingPayloadFactory:
+            def parse(self, data, message_info):
+                parsed.append(self)
+                return data.read()
+
+        return CountingPayloadFactory()
+
+    def _create_coap_message_proxy(self, binder, factories):
+        coap_message = coap.CoapMessage(
+            any_version(), any_type(), any_code(), any_message_id(),
+            any_token(), any_options(), any_payload(), None)
+
+        return coap.CoapMessageProxy(coap_message, None, binder, factories)
+
+    def test_should_parse_payload_once_when_payload_property_is_called_many_times(
+            self):
+        # GIVEN
+        parsed = []
+        binder = coap.CoapMessageIdToUriPathBinder()
+        proxy = self._create_coap_message_proxy(
+            binder, {"/a/as": self._create_counting_payload_factory(parsed)})
+
+        binder.add_uri_path_for(proxy.message_id, proxy.token, "/a/as")
+
+        # WHEN
+        payloads = [proxy.payload for _ in range(3)]
+
+        # THEN
+        self.assertEqual(1, len(parsed))
+        self.assertEqual(2, proxy.payload_cache_hits)
+        self.assertTrue(all(payload is payloads[0] for payload in payloads))
+
+    def test_should_parse_payload_again_when_uri_path_binding_changed(self):
+        # GIVEN
+        parsed = []
+        binder = coap.CoapMessageIdToUriPathBinder()
+        factory_a = self._create_counting_payload_factory(parsed)
+        factory_b = self._create_counting_payload_factory(parsed)
+        proxy = self._create_coap_message_proxy(
+            binder, {"/a/as": factory_a, "/a/aq": factory_b})
+
+        proxy.payload
+        parsed_before_binding = len(parsed)
+
+        binder.add_uri_path_for(proxy.message_id, proxy.token, "/a/as")
+        proxy.payload
+
+        # WHEN
+        binder.add_uri_path_for(proxy.message_id, proxy.token, "/a/aq")
+        proxy.payload
+
+        # THEN
+        self.assertEqual(0, parsed_before_binding)
+        self.assertEqual([factory_a, factory_b], parsed)
+        self.assertEqual(0, proxy.payload_cache_hits)
+
+    def test_should_decode_payload_with_remembered_uri_path_when_binding_expired(
+            self):
+        # GIVEN
+        parsed = []
+        binder = coap.CoapMessageIdToUriPathBinder(max_size=1)
+        message_id = any_message_id()
+        token = any_token()
+
+        binder.add_uri_path_for(message_id, token, "/a/as")
+
+        coap_message = coap.CoapMessage(
+            any_version(), any_type(), any_code(), message_id, token,
+            any_options(), any_payload(), None)
+        proxy = coap.CoapMessageProxy(
+            coap_message, None, binder,
+            {"/a/as": self._create_counting_payload_factory(parsed)})
+
+        # WHEN
+        binder.add_uri_path_for(message_id + 1, token, "/a/aq")
+        proxy.payload
+
+        # THEN
+        self.assertEqual(1, len(parsed))
+
 
 class TestCoapMessageFactory(unittest.TestCase):
     def _create_dummy_payload_factory(self):
@@ -617,6 +775,45 @@ class TestCoapMessageFactory(unittest.TestCase):
             coap_message.payload,
         )
 
+    def test_should_bind_response_to_request_of_its_client_when_parse_method_is_called(
+            self):
+        # GIVEN
+        request = bytearray([0x42, 0x02, 0x00, 0xBD, 0x65, 0xee, 0xB1, 0x61,
+                             0x02, 0x61, 0x73, 0xff, 0x01])
+        response = bytearray([0x62, 0x44, 0x00, 0xBD, 0x65, 0xee, 0xff, 0x04])
+
+        client = "fd00::1"
+        server = "fd00::2"
+        other_client = "fd00::3"
+
+        class TaggingPayloadFactory:
+            def parse(self, data, message_info):
+                return ("parsed", data.read())
+
+        factory = coap.CoapMessageFactory(
+            options_factory=coap.CoapOptionsFactory(),
+            uri_path_based_payload_factories={"/a/as": TaggingPayloadFactory()},
+            message_id_to_uri_path_binder=coap.CoapMessageIdToUriPathBinder(),
+        )
+
+        def message_info(source, destination):
+            info = common.MessageInfo()
+            info.source_ipv6 = source
+            info.destination_ipv6 = destination
+            return info
+
+        factory.parse(io.BytesIO(request), message_info(client, server))
+
+        # WHEN
+        response_message = factory.parse(
+            io.BytesIO(response), message_info(server, client))
+        other_response_message = factory.parse(
+            io.BytesIO(response), message_info(server, other_client))
+
+        # THEN
+        self.assertEqual(("parsed", b"\x04"), response_message.payload)
+        self.assertEqual(b"\x04", other_response_message.payload)
+
 
 if __name__ == "__main__":
     unittest.main()
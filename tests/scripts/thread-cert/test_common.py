@@ -26,6 +26,7 @@
 #  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 #  POSSIBILITY OF SUCH DAMAGE.
 #
+import io
 import random
 import struct
 import unittest
@@ -50,6 +51,10 @@ def any_ipv6_address():
     return bytearray([random.getrandbits(8) for _ in range(16)])
 
 
+def any_data(length=16):
+    return bytearray([random.getrandbits(8) for _ in range(length)])
+
+
 class TestMessageInfo(unittest.TestCase):
     def test_should_return_source_ipv6_value_when_source_ipv6_property_is_called(
             self):
@@ -181,5 +186,84 @@ class TestMacAddress(unittest.TestCase):
         self.assertEqual(bytearray([eui64[0] ^ 0x02]) + eui64[1:], iid)
 
 
+class TestBufferReader(unittest.TestCase):
+    def test_should_read_like_BytesIO_when_read_tell_and_seek_are_called(
+            self):
+        # GIVEN
+        data = bytes(any_data())
+
+        reader = common.BufferReader(data)
+        stream = io.BytesIO(data)
+
+        # WHEN
+        actual = [reader.read(3), reader.tell(), reader.seek(-1, io.SEEK_CUR),
+                  reader.read(2), reader.seek(-4, io.SEEK_END), reader.read(),
+                  reader.read(1)]
+        expected = [stream.read(3), stream.tell(), stream.seek(-1, io.SEEK_CUR),
+                    stream.read(2), stream.seek(-4, io.SEEK_END), stream.read(),
+                    stream.read(1)]
+
+        # THEN
+        self.assertEqual(expected, actual)
+        self.assertEqual(data, reader.getvalue())
+
+    def test_should_share_buffer_with_sub_stream_when_read_stream_is_called(
+            self):
+        # GIVEN
+        data = any_data()
+
+        reader = common.BufferReader(data)
+        reader.read(2)
+
+        # WHEN
+        sub_stream = reader.read_stream(5)
+
+        # THEN
+        self.assertEqual(7, reader.tell())
+        self.assertEqual(5, len(sub_stream))
+        self.assertEqual(0, sub_stream.tell())
+        self.assertEqual(bytes(data[2:7]), sub_stream.getvalue())
+        self.assertEqual(bytes(data[2:7]), sub_stream.read(10))
+        self.assertEqual(0, common.bytes_left(sub_stream))
+
+        data[2] ^= 0xff
+        sub_stream.seek(0)
+        self.assertEqual(data[2], sub_stream.peek_byte())
+
+    def test_should_truncate_sub_stream_when_read_stream_is_called_past_the_end(
+            self):
+        # GIVEN
+        data = any_data(4)
+
+        reader = common.BufferReader(data)
+
+        # WHEN
+        sub_stream = reader.read_stream(3)
+        tail = reader.read_stream(3)
+
+        # THEN
+        self.assertEqual(bytes(data[:3]), sub_stream.read())
+        self.assertEqual(bytes(data[3:]), tail.read())
+        self.assertEqual(0, common.bytes_left(reader))
+
+    def test_should_support_BytesIO_when_helper_functions_are_called(self):
+        # GIVEN
+        data = any_data()
+
+        stream = io.BytesIO(data)
+        stream.read(1)
+
+        # WHEN
+        first_byte = common.peek_byte(stream)
+        left = common.bytes_left(stream)
+        sub_stream = common.read_stream(stream, 4)
+
+        # THEN
+        self.assertEqual(data[1], first_byte)
+        self.assertEqual(len(data) - 1, left)
+        self.assertEqual(bytes(data[1:5]), sub_stream.read())
+        self.assertEqual(5, stream.tell())
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -261,6 +261,150 @@ class TestCryptoMaterialCreator(unittest.TestCase):
                                              0x23, 0xec, 0x3b, 0x96, 0x11, 0x0e, 0xef, 0xa3]))
 
 
+class TestKeyScheduleCache(unittest.TestCase):
+
+    def test_should_return_cached_keys_when_get_keys_method_is_called_again_with_the_same_sequence_counter(self):
+        # GIVEN
+        cache = net_crypto.KeyScheduleCache()
+        keys = cache.get_keys(master_key, 1)
+
+        # WHEN
+        cached_keys = cache.get_keys(master_key, 1)
+
+        # THEN
+        self.assertIs(keys, cached_keys)
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_should_derive_new_keys_when_get_keys_method_is_called_with_other_master_key(self):
+        # GIVEN
+        cache = net_crypto.KeyScheduleCache()
+        other_master_key = bytearray([(b + 1) & 0xff for b in master_key])
+        keys = cache.get_keys(master_key, 1)
+
+        # WHEN
+        other_keys = cache.get_keys(other_master_key, 1)
+
+        # THEN
+        self.assertNotEqual(keys, other_keys)
+        self.assertEqual(0, cache.hits)
+        self.assertEqual(2, cache.misses)
+
+    def test_should_evict_least_recently_used_keys_when_cache_is_full(self):
+        # GIVEN
+        cache = net_crypto.KeyScheduleCache(max_size=2)
+        cache.get_keys(master_key, 0)
+        cache.get_keys(master_key, 1)
+        cache.get_keys(master_key, 0)
+
+        # WHEN
+        cache.get_keys(master_key, 2)
+
+        # THEN
+        self.assertEqual(2, len(cache))
+        cache.get_keys(master_key, 0)
+        self.assertEqual(2, cache.hits)
+        cache.get_keys(master_key, 1)
+        self.assertEqual(4, cache.misses)
+
+
+class TestKeyRing(unittest.TestCase):
+
+    def test_should_return_keys_of_master_key_when_get_keys_method_is_called_with_any_pan_id(self):
+        # GIVEN
+        keyring = net_crypto.KeyRing()
+        keyring.add_master_key(master_key)
+
+        # WHEN
+        mle_key, mac_key = keyring.get_keys(0, pan_id=0xface)
+
+        # THEN
+        self.assertEqual(mle_key, bytearray([0x54, 0x45, 0xf4, 0x15, 0x8f, 0xd7, 0x59, 0x12,
+                                             0x17, 0x58, 0x09, 0xf8, 0xb5, 0x7a, 0x66, 0xa4]))
+        self.assertEqual(mac_key, bytearray([0xde, 0x89, 0xc5, 0x3a, 0xf3, 0x82, 0xb4, 0x21,
+                                             0xe0, 0xfd, 0xe5, 0xa9, 0xba, 0xe3, 0xbe, 0xf0]))
+
+    def test_should_return_keys_of_network_master_key_when_get_keys_method_is_called_with_its_pan_id(self):
+        # GIVEN
+        network_master_key = any_master_key()
+
+        keyring = net_crypto.KeyRing()
+        keyring.add_master_key(master_key)
+        keyring.add_master_key(network_master_key, pan_id=0xface)
+
+        # WHEN
+        keys = keyring.get_keys(1, pan_id=0xface)
+
+        # THEN
+        self.assertEqual(net_crypto.CryptoMaterialCreator(network_master_key)._generate_keys(1), keys)
+        self.assertEqual(net_crypto.CryptoMaterialCreator(master_key)._generate_keys(1),
+                         keyring.get_keys(1, pan_id=0xdead))
+
+    def test_should_return_keys_of_bound_master_key_when_get_keys_method_is_called_with_bound_sequence_counter(self):
+        # GIVEN
+        old_master_key = any_master_key()
+        new_master_key = any_master_key()
+
+        keyring = net_crypto.KeyRing()
+        keyring.add_master_key(new_master_key, pan_id=0xface)
+        keyring.add_master_key(old_master_key, pan_id=0xface, sequence_counters=range(0, 3))
+
+        # WHEN
+        old_keys = keyring.get_keys(2, pan_id=0xface)
+        new_keys = keyring.get_keys(3, pan_id=0xface)
+
+        # THEN
+        self.assertEqual(net_crypto.CryptoMaterialCreator(old_master_key)._generate_keys(2), old_keys)
+        self.assertEqual(net_crypto.CryptoMaterialCreator(new_master_key)._generate_keys(3), new_keys)
+
+    def test_should_raise_KeyError_when_get_keys_method_is_called_and_there_is_no_matching_master_key(self):
+        # GIVEN
+        keyring = net_crypto.KeyRing()
+        keyring.add_master_key(master_key, pan_id=0xface)
+
+        # THEN
+        self.assertRaises(KeyError, keyring.get_keys, 0, 0xdead)
+
+    def test_should_decrypt_mle_message_with_network_master_key_when_creator_uses_keyring(self):
+        # GIVEN
+        message_info = common.MessageInfo()
+        message_info.source_mac_address = common.MacAddress.from_eui64(
+            bytearray([0x00, 0x35, 0xcc, 0x94, 0xd7, 0x7a, 0x07, 0xe8]))
+
+        message_info.source_ipv6 = "fe80::235:cc94:d77a:07e8"
+        message_info.destination_ipv6 = "ff02::2"
+        message_info.pan_id = 0xface
+
+        message_info.aux_sec_hdr = net_crypto.AuxiliarySecurityHeader(key_id_mode=2,
+                                                                      security_level=5,
+                                                                      frame_counter=262165,
+                                                                      key_id=bytearray([0x00, 0x00, 0x00, 0x00, 0x01]))
+        message_info.aux_sec_hdr_bytes = convert_aux_sec_hdr_to_bytearray(message_info.aux_sec_hdr)
+
+        data = bytearray([0x9a, 0x5a, 0x9a, 0x5b, 0xba, 0x25, 0x9c, 0x5e,
+                          0x58, 0xa2, 0x7e, 0x75, 0x74, 0xef, 0x79, 0xbc,
+                          0x4f, 0xa3, 0xf9, 0xae, 0xa8, 0x34, 0xf6, 0xf2,
+                          0x37, 0x21, 0x93, 0x60])
+
+        mic = bytearray([0xe1, 0xb5, 0xa2, 0x53])
+
+        keyring = net_crypto.KeyRing()
+        keyring.add_master_key(any_master_key())
+        keyring.add_master_key(master_key, pan_id=0xface)
+
+        net_crypto_engine = net_crypto.CryptoEngine(net_crypto.MleCryptoMaterialCreator(keyring=keyring))
+
+        # WHEN
+        mle_msg = net_crypto_engine.decrypt(data, mic, message_info)
+
+        # THEN
+        expected_mle_msg = bytearray([0x04, 0x00, 0x02, 0x00, 0x00, 0x09, 0x0b, 0x8f,
+                                      0x80, 0x00, 0x00, 0x00, 0x00, 0x00, 0x40, 0x00,
+                                      0x01, 0xf1, 0x0b, 0x08, 0x65, 0x5e, 0x0f, 0x83,
+                                      0x40, 0xc7, 0x83, 0x31])
+        self.assertEqual(expected_mle_msg, mle_msg)
+
+
 class TestMleCryptoMaterialCreator(unittest.TestCase):
 
     def test_should_create_nonce_when_create_nonce_method_is_called(self):
@@ -62,6 +62,8 @@ from ipv6 import (
     ICMPv6DestinationUnreachable,
     UdpBasedOnSrcDstPortsPayloadFactory,
     FragmentHeader,
+    calculate_checksum,
+    update_checksum,
 )
 
 import common
@@ -341,6 +343,67 @@ def any_message_info():
     return common.MessageInfo()
 
 
+def any_icmp_echo_request_packet_bytes():
+    return bytearray([0x60, 0x00, 0x00, 0x00, 0x00, 0x1A, 0x3A, 0x40,
+                      0xfd, 0x00, 0x12, 0x34, 0x45, 0x55, 0x00, 0x00,
+                      0x00, 0x00, 0x00, 0xff, 0xfe, 0x00, 0x18, 0x00,
+                      0xff, 0x03, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00,
+                      0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x00, 0x01,
+                      0x80, 0x00, 0x87, 0x12, 0x00, 0x00, 0x00, 0x02,
+                      0x80, 0x00, 0xc7, 0xbf, 0x00, 0x00, 0x00, 0x01,
+                      0x41, 0x41, 0x41, 0x41, 0x41, 0x41, 0x41, 0x41,
+                      0x41, 0x41])
+
+
+def any_icmp_factory():
+    return IPv6PacketFactory(ulpf={58: ICMPv6Factory(body_factories={128: ICMPv6EchoBodyFactory()})})
+
+
+class TestChecksum(unittest.TestCase):
+
+    def test_should_calculate_checksum_when_calculate_checksum_function_is_called(self):
+        # GIVEN
+        data = bytearray([0x00, 0x01, 0xf2, 0x03, 0xf4, 0xf5, 0xf6, 0xf7])
+
+        # WHEN
+        checksum = calculate_checksum(data)
+
+        # THEN
+        self.assertEqual(0x220d, checksum)
+
+    def test_should_pad_odd_length_data_when_calculate_checksum_function_is_called(self):
+        # GIVEN
+        data = bytearray([0x00, 0x01, 0xf2])
+
+        # WHEN
+        checksum = calculate_checksum(data)
+
+        # THEN
+        self.assertEqual(calculate_checksum(data + bytearray([0x00])), checksum)
+
+    def test_should_return_0xffff_instead_of_zero_when_calculate_checksum_function_is_called(self):
+        # GIVEN
+        data = bytearray([0xff, 0xff, 0xff, 0xff])
+
+        # WHEN
+        checksum = calculate_checksum(data)
+
+        # THEN
+        self.assertEqual(0xffff, checksum)
+
+    def test_should_return_checksum_of_changed_data_when_update_checksum_function_is_called(self):
+        # GIVEN
+        data = bytearray([random.getrandbits(8) for _ in range(64)])
+        new_data = bytearray([random.getrandbits(8) for _ in range(6)])
+        checksum = calculate_checksum(data)
+
+        # WHEN
+        updated_checksum = update_checksum(checksum, data[10:16], new_data)
+
+        # THEN
+        self.assertEqual(calculate_checksum(data[:10] + new_data + data[16:]), updated_checksum)
+
+
 class TestIPv6Header(unittest.TestCase):
 
     def test_should_convert_IPv6_header_to_bytes_when_to_bytes_method_is_called(self):
@@ -739,6 +802,40 @@ class TestIPv6PacketFactory(unittest.TestCase):
         self.assertEqual("fd00:1234:4555::ff:fe00:1800", message_info.source_ipv6.compressed)
         self.assertEqual("ff03::1", message_info.destination_ipv6.compressed)
 
+    def test_should_verify_checksum_of_received_bytes_when_verify_checksum_method_is_called(self):
+        # GIVEN
+        ipv6_packet = any_icmp_factory().parse(io.BytesIO(any_icmp_echo_request_packet_bytes()), any_message_info())
+
+        # WHEN
+        ipv6_packet.upper_layer_protocol.to_bytes = None
+
+        # THEN
+        self.assertTrue(ipv6_packet.verify_checksum())
+
+    def test_should_not_verify_checksum_of_corrupted_bytes_when_verify_checksum_method_is_called(self):
+        # GIVEN
+        ipv6_packet_bytes = any_icmp_echo_request_packet_bytes()
+        ipv6_packet_bytes[-1] ^= 0x01
+
+        # WHEN
+        ipv6_packet = any_icmp_factory().parse(io.BytesIO(ipv6_packet_bytes), any_message_info())
+
+        # THEN
+        self.assertFalse(ipv6_packet.verify_checksum())
+        self.assertRaises(RuntimeError, ipv6_packet._validate_checksum)
+
+    def test_should_calculate_elided_checksum_from_received_bytes_when_parse_method_is_called(self):
+        # GIVEN
+        ipv6_packet_bytes = any_icmp_echo_request_packet_bytes()
+        ipv6_packet_bytes[42:44] = bytearray([0x00, 0x00])
+
+        # WHEN
+        ipv6_packet = any_icmp_factory().parse(io.BytesIO(ipv6_packet_bytes), any_message_info())
+
+        # THEN
+        self.assertEqual(0x8712, ipv6_packet.upper_layer_protocol.checksum)
+        self.assertTrue(ipv6_packet.verify_checksum())
+
 
 class TestUDPDatagram(unittest.TestCase):
 
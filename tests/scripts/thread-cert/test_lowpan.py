@@ -2657,6 +2657,26 @@ class TestLowpanFragmentsBuffer(unittest.TestCase):
                                     0x29, 0x2a]),
                          fragments_buffer.read())
 
+    def test_should_report_whole_packet_when_fragments_are_written_out_of_order_and_overlapping(self):
+        # GIVEN
+        data = any_data(40)
+        fragments_buffer = lowpan.LowpanFragmentsBuffer(buffer_size=len(data))
+
+        # WHEN
+        for offset, length in [(24, 16), (0, 8), (16, 10), (4, 8)]:
+            fragments_buffer.seek(offset)
+            fragments_buffer.write(data[offset:offset + length])
+
+        incomplete = fragments_buffer.whole_packet_received()
+
+        fragments_buffer.seek(12)
+        fragments_buffer.write(data[12:16])
+
+        # THEN
+        self.assertFalse(incomplete)
+        self.assertTrue(fragments_buffer.whole_packet_received())
+        self.assertEqual(data, fragments_buffer.read())
+
 
 class TestLowpanFragmentsBuffersManager(unittest.TestCase):
 
@@ -2691,6 +2711,91 @@ class TestLowpanFragmentsBuffersManager(unittest.TestCase):
         self.assertIsInstance(fragments_buffer, lowpan.LowpanFragmentsBuffer)
         self.assertEqual(datagram_size, len(fragments_buffer))
 
+    def _any_message_info(self):
+        message_info = common.MessageInfo()
+        message_info.source_mac_address = any_mac_address()
+        message_info.destination_mac_address = any_mac_address()
+        return message_info
+
+    def test_should_drop_fragments_buffer_when_reassembly_timeout_expired(self):
+        # GIVEN
+        now = [1000.0]
+        manager = lowpan.LowpanFragmentsBuffersManager(reassembly_timeout=60, clock=lambda: now[0])
+
+        message_info = self._any_message_info()
+        datagram_tag = any_datagram_tag()
+
+        fragments_buffer = manager.get_fragments_buffer(message_info, datagram_tag, 100)
+
+        # WHEN
+        now[0] += 30
+        refreshed_buffer = manager.get_fragments_buffer(message_info, datagram_tag, 100)
+
+        now[0] += 61
+        new_buffer = manager.get_fragments_buffer(message_info, datagram_tag, 100)
+
+        # THEN
+        self.assertIs(fragments_buffer, refreshed_buffer)
+        self.assertIsNot(fragments_buffer, new_buffer)
+        self.assertEqual(1, manager.timed_out)
+        self.assertEqual(1, len(manager))
+
+    def test_should_age_fragments_buffer_by_capture_timestamp_when_message_info_has_one(self):
+        # GIVEN
+        manager = lowpan.LowpanFragmentsBuffersManager(reassembly_timeout=60, clock=lambda: 0.0)
+
+        message_info = self._any_message_info()
+        datagram_tag = any_datagram_tag()
+
+        message_info.timestamp = 5000.0
+        fragments_buffer = manager.get_fragments_buffer(message_info, datagram_tag, 100)
+
+        # WHEN
+        message_info.timestamp = 5030.0
+        refreshed_buffer = manager.get_fragments_buffer(message_info, datagram_tag, 100)
+
+        message_info.timestamp = 5091.0
+        new_buffer = manager.get_fragments_buffer(message_info, datagram_tag, 100)
+
+        # THEN
+        self.assertIs(fragments_buffer, refreshed_buffer)
+        self.assertIsNot(fragments_buffer, new_buffer)
+        self.assertEqual(1, manager.timed_out)
+
+    def test_should_evict_least_recently_used_fragments_buffer_when_max_reassemblies_exceeded(self):
+        # GIVEN
+        manager = lowpan.LowpanFragmentsBuffersManager(max_reassemblies=2)
+
+        message_info = self._any_message_info()
+
+        first_buffer = manager.get_fragments_buffer(message_info, 1, 100)
+        second_buffer = manager.get_fragments_buffer(message_info, 2, 100)
+
+        # WHEN
+        manager.get_fragments_buffer(message_info, 1)
+        manager.get_fragments_buffer(message_info, 3, 100)
+
+        # THEN
+        self.assertEqual(2, len(manager))
+        self.assertEqual(1, manager.evicted)
+        self.assertIs(first_buffer, manager.get_fragments_buffer(message_info, 1))
+        self.assertIsNot(second_buffer, manager.get_fragments_buffer(message_info, 2, 100))
+
+    def test_should_remove_fragments_buffer_when_free_fragments_buffer_method_called(self):
+        # GIVEN
+        manager = lowpan.LowpanFragmentsBuffersManager()
+
+        message_info = self._any_message_info()
+        datagram_tag = any_datagram_tag()
+
+        manager.get_fragments_buffer(message_info, datagram_tag, 100)
+
+        # WHEN
+        manager.free_fragments_buffer(message_info, datagram_tag)
+
+        # THEN
+        self.assertEqual(0, len(manager))
+
 
 if __name__ == "__main__":
     unittest.main(verbosity=1)
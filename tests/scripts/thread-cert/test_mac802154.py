@@ -28,6 +28,7 @@
 #
 
 import io
+import threading
 import unittest
 
 from common import MacAddress, MacAddressType
@@ -202,7 +203,8 @@ class TestMacParser(unittest.TestCase):
 
     def test_should_decrypt_data_frame(self):
 
-        mac802154.DeviceDescriptors.add(0x2001, MacAddress(bytearray(
+        device_descriptors = mac802154.DeviceDescriptors()
+        device_descriptors.add(0x2001, MacAddress(bytearray(
             [0x16, 0x6e, 0x0a, 0x00, 0x00, 0x00, 0x00, 0x07]), MacAddressType.LONG))
 
         frame = mac802154.MacFrame()
@@ -217,7 +219,8 @@ class TestMacParser(unittest.TestCase):
                                           0xc9, 0x53, 0x0c, 0x44, 0x31, 0x59, 0x8b, 0xa2,
                                           0x83, 0x59, 0xa1, 0x43,  # MIC (valid)
                                           0x74, 0xe0, 0x2a, 0xf6,
-                                          0x99, 0xfc])))           # FCS (valid)
+                                          0x99, 0xfc])),           # FCS (valid)
+                    device_descriptors=device_descriptors)
 
         self.assertEqual(
             mac802154.MacHeader.FrameType.DATA,
@@ -279,5 +282,101 @@ class TestMacParser(unittest.TestCase):
         self.assertEqual(5, frame.header.aux_sec_header.security_level)
 
 
+class TestDeviceDescriptors(unittest.TestCase):
+
+    def _extended_address(self, last_byte):
+        return MacAddress(bytearray([0x16, 0x6e, 0x0a, 0x00, 0x00, 0x00, 0x00, last_byte]),
+                          MacAddressType.LONG)
+
+    def test_should_forget_old_short_address_when_device_gets_new_rloc16(self):
+        device_descriptors = mac802154.DeviceDescriptors()
+        extended_address = self._extended_address(0x01)
+
+        device_descriptors.add(0x2001, extended_address)
+        device_descriptors.add(0x0400, extended_address)
+
+        self.assertEqual(extended_address, device_descriptors.get_extended(0x0400))
+        self.assertRaises(KeyError, device_descriptors.get_extended, 0x2001)
+        self.assertEqual(1, device_descriptors.reassignments)
+        self.assertEqual(1, len(device_descriptors))
+
+    def test_should_replace_device_when_short_address_is_given_to_another_device(self):
+        device_descriptors = mac802154.DeviceDescriptors()
+        first_device = self._extended_address(0x01)
+        second_device = self._extended_address(0x02)
+
+        device_descriptors.add(0x2001, first_device)
+        device_descriptors.add(0x2001, second_device)
+        device_descriptors.add(0x2002, first_device)
+
+        self.assertEqual(second_device, device_descriptors.get_extended(0x2001))
+        self.assertEqual(first_device, device_descriptors.get_extended(0x2002))
+        self.assertEqual(1, device_descriptors.reassignments)
+
+    def test_should_keep_pans_apart_and_fall_back_to_descriptors_without_pan(self):
+        device_descriptors = mac802154.DeviceDescriptors()
+        first_device = self._extended_address(0x01)
+        second_device = self._extended_address(0x02)
+
+        device_descriptors.add(0x2001, first_device, pan_id=0xface)
+        device_descriptors.add(0x2001, second_device, pan_id=0xdead)
+        device_descriptors.add(0x2002, first_device)
+
+        self.assertEqual(first_device, device_descriptors.get_extended(0x2001, 0xface))
+        self.assertEqual(second_device, device_descriptors.get_extended(0x2001, 0xdead))
+        self.assertEqual(first_device, device_descriptors.get_extended(0x2002, 0xface))
+        self.assertRaises(KeyError, device_descriptors.get_extended, 0x2001, 0xbeef)
+
+    def test_should_drop_descriptor_when_timeout_passed_in_capture_time(self):
+        device_descriptors = mac802154.DeviceDescriptors(timeout=100)
+        extended_address = self._extended_address(0x01)
+
+        device_descriptors.add(0x2001, extended_address, timestamp=10.0)
+
+        self.assertEqual(extended_address, device_descriptors.get_extended(0x2001, timestamp=110.0))
+        self.assertRaises(KeyError, device_descriptors.get_extended, 0x2001, timestamp=110.5)
+        self.assertEqual(0, len(device_descriptors))
+
+    def test_should_keep_descriptor_until_reassigned_when_timeout_is_not_given(self):
+        device_descriptors = mac802154.DeviceDescriptors()
+        extended_address = self._extended_address(0x01)
+
+        device_descriptors.add(0x2001, extended_address, timestamp=10.0)
+
+        self.assertEqual(extended_address, device_descriptors.get_extended(0x2001, timestamp=86400.0))
+
+        device_descriptors.add(0x2001, self._extended_address(0x02), timestamp=86401.0)
+
+        self.assertNotEqual(extended_address, device_descriptors.get_extended(0x2001, timestamp=86402.0))
+
+    def test_should_keep_table_consistent_when_used_from_many_threads(self):
+        device_descriptors = mac802154.DeviceDescriptors()
+        devices = [self._extended_address(i) for i in range(8)]
+
+        def add_descriptors(offset):
+            for i in range(200):
+                device = devices[(i + offset) % len(devices)]
+                device_descriptors.add(0x0400 + (i % 16), device)
+
+        threads = [threading.Thread(target=add_descriptors, args=(offset,)) for offset in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Every device has at most one short address and vice versa
+        self.assertTrue(len(device_descriptors) <= len(devices))
+        extended_addresses = []
+        for i in range(16):
+            try:
+                extended_address = device_descriptors.get_extended(0x0400 + i)
+            except KeyError:
+                continue
+            extended_addresses.append(bytes(extended_address.mac_address))
+
+        self.assertEqual(len(device_descriptors), len(extended_addresses))
+        self.assertEqual(len(set(extended_addresses)), len(extended_addresses))
+
+
 if __name__ == "__main__":
     unittest.main()
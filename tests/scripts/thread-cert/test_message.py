@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+
+import io
+import random
+import struct
+import unittest
+
+import coap
+import config
+import ipv6
+import message
+import mle
+
+
+def any_eui64():
+    return bytearray([random.getrandbits(8) for _ in range(8)])
+
+
+def any_echo_data():
+    return bytearray([random.getrandbits(8) for _ in range(8)])
+
+
+def create_echo_request_frame(src_eui64, dst_eui64, sequence_number, data):
+    """ Create a radio frame (channel + MAC frame) with an Echo Request. """
+    ipv6_packet = ipv6.IPv6Packet(
+        ipv6.IPv6Header("fe80::1", "fe80::2"),
+        ipv6.ICMPv6(
+            ipv6.ICMPv6Header(ipv6.ICMP_ECHO_REQUEST, 0),
+            ipv6.ICMPv6EchoBody(0, sequence_number, data),
+        ),
+    )
+    ipv6_bytes = ipv6_packet.to_bytes()
+
+    # IPHC with next header, hop limit and both addresses carried inline
+    lowpan = bytearray([0x78, 0x00, ipv6.IPV6_NEXT_HEADER_ICMP, 64])
+    lowpan += ipv6_bytes[8:40] + ipv6_bytes[40:]
+
+    # Data frame, PAN ID compression, extended source and destination
+    frame = bytearray([0x41, 0xcc, sequence_number & 0xff])
+    frame += struct.pack("<H", config.PANID)
+    frame += dst_eui64[::-1] + src_eui64[::-1]
+    frame += lowpan
+    frame += bytearray([0x00, 0x00])  # FCS
+
+    return bytearray([11]) + frame
+
+
+class TestLazyMessage(unittest.TestCase):
+    def setUp(self):
+        self.src_eui64 = any_eui64()
+        self.dst_eui64 = any_eui64()
+
+    def _frame(self, sequence_number, data=None):
+        return create_echo_request_frame(
+            self.src_eui64,
+            self.dst_eui64,
+            sequence_number,
+            data if data is not None else any_echo_data(),
+        )
+
+    def test_should_not_decode_frame_when_create_lazy_method_is_called(self):
+        # GIVEN
+        factory = config.create_default_thread_message_factory()
+
+        # WHEN
+        msg = factory.create_lazy(self._frame(1), timestamp=1000)
+
+        # THEN
+        self.assertFalse(msg.is_decoded)
+        self.assertEqual(1000, msg.timestamp)
+
+    def test_should_decode_frame_like_create_method_when_layer_is_accessed(
+            self):
+        # GIVEN
+        data = any_echo_data()
+        frame = self._frame(7, data)
+
+        eager_msg = config.create_default_thread_message_factory().create(
+            io.BytesIO(frame)
+        )[0]
+        lazy_msg = config.create_default_thread_message_factory().create_lazy(
+            frame
+        )
+
+        # WHEN
+        actual_type = lazy_msg.type
+
+        # THEN
+        self.assertTrue(lazy_msg.is_decoded)
+        self.assertEqual(eager_msg.type, actual_type)
+        self.assertEqual(message.MessageType.ICMP, actual_type)
+        self.assertEqual(eager_msg.channel, lazy_msg.channel)
+        self.assertEqual(
+            eager_msg.mac_header.src_address, lazy_msg.mac_header.src_address
+        )
+        self.assertEqual(
+            eager_msg.ipv6_packet.ipv6_header.destination_address,
+            lazy_msg.ipv6_packet.ipv6_header.destination_address,
+        )
+        self.assertEqual(7, lazy_msg.icmp.body.sequence_number)
+        self.assertEqual(data, lazy_msg.icmp.body.data)
+
+    def test_should_decode_earlier_frames_in_capture_order_when_layer_is_accessed(
+            self):
+        # GIVEN
+        factory = config.create_default_thread_message_factory()
+        msgs = [factory.create_lazy(self._frame(i)) for i in range(3)]
+
+        # WHEN
+        msgs[1].type
+
+        # THEN
+        self.assertTrue(msgs[0].is_decoded)
+        self.assertTrue(msgs[1].is_decoded)
+        self.assertFalse(msgs[2].is_decoded)
+
+    def test_should_decode_pending_frames_when_lowpan_context_is_changed(self):
+        # GIVEN
+        factory = config.create_default_thread_message_factory()
+        msg = factory.create_lazy(self._frame(1))
+
+        # WHEN
+        factory.set_lowpan_context(1, '2001::/64')
+
+        # THEN
+        self.assertTrue(msg.is_decoded)
+
+    def test_should_find_lazy_message_when_next_message_of_method_is_called(
+            self):
+        # GIVEN
+        factory = config.create_default_thread_message_factory()
+        messages_set = message.MessagesSet(
+            [factory.create_lazy(self._frame(i)) for i in range(2)]
+        )
+
+        # WHEN
+        msg = messages_set.next_message_of(message.MessageType.ICMP)
+
+        # THEN
+        self.assertEqual(0, msg.icmp.body.sequence_number)
+
+    def test_should_drop_frame_which_does_not_decode_like_create_method(self):
+        # GIVEN
+        frames = [self._frame(0), bytearray([11, 0xff]), self._frame(1)]
+
+        eager_factory = config.create_default_thread_message_factory()
+        eager_messages = []
+        for frame in frames:
+            try:
+                eager_messages += eager_factory.create(io.BytesIO(frame))
+            except Exception:
+                pass
+
+        lazy_factory = config.create_default_thread_message_factory()
+        messages_set = message.MessagesSet(
+            [lazy_factory.create_lazy(frame) for frame in frames]
+        )
+
+        # WHEN
+        actual_messages = messages_set.messages
+
+        # THEN
+        self.assertEqual(len(eager_messages), len(actual_messages))
+        self.assertEqual(
+            [0, 1], [m.icmp.body.sequence_number for m in actual_messages]
+        )
+        self.assertEqual(str(eager_messages), str(messages_set))
+
+    def test_should_repr_frame_which_does_not_decode(self):
+        # GIVEN
+        factory = config.create_default_thread_message_factory()
+        msg = factory.create_lazy(bytearray([11, 0xff]), timestamp=1000)
+
+        # WHEN
+        msg.decode()
+        text = repr(msg)
+
+        # THEN
+        self.assertTrue(msg.decode_failed)
+        self.assertEqual("LazyMessage(timestamp=1000, decode failed)", text)
+
+    def test_should_split_dtls_records_when_next_message_method_is_called(
+            self):
+        # GIVEN
+        records = [object(), object()]
+        msg = message.LazyMessage(
+            DecodedMessagesFactory(any_dtls_messages(records)), b''
+        )
+        messages_set = message.MessagesSet([msg])
+
+        # WHEN
+        first = messages_set.next_message()
+
+        # THEN
+        self.assertIs(records[0], first.dtls)
+        self.assertIs(records[1], messages_set.next_message().dtls)
+
+
+class DecodedMessagesFactory(object):
+    """ Stands in for MessageFactory and decodes every frame to messages. """
+
+    def __init__(self, messages):
+        self._messages = messages
+
+    def decode_lazy_messages(self, until=None):
+        until._set_decoded(self._messages)
+
+
+def any_dtls_messages(records):
+    messages = []
+    for record in records:
+        msg = message.Message()
+        msg._type = message.MessageType.DTLS
+        msg._dtls = record
+        messages.append(msg)
+    return messages
+
+
+def any_mle_message(command_type):
+    msg = message.Message()
+    msg._type = message.MessageType.MLE
+    msg._mle = mle.MleMessage(mle.MleCommand(command_type, []))
+    return msg
+
+
+def any_coap_message(code, uri_path):
+    msg = message.Message()
+    msg._type = message.MessageType.COAP
+    msg._coap = coap.CoapMessage(1, coap.CoapMessageType.CON, coap.CoapCode.from_dotted(code),
+                                 0, b'', [], None, uri_path)
+    return msg
+
+
+def any_icmp_message(icmp_type):
+    msg = message.Message()
+    msg._type = message.MessageType.ICMP
+    msg._icmp = ipv6.ICMPv6(ipv6.ICMPv6Header(icmp_type, 0), None)
+    return msg
+
+
+class TestMessagesSet(unittest.TestCase):
+
+    def _messages(self):
+        return [
+            any_mle_message(mle.CommandType.PARENT_REQUEST),
+            any_coap_message('0.02', '/a/as'),
+            any_icmp_message(ipv6.ICMP_ECHO_REQUEST),
+            any_mle_message(mle.CommandType.CHILD_ID_REQUEST),
+            any_coap_message('2.04', '/a/as'),
+            any_mle_message(mle.CommandType.PARENT_REQUEST),
+            any_icmp_message(ipv6.ICMP_ECHO_RESPONSE),
+        ]
+
+    def test_should_consume_messages_up_to_found_one_when_next_mle_message_method_is_called(self):
+        # GIVEN
+        messages = self._messages()
+        messages_set = message.MessagesSet(messages)
+
+        # WHEN
+        msg = messages_set.next_mle_message(mle.CommandType.CHILD_ID_REQUEST)
+
+        # THEN
+        self.assertIs(messages[3], msg)
+        self.assertEqual(messages[4:], messages_set.messages)
+        self.assertIs(messages[5], messages_set.next_mle_message(mle.CommandType.PARENT_REQUEST))
+        self.assertIsNone(messages_set.next_mle_message(mle.CommandType.CHILD_ID_REQUEST, assert_enabled=False))
+        self.assertEqual([], messages_set.messages)
+
+    def test_should_return_first_of_command_types_when_next_mle_message_of_one_of_command_types_is_called(self):
+        # GIVEN
+        messages = self._messages()
+        messages_set = message.MessagesSet(messages)
+        messages_set.next_message()
+
+        # WHEN
+        msg = messages_set.next_mle_message_of_one_of_command_types(mle.CommandType.PARENT_REQUEST,
+                                                                    mle.CommandType.CHILD_ID_REQUEST)
+
+        # THEN
+        self.assertIs(messages[3], msg)
+
+    def test_should_find_coap_message_by_uri_path_and_code_when_next_coap_message_method_is_called(self):
+        # GIVEN
+        messages = self._messages()
+        messages_set = message.MessagesSet(messages)
+
+        # WHEN
+        msg = messages_set.next_coap_message('2.04', '/a/as')
+
+        # THEN
+        self.assertIs(messages[4], msg)
+        self.assertIsNone(messages_set.next_coap_message('0.02', assert_enabled=False))
+
+    def test_should_not_consume_messages_when_lookup_methods_are_called(self):
+        # GIVEN
+        messages = self._messages()
+        messages_set = message.MessagesSet(messages)
+
+        # WHEN
+        messages_set.next_message_of(message.MessageType.ICMP)
+
+        # THEN
+        self.assertIs(messages[6], messages_set.get_icmp_message(ipv6.ICMP_ECHO_RESPONSE))
+        self.assertIsNone(messages_set.get_icmp_message(ipv6.ICMP_ECHO_REQUEST))
+        self.assertIs(messages[5], messages_set.last_mle_message(mle.CommandType.PARENT_REQUEST))
+        self.assertTrue(messages_set.contains_mle_message(mle.CommandType.CHILD_ID_REQUEST))
+        self.assertTrue(messages_set.contains_icmp_message())
+        self.assertFalse(messages_set.does_not_contain_coap_message())
+        self.assertEqual(messages[3:], messages_set.messages)
+
+    def test_should_keep_remaining_messages_when_clone_method_is_called(self):
+        # GIVEN
+        messages = self._messages()
+        messages_set = message.MessagesSet(messages)
+        messages_set.next_coap_message('0.02')
+
+        # WHEN
+        clone = messages_set.clone()
+        clone.next_message_of(message.MessageType.ICMP)
+
+        # THEN
+        self.assertEqual(messages[2:], messages_set.messages)
+        self.assertEqual(messages[3:], clone.messages)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+
+import os
+import select
+import shutil
+import sys
+import tempfile
+import textwrap
+import unittest
+
+import pexpect
+
+import node
+import simulator
+
+# Replies of the fake CLI, like those of ot-cli: the command echo, the output
+# lines and Done, or an Error line. Every command received is logged to
+# commands.<node id> next to the script.
+FAKE_CLI = textwrap.dedent("""
+    import os
+    import sys
+
+    REPLIES = {
+        'extaddr': ['1122334455667788', 'Done'],
+        'eui64': ['18b4300000000001', 'Done'],
+        'rloc16': ['0400', 'Done'],
+        'ipaddr': ['fd00::1', 'fe80::1', 'Done'],
+        'state': ['leader', 'Done'],
+        'invalid': ['Error 7: InvalidArgs'],
+        'reset': [],
+    }
+
+    log_filename = os.path.join(os.path.dirname(__file__), 'commands.' + sys.argv[-1])
+
+    for line in iter(sys.stdin.readline, ''):
+        cmd = line.strip()
+        if cmd == 'exit':
+            break
+        if cmd:
+            with open(log_filename, 'a') as log:
+                log.write(cmd + '\\n')
+        sys.stdout.write(line.rstrip('\\r\\n') + '\\r\\n')
+        if cmd:
+            for reply in REPLIES.get(cmd, ['Done']):
+                sys.stdout.write(reply + '\\r\\n')
+        sys.stdout.write('> ')
+        sys.stdout.flush()
+""")
+
+
+class RecordingSimulator(simulator.BaseSimulator):
+    def __init__(self):
+        super(RecordingSimulator, self).__init__()
+        self.go_calls = []
+        self.current_time = 0
+
+    def go(self, duration, nodeid=None):
+        self.go_calls.append((duration, nodeid))
+
+
+class TestCliSpawn(unittest.TestCase):
+    def setUp(self):
+        self._spawn = node.CliSpawn('cat', timeout=1)
+
+    def tearDown(self):
+        if self._spawn.proc.poll() is None:
+            self._spawn.kill(9)
+            self._spawn.wait()
+
+    def test_should_make_fileno_readable_when_child_writes_output(self):
+        # WHEN
+        self._spawn.sendline('Done')
+
+        # THEN
+        readable, _, _ = select.select([self._spawn.fileno()], [], [], 1)
+        self.assertEqual([self._spawn.fileno()], readable)
+
+    def test_should_match_lines_in_order_when_expect_method_is_called(self):
+        # GIVEN
+        self._spawn.sendline('state')
+        self._spawn.sendline('leader')
+        self._spawn.sendline('Done')
+
+        # WHEN
+        self._spawn.expect('Done')
+
+        # THEN
+        self.assertEqual(b'state\nleader\n', self._spawn.before)
+
+    def test_should_keep_unmatched_output_for_next_expect_method_call(self):
+        # GIVEN
+        self._spawn.sendline('rloc16')
+        self._spawn.sendline('Done')
+        self._spawn.sendline('Error 7: InvalidArgs')
+
+        # WHEN
+        self._spawn.expect('Done')
+        self._spawn.expect('Error (\\d+)')
+
+        # THEN
+        self.assertEqual(b'7', self._spawn.match.group(1))
+
+    def test_should_raise_TIMEOUT_when_nothing_matches_within_timeout(self):
+        # GIVEN
+        self._spawn.sendline('Done')
+
+        # THEN
+        self.assertRaises(pexpect.TIMEOUT, self._spawn.expect, 'Error', timeout=0.1)
+
+    def test_should_raise_EOF_when_child_exits(self):
+        # GIVEN
+        self._spawn.sendline('Done')
+
+        # WHEN
+        self._spawn.sendeof()
+
+        # THEN
+        self.assertRaises(pexpect.EOF, self._spawn.expect, 'Error')
+        self.assertEqual(b'Done\n', self._spawn.before)
+
+
+class FakeCliTestCase(unittest.TestCase):
+    """ Runs nodes against the fake CLI. """
+
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        fake_cli = os.path.join(self._tmpdir, 'fake_cli.py')
+        with open(fake_cli, 'w') as f:
+            f.write(FAKE_CLI)
+
+        self._environ = dict(os.environ)
+        os.environ['OT_CLI_PATH'] = '%s %s' % (sys.executable, fake_cli)
+        os.environ['NODE_TYPE'] = 'sim'
+        os.environ.pop('RADIO_DEVICE', None)
+
+        self._simulator = RecordingSimulator()
+        self._nodes = []
+
+    def tearDown(self):
+        for n in self._nodes:
+            n.destroy()
+        os.environ.clear()
+        os.environ.update(self._environ)
+        shutil.rmtree(self._tmpdir)
+
+    def _create_node(self, nodeid, **kwargs):
+        n = node.Node(nodeid, simulator=self._simulator, **kwargs)
+        self._nodes.append(n)
+        self._simulator.go_calls = []
+        return n
+
+    def _go_calls_with_nodes(self):
+        # Node._expect() also runs the simulator while it waits for output
+        return [call for call in self._simulator.go_calls if call[1] is not None]
+
+    def _pop_received_commands(self, nodeid):
+        """ Returns the commands the fake CLI of the node received since the last call. """
+        filename = os.path.join(self._tmpdir, 'commands.%d' % nodeid)
+        if not os.path.exists(filename):
+            return []
+        with open(filename) as f:
+            commands = f.read().splitlines()
+        os.remove(filename)
+        return commands
+
+
+class TestNodeCommands(FakeCliTestCase):
+    def setUp(self):
+        super(TestNodeCommands, self).setUp()
+        for nodeid in (1, 2):
+            self._create_node(nodeid)
+
+    def test_should_return_output_lines_of_each_command_without_echo_and_Done(self):
+        # WHEN
+        outputs = self._nodes[0].send_commands(['rloc16', 'ipaddr', 'ifconfig up'])
+
+        # THEN
+        self.assertEqual([['0400'], ['fd00::1', 'fe80::1'], []], outputs)
+        self.assertEqual([(0, 1)], self._go_calls_with_nodes())
+
+    def test_should_read_all_replies_before_raising_when_a_command_replies_with_error(self):
+        # WHEN
+        with self.assertRaises(RuntimeError) as context:
+            self._nodes[0].send_commands(['rloc16', 'invalid', 'state'])
+
+        # THEN
+        self.assertEqual('Node 1: invalid: Error 7: InvalidArgs', str(context.exception))
+        self.assertEqual([['0400']], self._nodes[0].send_commands(['rloc16']))
+
+    def test_should_run_simulator_once_for_all_nodes_when_send_commands_to_nodes_is_called(self):
+        # WHEN
+        outputs = node.send_commands_to_nodes([
+            (self._nodes[0], ['rloc16', 'state']),
+            (self._nodes[1], ['ipaddr']),
+        ])
+
+        # THEN
+        self.assertEqual([[['0400'], ['leader']], [['fd00::1', 'fe80::1']]], outputs)
+        self.assertEqual([(0, [1, 2])], self._go_calls_with_nodes())
+
+    def test_should_read_replies_of_all_nodes_before_raising_when_a_node_replies_with_error(self):
+        # WHEN
+        with self.assertRaises(RuntimeError) as context:
+            node.send_commands_to_nodes([
+                (self._nodes[0], ['invalid']),
+                (self._nodes[1], ['state', 'invalid']),
+            ])
+
+        # THEN
+        self.assertEqual(
+            'Node 1: invalid: Error 7: InvalidArgs; Node 2: invalid: Error 7: InvalidArgs',
+            str(context.exception))
+        self.assertEqual([['0400']], self._nodes[1].send_commands(['rloc16']))
+
+
+class TestNodeStateCache(FakeCliTestCase):
+    def setUp(self):
+        super(TestNodeStateCache, self).setUp()
+        self._node = self._create_node(1, state_cache=True)
+        self._pop_received_commands(1)
+
+    def _read_state(self):
+        return self._node.get_addrs(), self._node.get_addr16(), self._node.get_addr64()
+
+    def test_should_not_send_commands_when_state_is_cached(self):
+        # GIVEN
+        expected_state = self._read_state()
+        self.assertEqual(['ipaddr', 'rloc16', 'extaddr'], self._pop_received_commands(1))
+
+        # WHEN
+        state = self._read_state()
+
+        # THEN
+        self.assertEqual(expected_state, state)
+        self.assertEqual((['fd00::1', 'fe80::1'], 0x0400, '1122334455667788'), state)
+        self.assertEqual([], self._pop_received_commands(1))
+
+    def test_should_clear_cache_when_state_changing_command_is_sent(self):
+        state_changes = [
+            lambda: self._node.set_mode('rsdn'),
+            lambda: self._node.add_ipaddr('fd00::5'),
+            self._node.start,
+            self._node.reset,
+        ]
+
+        for change_state in state_changes:
+            # GIVEN
+            self._read_state()
+            self._pop_received_commands(1)
+
+            # WHEN
+            change_state()
+
+            # THEN
+            self._read_state()
+            self.assertEqual(['ipaddr', 'rloc16', 'extaddr'], self._pop_received_commands(1)[-3:])
+
+    def test_should_expire_cache_when_simulator_time_advances(self):
+        # GIVEN
+        self._read_state()
+        self._pop_received_commands(1)
+
+        # WHEN
+        self._simulator.current_time += 1
+
+        # THEN
+        self._read_state()
+        self.assertEqual(['ipaddr', 'rloc16', 'extaddr'], self._pop_received_commands(1))
+
+    def test_should_fill_every_field_in_one_exchange_when_prefetch_state_method_is_called(self):
+        # WHEN
+        state = self._node.prefetch_state()
+
+        # THEN
+        self.assertEqual({
+            'extaddr': '1122334455667788',
+            'eui64': '18b4300000000001',
+            'rloc16': 0x0400,
+            'ipaddr': ['fd00::1', 'fe80::1'],
+        }, state)
+        self.assertEqual(['extaddr', 'eui64', 'rloc16', 'ipaddr'], self._pop_received_commands(1))
+        self.assertEqual([(0, 1)], self._go_calls_with_nodes())
+
+        self._read_state()
+        self._node.get_eui64()
+        self.assertEqual([], self._pop_received_commands(1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,243 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+
+import collections
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+import decode_pcap
+import message
+import pcap
+
+
+def any_ack_frame(sequence_number):
+    """ Returns an ACK frame prefixed with the channel byte. """
+    return bytearray([11, 0x02, 0x00, sequence_number, 0x00, 0x00])
+
+
+class TestPcapReader(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._filename = os.path.join(self._directory, 'capture')
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_should_read_frames_written_by_PcapCodec_when_iterated(self):
+        # GIVEN
+        codec = pcap.PcapCodec(self._filename)
+        codec.append(any_ack_frame(1), (1, 500))
+        codec.append(any_ack_frame(2), (2, 600))
+        codec.flush()
+
+        # WHEN
+        with pcap.PcapReader(self._filename + '.pcap') as reader:
+            frames = list(reader)
+
+        # THEN
+        self.assertEqual([(bytes(any_ack_frame(1)[1:]), (1, 500)),
+                          (bytes(any_ack_frame(2)[1:]), (2, 600))], frames)
+
+    def test_should_ignore_truncated_record_when_iterated(self):
+        # GIVEN
+        codec = pcap.PcapCodec(self._filename)
+        codec.append(any_ack_frame(1), (1, 500))
+        codec.append(any_ack_frame(2), (2, 600))
+        codec.close()
+
+        with open(self._filename + '.pcap', 'ab') as f:
+            f.write(struct.pack("<LLLL", 3, 0, 5, 5) + b'\x02')
+
+        # WHEN
+        with pcap.PcapReader(self._filename + '.pcap') as reader:
+            frames = list(reader)
+
+        # THEN
+        self.assertEqual(2, len(frames))
+
+    def test_should_read_frames_written_by_PcapngCodec_when_iterated(self):
+        # GIVEN
+        codec = pcap.PcapngCodec(self._filename)
+        codec.append(any_ack_frame(1), (1, 500), nodeid=2)
+        codec.append(any_ack_frame(2), (2, 600), nodeid=1)
+        codec.append(any_ack_frame(3), (3, 700), nodeid=2)
+        codec.flush()
+
+        # WHEN
+        with pcap.PcapReader(self._filename + '.pcapng') as reader:
+            frames = list(reader)
+
+        # THEN
+        self.assertEqual([(bytes(any_ack_frame(1)[1:]), (1, 500)),
+                          (bytes(any_ack_frame(2)[1:]), (2, 600)),
+                          (bytes(any_ack_frame(3)[1:]), (3, 700))], frames)
+
+    def test_should_write_interface_per_node_and_channel_when_PcapngCodec_append_method_is_called(self):
+        # GIVEN
+        codec = pcap.PcapngCodec(self._filename)
+
+        # WHEN
+        codec.append(bytearray([15]) + any_ack_frame(1)[1:], (1, 0), nodeid=2)
+        codec.append(any_ack_frame(2), (2, 0), nodeid=1)
+        codec.flush()
+
+        # THEN
+        with open(self._filename + '.pcapng', 'rb') as f:
+            data = f.read()
+
+        self.assertEqual(2, data.count(b'\x01\x00\x00\x00'
+                                       + struct.pack("<L", 44)
+                                       + struct.pack("<HHL", pcap.DLT_IEEE802_15_4_TAP, 0, 0)))
+        self.assertIn(b'node2', data)
+        self.assertIn(b'node1', data)
+        self.assertLess(data.index(b'node2'), data.index(b'node1'))
+
+        # Interface 1 is used for node 1, its frame is on channel 11
+        self.assertIn(struct.pack("<L", 1) + struct.pack("<LL", 0, 2000000), data)
+        self.assertIn(struct.pack("<HHHB", pcap.TAP_TLV_CHANNEL_ASSIGNMENT, 3, 15, 0), data)
+        self.assertIn(struct.pack("<HHHB", pcap.TAP_TLV_CHANNEL_ASSIGNMENT, 3, 11, 0), data)
+
+    def test_should_rotate_file_when_rotate_size_is_reached(self):
+        # GIVEN
+        codec = pcap.PcapCodec(self._filename, rotate_size=pcap.PCAP_HEADER_LENGTH + 2 * 21)
+
+        # WHEN
+        for i in range(5):
+            codec.append(any_ack_frame(i), (i, 0))
+        codec.close()
+
+        # THEN
+        frames = []
+        for filename in ('capture.pcap', 'capture.1.pcap', 'capture.2.pcap'):
+            with pcap.PcapReader(os.path.join(self._directory, filename)) as reader:
+                frames.append([timestamp for _, timestamp in reader])
+
+        self.assertEqual([[(0, 0), (1, 0)], [(2, 0), (3, 0)], [(4, 0)]], frames)
+
+    def test_should_rotate_file_and_keep_interface_ids_when_rotate_interval_is_reached(self):
+        # GIVEN
+        codec = pcap.PcapngCodec(self._filename, rotate_interval=10)
+
+        # WHEN
+        codec.append(any_ack_frame(1), (1, 0), nodeid=1)
+        codec.append(any_ack_frame(2), (5, 0), nodeid=2)
+        codec.append(any_ack_frame(3), (11, 0), nodeid=2)
+        codec.close()
+
+        # THEN
+        with pcap.PcapReader(os.path.join(self._directory, 'capture.pcapng')) as reader:
+            self.assertEqual([(1, 0), (5, 0)], [timestamp for _, timestamp in reader])
+
+        with open(os.path.join(self._directory, 'capture.1.pcapng'), 'rb') as f:
+            data = f.read()
+
+        self.assertLess(data.index(b'node1'), data.index(b'node2'))
+        self.assertIn(struct.pack("<L", 1) + struct.pack("<LL", 0, 11000000), data)
+
+    def test_should_buffer_frames_until_flush_interval_elapses(self):
+        # GIVEN
+        codec = pcap.PcapCodec(self._filename, flush_interval=3600)
+
+        # WHEN
+        codec.append(any_ack_frame(1), (1, 0))
+
+        # THEN
+        self.assertEqual(pcap.PCAP_HEADER_LENGTH, os.path.getsize(self._filename + '.pcap'))
+        codec.flush()
+        self.assertEqual(pcap.PCAP_HEADER_LENGTH + 21, os.path.getsize(self._filename + '.pcap'))
+
+    def test_should_raise_ValueError_when_file_is_not_a_pcap_file(self):
+        # GIVEN
+        with open(self._filename, 'wb') as f:
+            f.write(b'\x00' * pcap.PCAP_HEADER_LENGTH)
+
+        # THEN
+        self.assertRaises(ValueError, pcap.PcapReader, self._filename)
+
+
+class TestReadMessages(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        self._filename = os.path.join(self._directory, 'capture')
+
+    def tearDown(self):
+        shutil.rmtree(self._directory)
+
+    def test_should_decode_messages_and_count_errors_when_read_messages_is_called(self):
+        # GIVEN
+        codec = pcap.PcapCodec(self._filename)
+        codec.append(any_ack_frame(1), (1, 0))
+        codec.append(bytearray([11, 0x41]), (2, 0))
+        codec.append(any_ack_frame(3), (3, 0))
+        codec.flush()
+
+        stats = collections.Counter()
+
+        # WHEN
+        messages = list(decode_pcap.read_messages(self._filename + '.pcap', stats=stats))
+
+        # THEN
+        self.assertEqual([message.MessageType.ACK] * 2, [msg.type for msg in messages])
+        self.assertEqual([1, 3], [msg.mac_header.seq for msg in messages])
+        self.assertEqual(3, stats['frames'])
+        self.assertEqual(1, stats['errors'])
+
+    def test_should_report_channel_recorded_in_capture_when_read_messages_is_called(self):
+        # GIVEN
+        codec = pcap.PcapngCodec(self._filename)
+        codec.append(bytearray([15]) + any_ack_frame(1)[1:], (1, 0), nodeid=1)
+        codec.append(any_ack_frame(2), (2, 0), nodeid=2)
+        codec.flush()
+
+        # WHEN
+        messages = list(decode_pcap.read_messages(self._filename + '.pcapng', channel=26))
+
+        # THEN
+        self.assertEqual([(15,), (11,)], [msg.channel for msg in messages])
+
+    def test_should_report_given_channel_when_capture_does_not_record_it(self):
+        # GIVEN
+        codec = pcap.PcapCodec(self._filename)
+        codec.append(any_ack_frame(1), (1, 0))
+        codec.flush()
+
+        # WHEN
+        messages = list(decode_pcap.read_messages(self._filename + '.pcap', channel=26))
+
+        # THEN
+        self.assertEqual([(26,)], [msg.channel for msg in messages])
+
+
+if __name__ == "__main__":
+    unittest.main()
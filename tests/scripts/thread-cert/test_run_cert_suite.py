@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+
+import json
+import os
+import shutil
+import tempfile
+import textwrap
+import time
+import unittest
+import xml.etree.ElementTree as ElementTree
+
+import run_cert_suite
+
+
+class TestSchedule(unittest.TestCase):
+    def test_should_order_tests_longest_first_when_durations_are_recorded(self):
+        # GIVEN
+        durations = {'Cert_a': 10.0, 'Cert_b': 300.0, 'Cert_c': 60.0}
+
+        # WHEN
+        ordered = run_cert_suite.schedule(
+            ['Cert_a.py', 'Cert_b.py', 'Cert_c.py', 'Cert_new.py'], durations)
+
+        # THEN
+        self.assertEqual(
+            ['Cert_b.py', 'Cert_new.py', 'Cert_c.py', 'Cert_a.py'], ordered)
+
+
+class TestRunSuite(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._lock_path = run_cert_suite.OFFSET_LOCK_PATH
+        run_cert_suite.OFFSET_LOCK_PATH = os.path.join(self._tmpdir, 'offset')
+
+    def tearDown(self):
+        run_cert_suite.OFFSET_LOCK_PATH = self._lock_path
+        shutil.rmtree(self._tmpdir)
+
+    def _create_test(self, name, exit_status, sleep=0):
+        filename = os.path.join(self._tmpdir, name + '.py')
+        with open(filename, 'w') as f:
+            f.write(textwrap.dedent("""
+                import os
+                import sys
+                import time
+
+                with open(os.environ['TEST_NAME'] + '.env', 'w') as f:
+                    f.write(os.environ['PORT_OFFSET'])
+                time.sleep({})
+                sys.exit({})
+            """.format(sleep, exit_status)))
+        return filename
+
+    def _create_hung_test_with_child(self, name, child_marker):
+        filename = os.path.join(self._tmpdir, name + '.py')
+        with open(filename, 'w') as f:
+            f.write(textwrap.dedent("""
+                import os
+                import subprocess
+                import sys
+                import time
+
+                with open(os.environ['TEST_NAME'] + '.env', 'w') as f:
+                    f.write(os.environ['PORT_OFFSET'])
+                subprocess.Popen([sys.executable, '-c',
+                                  'import sys, time; time.sleep(1.5); open(sys.argv[1], "w")',
+                                  {!r}])
+                time.sleep(30)
+            """.format(child_marker)))
+        return filename
+
+    def _read_offset(self, output_dir, name):
+        with open(os.path.join(output_dir, name + '.env')) as f:
+            return int(f.read())
+
+    def test_should_run_tests_with_unique_port_offsets_and_report_results(self):
+        # GIVEN
+        tests = [
+            self._create_test('Cert_pass', 0, sleep=1),
+            self._create_test('Cert_fail', 1, sleep=1),
+            self._create_test('Cert_skip', 77),
+        ]
+        output_dir = os.path.join(self._tmpdir, 'out')
+        durations_file = os.path.join(self._tmpdir, 'durations.json')
+
+        # WHEN
+        results = run_cert_suite.run_suite(
+            tests, jobs=2, output_dir=output_dir, durations_file=durations_file)
+
+        # THEN
+        self.assertEqual(['Cert_pass', 'Cert_fail', 'Cert_skip'],
+                         [result.name for result in results])
+        self.assertEqual(['PASS', 'FAIL', 'SKIP'],
+                         [result.status for result in results])
+
+        # The first two tests ran at the same time
+        self.assertNotEqual(self._read_offset(output_dir, 'Cert_pass'),
+                            self._read_offset(output_dir, 'Cert_fail'))
+        self.assertTrue(os.path.exists(os.path.join(output_dir, 'Cert_fail.log')))
+
+        with open(durations_file) as f:
+            self.assertEqual({'Cert_pass', 'Cert_fail'}, set(json.load(f)))
+
+    def test_should_kill_test_when_timeout_expired(self):
+        # GIVEN
+        tests = [self._create_test('Cert_hang', 0, sleep=30)]
+
+        # WHEN
+        results = run_cert_suite.run_suite(
+            tests, jobs=1, output_dir=self._tmpdir, timeout=0.5,
+            durations_file=None)
+
+        # THEN
+        self.assertEqual('TIMEOUT', results[0].status)
+        self.assertTrue(results[0].failed)
+
+    def test_should_kill_children_of_test_when_timeout_expired(self):
+        # GIVEN
+        child_marker = os.path.join(self._tmpdir, 'child_alive')
+        tests = [self._create_hung_test_with_child('Cert_hang', child_marker)]
+
+        # WHEN
+        results = run_cert_suite.run_suite(
+            tests, jobs=1, output_dir=self._tmpdir, timeout=0.5,
+            durations_file=None)
+
+        # THEN
+        self.assertEqual('TIMEOUT', results[0].status)
+        time.sleep(2)
+        self.assertFalse(os.path.exists(child_marker))
+
+    def test_should_not_reuse_port_offset_of_test_which_timed_out(self):
+        # GIVEN
+        tests = [
+            self._create_test('Cert_hang', 0, sleep=30),
+            self._create_test('Cert_pass', 0),
+        ]
+
+        # WHEN
+        results = run_cert_suite.run_suite(
+            tests, jobs=1, output_dir=self._tmpdir, timeout=0.5,
+            durations_file=None)
+
+        # THEN
+        self.assertEqual(['TIMEOUT', 'PASS'], [result.status for result in results])
+        self.assertNotEqual(self._read_offset(self._tmpdir, 'Cert_hang'),
+                            self._read_offset(self._tmpdir, 'Cert_pass'))
+        self.assertEqual(
+            [], [name for name in os.listdir(self._tmpdir) if name.endswith('.lock.d')])
+
+    def test_should_write_junit_and_json_reports(self):
+        # GIVEN
+        results = [
+            run_cert_suite.TestResult('Cert_pass', 'PASS', 0, 1.5, 'Cert_pass.log'),
+            run_cert_suite.TestResult('Cert_fail', 'FAIL', 1, 2.5, 'Cert_fail.log'),
+            run_cert_suite.TestResult('Cert_skip', 'SKIP', 77, 0.1, 'Cert_skip.log'),
+        ]
+        junit_file = os.path.join(self._tmpdir, 'report.xml')
+        json_file = os.path.join(self._tmpdir, 'report.json')
+
+        # WHEN
+        run_cert_suite.write_junit_report(junit_file, results, 3.0)
+        run_cert_suite.write_json_report(json_file, results, 3.0)
+
+        # THEN
+        suite = ElementTree.parse(junit_file).getroot()
+        self.assertEqual('3', suite.get('tests'))
+        self.assertEqual('1', suite.get('failures'))
+        self.assertEqual('1', suite.get('skipped'))
+        self.assertIsNotNone(suite.find("testcase[@name='Cert_fail']/failure"))
+
+        with open(json_file) as f:
+            report = json.load(f)
+        self.assertEqual({'PASS': 1, 'FAIL': 1, 'SKIP': 1}, report['summary'])
+        self.assertEqual(2.5, report['tests'][1]['duration'])
+
+
+if __name__ == "__main__":
+    unittest.main()
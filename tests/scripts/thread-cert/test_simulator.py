@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import simulator
+
+
+class TestEventQueue(unittest.TestCase):
+    def test_should_pop_events_in_time_order_when_pop_method_is_called(self):
+        # GIVEN
+        queue = simulator.EventQueue()
+        queue.push(30, 'c')
+        queue.push(10, 'a')
+        queue.push(20, 'b')
+
+        # WHEN
+        actual_events = [queue.pop() for _ in range(3)]
+
+        # THEN
+        self.assertEqual(['a', 'b', 'c'], [e[2] for e in actual_events])
+        self.assertEqual([10, 20, 30], [e[0] for e in actual_events])
+
+    def test_should_pop_events_in_insertion_order_when_events_have_the_same_time(
+            self):
+        # GIVEN
+        queue = simulator.EventQueue()
+        for addr in range(5):
+            queue.push(100, addr)
+
+        # WHEN
+        actual_addrs = [queue.pop()[2] for _ in range(5)]
+
+        # THEN
+        self.assertEqual(list(range(5)), actual_addrs)
+
+    def test_should_skip_cancelled_event_when_pop_method_is_called(self):
+        # GIVEN
+        queue = simulator.EventQueue()
+        alarm = queue.push(10, 'alarm')
+        queue.push(20, 'radio')
+
+        # WHEN
+        queue.cancel(alarm)
+
+        # THEN
+        self.assertEqual(1, len(queue))
+        self.assertEqual('radio', queue.peek()[2])
+        self.assertEqual('radio', queue.pop()[2])
+        self.assertEqual(0, len(queue))
+        self.assertIsNone(queue.peek())
+
+    def test_should_not_return_cancelled_events_when_iterating(self):
+        # GIVEN
+        queue = simulator.EventQueue()
+        queue.push(30, 'c')
+        cancelled = queue.push(20, 'b')
+        queue.push(10, 'a')
+        queue.cancel(cancelled)
+
+        # WHEN
+        actual_addrs = [event[2] for event in queue]
+
+        # THEN
+        self.assertEqual(['a', 'c'], actual_addrs)
+
+
+class NcpVirtualTime(simulator.VirtualTime):
+    """ VirtualTime of the NCP simulator which records the nodes of go(). """
+
+    NCP_SIM = True
+
+    def __init__(self):
+        super(NcpVirtualTime, self).__init__()
+        self.go_nodeids = []
+
+    def go(self, duration, nodeid=None):
+        self.go_nodeids.append(nodeid)
+        if isinstance(nodeid, list):
+            super(NcpVirtualTime, self).go(duration, nodeid)
+
+
+class VirtualTimeTestCase(unittest.TestCase):
+    simulator_class = simulator.VirtualTime
+
+    def setUp(self):
+        # VirtualTime writes its capture to TEST_NAME
+        self._tmpdir = tempfile.mkdtemp()
+        self._test_name = os.environ.get('TEST_NAME')
+        os.environ['TEST_NAME'] = os.path.join(self._tmpdir, 'test_simulator')
+
+        self.simulator = self.simulator_class()
+
+    def tearDown(self):
+        self.simulator.stop()
+
+        if self._test_name is None:
+            del os.environ['TEST_NAME']
+        else:
+            os.environ['TEST_NAME'] = self._test_name
+        shutil.rmtree(self._tmpdir)
+
+
+class TestVirtualTimeWaitReadable(VirtualTimeTestCase):
+    def setUp(self):
+        super(TestVirtualTimeWaitReadable, self).setUp()
+        self.read_fd, self.write_fd = os.pipe()
+
+    def tearDown(self):
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+        super(TestVirtualTimeWaitReadable, self).tearDown()
+
+    def test_should_return_True_when_node_output_is_readable(self):
+        # GIVEN
+        os.write(self.write_fd, b'Done\r\n')
+
+        # WHEN
+        readable = self.simulator.wait_readable([self.read_fd], 1)
+
+        # THEN
+        self.assertTrue(readable)
+
+    def test_should_return_False_when_nothing_arrived_within_timeout(self):
+        # WHEN
+        readable = self.simulator.wait_readable([self.read_fd], 0.01)
+
+        # THEN
+        self.assertFalse(readable)
+
+
+class TestVirtualTimeGo(VirtualTimeTestCase):
+    simulator_class = NcpVirtualTime
+
+    def test_should_run_nodes_one_at_a_time_when_go_method_is_called_with_many_nodes_on_ncp(self):
+        # WHEN
+        self.simulator.go(0, [1, 2, 3])
+
+        # THEN
+        self.assertEqual([[1, 2, 3], 1, 2, 3], self.simulator.go_nodeids)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+
+import errno
+import socket
+import unittest
+
+import simulator_transport
+
+
+def any_free_address():
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    address = sock.getsockname()
+    sock.close()
+    return address
+
+
+class FailingSocket(object):
+    """ Socket which returns the given datagrams and then fails with error. """
+
+    def __init__(self, datagrams, error):
+        self._datagrams = list(datagrams)
+        self._error = error
+
+    def recvfrom(self, size):
+        if self._datagrams:
+            return self._datagrams.pop(0)
+        raise socket.error(self._error, 'Failing socket')
+
+    def close(self):
+        pass
+
+
+class TestSimulatorSocketTransport(unittest.TestCase):
+    def setUp(self):
+        self._peer = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._peer.bind(('127.0.0.1', 0))
+
+        self._address = any_free_address()
+        self._transport = simulator_transport.SimulatorSocketTransport()
+        self._transport.open(self._address)
+
+    def tearDown(self):
+        if self._transport.is_opened:
+            self._transport.close()
+        self._peer.close()
+
+    def test_should_return_all_pending_datagrams_when_recv_method_is_called(self):
+        # GIVEN
+        for data in (b'a', b'b', b'c'):
+            self._peer.sendto(data, self._address)
+
+        # WHEN
+        datagrams = self._transport.recv(1)
+
+        # THEN
+        self.assertEqual([b'a', b'b', b'c'], [data for data, _ in datagrams])
+        self.assertEqual([self._peer.getsockname()] * 3, [address for _, address in datagrams])
+
+    def test_should_send_queued_data_only_when_recv_method_is_called(self):
+        # GIVEN
+        self._peer.settimeout(0)
+        self._transport.send(b'a', self._peer.getsockname())
+        self._transport.send(b'b', self._peer.getsockname())
+        self.assertRaises(socket.error, self._peer.recvfrom, 1024)
+
+        # WHEN
+        self._transport.recv(0)
+
+        # THEN
+        self._peer.settimeout(1)
+        self.assertEqual(b'a', self._peer.recvfrom(1024)[0])
+        self.assertEqual(b'b', self._peer.recvfrom(1024)[0])
+
+    def test_should_return_empty_list_when_timeout_is_zero_and_nothing_is_pending(self):
+        # WHEN
+        datagrams = self._transport.recv(0)
+
+        # THEN
+        self.assertEqual([], datagrams)
+
+    def test_should_raise_timeout_when_nothing_is_received_within_timeout(self):
+        # THEN
+        self.assertRaises(socket.timeout, self._transport.recv, 0.1)
+
+    def test_should_ignore_socket_error_when_timeout_is_zero(self):
+        # GIVEN
+        self._transport.close()
+        self._transport._socket = FailingSocket([(b'a', self._address)], errno.ECONNREFUSED)
+
+        # WHEN
+        datagrams = self._transport.recv(0)
+
+        # THEN
+        self.assertEqual([(b'a', self._address)], datagrams)
+
+    def test_should_raise_socket_error_when_timeout_is_not_zero(self):
+        # GIVEN
+        self._transport.close()
+        self._transport._socket = FailingSocket([], errno.ECONNREFUSED)
+
+        # THEN
+        self.assertRaises(socket.error, self._transport.recv, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
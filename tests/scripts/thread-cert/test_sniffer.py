@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+try:
+    import Queue
+except ImportError:
+    import queue as Queue
+
+import config
+import message
+import sniffer
+import sniffer_transport
+from test_message import any_eui64, any_echo_data, create_echo_request_frame
+
+
+class FakeSnifferTransport(sniffer_transport.SnifferTransport):
+    def __init__(self):
+        self._frames = Queue.Queue()
+        self._opened = False
+
+    def inject(self, data, nodeid):
+        self._frames.put((data, nodeid))
+
+    def open(self):
+        self._opened = True
+
+    def close(self):
+        self._opened = False
+        self._frames.put(None)
+
+    @property
+    def is_opened(self):
+        return self._opened
+
+    def recv(self, bufsize):
+        frame = self._frames.get()
+        if frame is None:
+            raise RuntimeError("Transport is closed.")
+        return frame
+
+
+class RecordingMessageFactory(object):
+    """ Records the frames it is given and the threads calling it. """
+
+    def __init__(self):
+        self.frames = []
+        self.threads = set()
+
+    def create(self, data, timestamp=None):
+        self.frames.append(data.read())
+        self.threads.add(threading.current_thread())
+        return []
+
+
+def wait_for_received_frames(s, count, timeout=5):
+    deadline = time.time() + timeout
+    while s.counters['received'] < count and time.time() < deadline:
+        time.sleep(0.01)
+
+
+class TestSniffer(unittest.TestCase):
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        os.environ['TEST_NAME'] = os.path.join(self._tmpdir, 'test_sniffer')
+
+        self._transport = FakeSnifferTransport()
+        self._create_transport = (
+            sniffer_transport.SnifferTransportFactory.create_transport
+        )
+        sniffer_transport.SnifferTransportFactory.create_transport = (
+            lambda factory: self._transport
+        )
+
+    def tearDown(self):
+        sniffer_transport.SnifferTransportFactory.create_transport = (
+            self._create_transport
+        )
+        del os.environ['TEST_NAME']
+
+    def _frames(self, count):
+        src_eui64 = any_eui64()
+        dst_eui64 = any_eui64()
+        return [
+            create_echo_request_frame(src_eui64, dst_eui64, i, any_echo_data())
+            for i in range(count)
+        ]
+
+    def test_should_keep_per_node_order_when_frames_of_many_nodes_are_received(
+            self):
+        # GIVEN
+        s = sniffer.Sniffer(config.create_default_thread_message_factory())
+        s.start()
+
+        # WHEN
+        for frame in self._frames(20):
+            for nodeid in (1, 2, 3, 4):
+                self._transport.inject(frame, nodeid)
+
+        wait_for_received_frames(s, 80)
+
+        # THEN
+        for nodeid in (1, 2, 3, 4):
+            messages_set = s.get_messages_sent_by(nodeid)
+            self.assertEqual(
+                list(range(20)),
+                [
+                    messages_set.next_message_of(
+                        message.MessageType.ICMP
+                    ).icmp.body.sequence_number
+                    for _ in range(20)
+                ],
+            )
+
+        s.stop()
+        self.assertEqual(80, s.counters['received'])
+        self.assertEqual(80, s.counters['decoded'])
+        self.assertEqual(0, s.counters['dropped'])
+        self.assertEqual(0, s.counters['errors'])
+
+    def test_should_decode_frames_of_all_nodes_in_arrival_order_in_one_thread(
+            self):
+        # GIVEN
+        factory = RecordingMessageFactory()
+        s = sniffer.Sniffer(factory)
+        s.start()
+
+        # WHEN
+        frames = self._frames(10)
+        for i, frame in enumerate(frames):
+            self._transport.inject(frame, i % 3 + 1)
+
+        wait_for_received_frames(s, len(frames))
+        for nodeid in (1, 2, 3):
+            s.get_messages_sent_by(nodeid)
+        s.stop()
+
+        # THEN
+        self.assertEqual(frames, factory.frames)
+        self.assertEqual(1, len(factory.threads))
+
+    def test_should_count_dropped_frames_when_raw_queue_is_full(self):
+        # GIVEN
+        s = sniffer.Sniffer(config.create_default_thread_message_factory())
+        s.RAW_QUEUE_SIZE = 2
+        s._raw_frames = Queue.Queue(s.RAW_QUEUE_SIZE)
+
+        # Keep the dispatcher from consuming frames
+        s._dispatch_main_loop = lambda: None
+        s.start()
+
+        # WHEN
+        for frame in self._frames(5):
+            self._transport.inject(frame, 1)
+
+        wait_for_received_frames(s, 5)
+
+        # THEN
+        s.stop()
+        self.assertEqual(5, s.counters['received'])
+        self.assertEqual(3, s.counters['dropped'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+
+import unittest
+
+import mle
+import tlvs_parsing
+
+
+class AnySourceAddress(mle.SourceAddress):
+    pass
+
+
+def any_tlvs():
+    return tlvs_parsing.Tlvs([
+        mle.Version(2),
+        AnySourceAddress(0x0400),
+        mle.Address16(0x0401),
+        mle.SourceAddress(0x0402),
+    ])
+
+
+class TestTlvs(unittest.TestCase):
+
+    def test_should_return_first_tlv_of_type_or_subtype_when_get_method_is_called(self):
+        # GIVEN
+        tlvs = any_tlvs()
+
+        # WHEN
+        tlv = tlvs.get(mle.SourceAddress)
+
+        # THEN
+        self.assertIs(tlvs[1], tlv)
+        self.assertIsNone(tlvs.get(mle.LeaderData))
+
+    def test_should_return_tlvs_in_order_when_get_all_method_is_called_with_tuple_of_types(self):
+        # GIVEN
+        tlvs = any_tlvs()
+
+        # WHEN
+        found = tlvs.get_all((mle.Address16, mle.SourceAddress))
+
+        # THEN
+        self.assertEqual([tlvs[1], tlvs[2], tlvs[3]], found)
+
+    def test_should_find_appended_tlv_when_contains_method_is_called(self):
+        # GIVEN
+        tlvs = any_tlvs()
+        self.assertFalse(tlvs.contains(mle.LeaderData))
+
+        # WHEN
+        tlvs.append(mle.LeaderData(0, 0, 0, 0, 0))
+
+        # THEN
+        self.assertTrue(tlvs.contains(mle.LeaderData))
+
+    def test_should_find_replacing_tlv_when_tlv_is_replaced_in_place(self):
+        # GIVEN
+        tlvs = any_tlvs()
+        self.assertFalse(tlvs.contains(mle.LeaderData))
+
+        # WHEN
+        tlvs[0] = mle.LeaderData(0, 0, 0, 0, 0)
+
+        # THEN
+        self.assertIs(tlvs[0], tlvs.get(mle.LeaderData))
+        self.assertFalse(tlvs.contains(mle.Version))
+
+    def test_should_find_tlv_of_old_style_class_when_get_method_is_called(self):
+        # GIVEN
+        tlvs = tlvs_parsing.Tlvs([mle.Version(2), mle.PanId(0xface)])
+
+        # WHEN
+        tlv = tlvs.get(mle.PanId)
+
+        # THEN
+        self.assertIs(tlvs[1], tlv)
+
+    def test_should_not_copy_tlvs_when_wrap_method_is_called_with_tlvs(self):
+        # GIVEN
+        tlvs = any_tlvs()
+
+        # WHEN
+        wrapped = tlvs_parsing.Tlvs.wrap(tlvs)
+
+        # THEN
+        self.assertIs(tlvs, wrapped)
+        self.assertEqual(list(tlvs), tlvs_parsing.Tlvs.wrap(list(tlvs)))
+
+
+if __name__ == "__main__":
+    unittest.main()
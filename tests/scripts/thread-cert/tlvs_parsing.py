@@ -26,7 +26,81 @@
 #  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
 #  POSSIBILITY OF SUCH DAMAGE.
 
-import io
+import collections
+import inspect
+
+import common
+
+
+class Tlvs(list):
+    """ List of TLVs indexed by TLV class.
+
+    The index is built on the first query, so looking up a TLV class costs a
+    dict lookup instead of an isinstance() walk over the list. A TLV is
+    indexed under its class and all its base classes, so queries match the
+    same TLVs as isinstance() does. Any change to the list drops the index.
+    """
+
+    def _get_index(self):
+        if getattr(self, '_index', None) is None:
+            index = collections.defaultdict(list)
+            for position, tlv in enumerate(self):
+                # inspect.getmro() also walks Python 2 old-style classes
+                for tlv_class in inspect.getmro(tlv.__class__):
+                    if tlv_class is not object:
+                        index[tlv_class].append(position)
+
+            self._index = index
+
+        return self._index
+
+    def _positions(self, tlv_type):
+        index = self._get_index()
+
+        if isinstance(tlv_type, tuple):
+            positions = set()
+            for t in tlv_type:
+                positions.update(index.get(t, ()))
+            return sorted(positions)
+
+        return index.get(tlv_type, [])
+
+    def contains(self, tlv_type):
+        """ Returns True if the list contains a TLV of the type. """
+        return bool(self._positions(tlv_type))
+
+    def get(self, tlv_type):
+        """ Returns the first TLV of the type, None if there is none. """
+        positions = self._positions(tlv_type)
+        return self[positions[0]] if positions else None
+
+    def get_all(self, tlv_type):
+        """ Returns all TLVs of the type. """
+        return [self[position] for position in self._positions(tlv_type)]
+
+    @classmethod
+    def wrap(cls, tlvs):
+        """ Returns tlvs as Tlvs, without copying them if they already are. """
+        if isinstance(tlvs, cls):
+            return tlvs
+        return cls(tlvs)
+
+
+def _drops_index(method):
+    def wrapper(self, *args, **kwargs):
+        self._index = None
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+for _name in ('__setitem__', '__delitem__', '__setslice__', '__delslice__',
+              '__iadd__', '__imul__', 'append', 'extend', 'insert', 'pop',
+              'remove', 'reverse', 'sort', 'clear'):
+    if hasattr(list, _name):
+        setattr(Tlvs, _name, _drops_index(getattr(list, _name)))
 
 
 class SubTlvsFactory(object):
@@ -44,17 +118,17 @@ class SubTlvsFactory(object):
     def parse(self, data, message_info):
         sub_tlvs = []
 
-        while data.tell() < len(data.getvalue()):
+        while common.bytes_left(data) > 0:
             _type = ord(data.read(1))
 
             length = ord(data.read(1))
-            value = data.read(length)
+            value = common.read_stream(data, length)
 
             factory = self._get_factory(_type)
 
             message_info.length = length
-            tlv = factory.parse(io.BytesIO(value), message_info)
+            tlv = factory.parse(value, message_info)
 
             sub_tlvs.append(tlv)
 
-        return sub_tlvs
+        return Tlvs(sub_tlvs)
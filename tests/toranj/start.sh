@@ -77,6 +77,8 @@ run() {
 
 cd $(dirname $0)
 
+python -m unittest test_wpan || die "wpan unit tests failed"
+
 # On Travis CI, the $BUILD_TARGET is defined as "toranj-test-framework".
 if [ "$BUILD_TARGET" = "toranj-test-framework" ]; then
     coverage_option="--enable-coverage"
@@ -195,13 +195,8 @@ wpan.verify_within(check_prefix3_on_all_nodes, WAIT_TIME)
 # Verify that prefix1 is retained by `wpantund` and pushed to NCP after a reset
 r1.reset()
 
-
-def check_r1_is_associated():
-    verify(r1.is_associated())
-
-
 # Wait for r1 to recover after reset
-wpan.verify_within(check_r1_is_associated, WAIT_TIME)
+r1.wait_for(wpan.WPAN_STATE, lambda state: state == wpan.STATE_ASSOCIATED, WAIT_TIME)
 
 # Wait for on-mesh prefix to be updated
 wpan.verify_within(check_prefix1_on_all_nodes, WAIT_TIME)
@@ -110,18 +110,21 @@ for index in range(1, NUM_ROUTERS):
     routers[index].whitelist_node(routers[index - 1])
 
 routers[0].form("multi-hop")
-sed_children[0].join_node(routers[0], wpan.JOIN_TYPE_SLEEPY_END_DEVICE)
-sed_children[0].set(wpan.WPAN_POLL_INTERVAL, '500')
+
+# Each node joins as soon as its parent has joined.
+joins = [(sed_children[0], routers[0], wpan.JOIN_TYPE_SLEEPY_END_DEVICE)]
 
 for index in range(1, NUM_ROUTERS):
-    routers[index].join_node(routers[index - 1], wpan.JOIN_TYPE_ROUTER)
-    sed_children[index].join_node(
-        routers[index], wpan.JOIN_TYPE_SLEEPY_END_DEVICE
-    )
-    sed_children[index].set(wpan.WPAN_POLL_INTERVAL, '500')
+    joins.append((routers[index], routers[index - 1], wpan.JOIN_TYPE_ROUTER))
+    joins.append((sed_children[index], routers[index], wpan.JOIN_TYPE_SLEEPY_END_DEVICE))
+
+joins.append((fed_children[0], routers[0], wpan.JOIN_TYPE_END_DEVICE))
+joins.append((fed_children[-1], routers[-1], wpan.JOIN_TYPE_END_DEVICE))
+
+wpan.Node.join_all(joins)
 
-fed_children[0].join_node(routers[0], wpan.JOIN_TYPE_END_DEVICE)
-fed_children[-1].join_node(routers[-1], wpan.JOIN_TYPE_END_DEVICE)
+for sed in sed_children:
+    sed.set(wpan.WPAN_POLL_INTERVAL, '500')
 
 
 # -----------------------------------------------------------------------------------------------------------------------
@@ -136,11 +139,14 @@ src = routers[0].get(wpan.WPAN_IP6_MESH_LOCAL_ADDRESS)[1:-1]
 dst = routers[-1].get(wpan.WPAN_IP6_MESH_LOCAL_ADDRESS)[1:-1]
 
 for msg_length in MSG_LENS:
-    sender = routers[0].prepare_tx(src, dst, msg_length, NUM_MSGS)
+    sender = routers[0].prepare_tx(src, dst, msg_length, NUM_MSGS, measured=True)
     recver = routers[-1].prepare_rx(sender)
     wpan.Node.perform_async_tx_rx()
     verify(sender.was_successful)
     verify(recver.was_successful)
+    stats = recver.get_flow_stats(sender)
+    verify(stats.lost == 0 and stats.duplicates == 0)
+    print('{} bytes over {} hops: {}'.format(msg_length, NUM_ROUTERS - 1, stats))
 
 # Send from the SED child of the last router to the SED child of the first
 # router.
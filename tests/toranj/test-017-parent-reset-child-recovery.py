@@ -143,12 +143,7 @@ for child in all_children:
 # Reset the parent
 parent.reset()
 
-
-def check_parent_is_associated():
-    verify(parent.is_associated())
-
-
-wpan.verify_within(check_parent_is_associated, 5)
+parent.wait_for(wpan.WPAN_STATE, lambda state: state == wpan.STATE_ASSOCIATED, 5)
 
 # Verify that all the children are recovered and present in the parent's
 # child table again (within 5 seconds).
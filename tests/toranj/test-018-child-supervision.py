@@ -133,13 +133,8 @@ child.set(
     str(CHILD_SUPERVISION_CHECK_TIMEOUT),
 )
 
-
-def check_child_is_detached():
-    verify(not child.is_associated())
-
-
-wpan.verify_within(
-    check_child_is_detached, CHILD_SUPERVISION_CHECK_TIMEOUT / speedup + 8
+child.wait_for(
+    wpan.WPAN_STATE, lambda state: state != wpan.STATE_ASSOCIATED, CHILD_SUPERVISION_CHECK_TIMEOUT / speedup + 8
 )
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
@@ -153,12 +148,7 @@ parent.set(wpan.WPAN_MAC_WHITELIST_ENABLED, '0')
 
 # Wait for the child to attach back
 
-
-def check_child_is_attached():
-    verify(child.is_associated())
-
-
-wpan.verify_within(check_child_is_attached, 5)
+child.wait_for(wpan.WPAN_STATE, lambda state: state == wpan.STATE_ASSOCIATED, 5)
 
 # MAC counters are used to verify the child supervision behavior.
 
@@ -155,12 +155,7 @@ r2.add_prefix(prefix2)
 
 # Check that r2 forms its own partition
 
-
-def check_r2_become_leader():
-    verify(r2.get(wpan.WPAN_NODE_TYPE) == wpan.NODE_TYPE_LEADER)
-
-
-wpan.verify_within(check_r2_become_leader, long_wait)
+r2.wait_for(wpan.WPAN_NODE_TYPE, lambda node_type: node_type == wpan.NODE_TYPE_LEADER, long_wait)
 
 # While we have two partition, add a prefix on r1
 r1.add_prefix(prefix1)
@@ -0,0 +1,607 @@
+#!/usr/bin/env python
+#
+#  Copyright (c) 2019, The OpenThread Authors.
+#  All rights reserved.
+#
+#  Redistribution and use in source and binary forms, with or without
+#  modification, are permitted provided that the following conditions are met:
+#  1. Redistributions of source code must retain the above copyright
+#     notice, this list of conditions and the following disclaimer.
+#  2. Redistributions in binary form must reproduce the above copyright
+#     notice, this list of conditions and the following disclaimer in the
+#     documentation and/or other materials provided with the distribution.
+#  3. Neither the name of the copyright holder nor the
+#     names of its contributors may be used to endorse or promote products
+#     derived from this software without specific prior written permission.
+#
+#  THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+#  AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+#  IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+#  ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+#  LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+#  CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+#  SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+#  INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+#  CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+#  ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF THE
+#  POSSIBILITY OF SUCH DAMAGE.
+#
+# Unit tests of the `wpan` module parts which do not need `wpantund`:
+#
+#    python -m unittest test_wpan
+
+import errno
+import socket
+import sys
+import threading
+import time
+import traceback
+import unittest
+
+import wpan
+
+
+PROP_PATH = '/org/wpantund/wpan1'
+PROP_NAME = 'NCP:State'
+
+
+def fail_in_thread():
+    raise ValueError('failed in thread')
+
+
+class FakeNode(object):
+    """ Node with a `join_node()` which only records the joins """
+
+    def __init__(self, name, associated=False, join_time=0, join_error=None, joins=None):
+        self._name = name
+        self._associated = associated
+        self._join_time = join_time
+        self._join_error = join_error
+        self._joins = joins if joins is not None else []
+
+    def __repr__(self):
+        return self._name
+
+    def is_associated(self):
+        return self._associated
+
+    def join_node(self, node, node_type=wpan.JOIN_TYPE_ROUTER, should_set_key=True):
+        self._joins.append((self, node))
+        time.sleep(self._join_time)
+        if self._join_error is not None:
+            raise self._join_error
+        self._associated = True
+        return '{} joined {}'.format(self, node)
+
+
+class LoopbackNode(object):
+    """ Node of the async endpoints in tests, whose sockets are not bound to an interface """
+
+    _verbose = False
+    _index = 0
+    interface_name = 'lo'
+
+    def _remove_recver(self, recver):
+        pass
+
+
+def create_loopback_socket(node):
+    """Replaces `wpan._create_socket()`, creates a non-blocking UDP6 socket not bound to the node's interface"""
+    sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+    sock.setblocking(False)
+    return sock
+
+
+def any_free_port():
+    sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+    sock.bind(('::1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class NoBufferSocket(object):
+    """ Socket whose first `failures` sends fail with ENOBUFS, records the time of every send """
+
+    def __init__(self, sock, failures):
+        self._sock = sock
+        self._failures = failures
+        self.send_times = []
+
+    def sendto(self, msg, address):
+        self.send_times.append(time.time())
+        if len(self.send_times) <= self._failures:
+            raise socket.error(errno.ENOBUFS, 'No buffer space available')
+        return self._sock.sendto(msg, address)
+
+    def close(self):
+        self._sock.close()
+
+
+class FakePropChangeMonitor(wpan._PropChangeMonitor):
+    """ Property change monitor without D-Bus connection, signals are sent with `signal_later()` """
+
+    def __init__(self):
+        self._changes = {}
+        self._seq = 0
+        self._cond = threading.Condition()
+
+    def signal_later(self, delay, prop_name, value, path=PROP_PATH):
+        timer = threading.Timer(delay, self._handle_prop_changed, [prop_name, value], {'path': path})
+        timer.daemon = True
+        timer.start()
+
+
+def format_fake_dbus_value(value):
+    """ Stands in for `wpan._format_dbus_value()` as python `dbus` may not be installed, only formats strings """
+    if not isinstance(value, str):
+        raise ValueError('unsupported D-Bus value {!r}'.format(value))
+    return value
+
+
+class FakeChannel(object):
+    path = PROP_PATH
+
+
+class FakeWaitNode(wpan.Node):
+    """ Node whose property reads return the given `values` in order (repeating the last one) """
+
+    def __init__(self, values, channel=True):
+        self._index = 1
+        self._channel = FakeChannel() if channel else None
+        self._values = list(values)
+        self.num_gets = 0
+
+    def get(self, prop_name):
+        self.num_gets += 1
+        if len(self._values) > 1:
+            return self._values.pop(0)
+        return self._values[0]
+
+
+class AsyncEndpointTestCase(unittest.TestCase):
+    """ Creates the sockets of `AsyncSender` and `AsyncReceiver` objects with `create_loopback_socket()` """
+
+    def setUp(self):
+        self._create_socket = wpan._create_socket
+        wpan._create_socket = create_loopback_socket
+
+    def tearDown(self):
+        for endpoint in list(wpan._socket_map.values()):
+            endpoint.close()
+        wpan._create_socket = self._create_socket
+
+
+class FakeSender(object):
+    """ Sender of a measured flow, as seen by `FlowStats` """
+
+    measured = True
+
+    def __init__(self, flow_id, start_time=None):
+        self.flow_id = flow_id
+        self.start_time = start_time
+
+
+def measured_msg(flow_id, seq, tx_time, payload=b'payload'):
+    return wpan._MEASURED_HEADER.pack(wpan._MEASURED_MAGIC, flow_id, seq, tx_time) + payload
+
+
+class TestRunInParallel(unittest.TestCase):
+
+    def test_should_return_results_in_order_of_funcs(self):
+        # WHEN
+        results = wpan._run_in_parallel([lambda: 1, lambda: time.sleep(0.05) or 2, lambda: 3])
+
+        # THEN
+        self.assertEqual([1, 2, 3], results)
+
+    def test_should_raise_error_with_traceback_of_failed_thread(self):
+        # WHEN
+        try:
+            wpan._run_in_parallel([lambda: 1, fail_in_thread])
+        except ValueError:
+            error_traceback = traceback.extract_tb(sys.exc_info()[2])
+        else:
+            self.fail('ValueError not raised')
+
+        # THEN
+        self.assertEqual('fail_in_thread', error_traceback[-1][2])
+
+
+class TestJoinAll(unittest.TestCase):
+
+    def _join_all(self, joins):
+        """Runs `Node.join_all()`, fails the test if it does not finish in time, returns its result or error"""
+        outcome = {}
+
+        def run():
+            try:
+                outcome['result'] = wpan.Node.join_all(joins)
+            except BaseException as e:
+                outcome['error'] = e
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive(), 'join_all() did not finish')
+        return outcome
+
+    def test_should_join_chained_nodes_after_their_parent(self):
+        # GIVEN
+        joins = []
+        leader = FakeNode('leader', associated=True)
+        router = FakeNode('router', join_time=0.1, joins=joins)
+        child = FakeNode('child', joins=joins)
+
+        # WHEN
+        outcome = self._join_all([
+            (child, router, wpan.JOIN_TYPE_END_DEVICE),
+            (router, leader, wpan.JOIN_TYPE_ROUTER),
+        ])
+
+        # THEN
+        self.assertEqual(['child joined router', 'router joined leader'], outcome['result'])
+        self.assertEqual([(router, leader), (child, router)], joins)
+
+    def test_should_fail_right_away_when_parent_failed_to_join(self):
+        # GIVEN
+        joins = []
+        leader = FakeNode('leader', associated=True)
+        router = FakeNode('router', join_error=wpan.Node._NodeError('router failed'), joins=joins)
+        child = FakeNode('child', joins=joins)
+
+        # WHEN
+        outcome = self._join_all([
+            (router, leader, wpan.JOIN_TYPE_ROUTER),
+            (child, router, wpan.JOIN_TYPE_END_DEVICE),
+        ])
+
+        # THEN
+        self.assertEqual('router failed', str(outcome['error']))
+        self.assertEqual([(router, leader)], joins)
+
+    def test_should_raise_when_parent_is_not_associated(self):
+        # GIVEN
+        joins = []
+        leader = FakeNode('leader')
+        router = FakeNode('router', joins=joins)
+
+        # WHEN
+        outcome = self._join_all([(router, leader, wpan.JOIN_TYPE_ROUTER)])
+
+        # THEN
+        self.assertIsInstance(outcome['error'], wpan.Node._NodeError)
+        self.assertEqual([], joins)
+
+
+class TestPercentile(unittest.TestCase):
+
+    def test_should_return_nearest_rank_percentile(self):
+        # GIVEN
+        values = list(range(1, 11))
+
+        # THEN
+        self.assertEqual(1, wpan._percentile(values, 0))
+        self.assertEqual(5, wpan._percentile(values, 50))
+        self.assertEqual(9, wpan._percentile(values, 90))
+        self.assertEqual(10, wpan._percentile(values, 99))
+        self.assertEqual(10, wpan._percentile(values, 100))
+        self.assertEqual(2, wpan._percentile([1, 2, 3, 4], 50))
+        self.assertIsNone(wpan._percentile([], 50))
+
+
+class TestFlowStats(AsyncEndpointTestCase):
+
+    SENDER_ADDR = 'fd00::1'
+    SENDER_PORT = 1234
+
+    def _create_receiver(self, count, flow_id=7, start_time=None):
+        receiver = wpan.AsyncReceiver(LoopbackNode(), 0)
+        flow = receiver._add_sender(self.SENDER_ADDR, self.SENDER_PORT, b'payload', count,
+                                    FakeSender(flow_id, start_time))
+        return receiver, flow
+
+    def _receive(self, receiver, msg, rx_time):
+        receiver._handle_msg(msg, (self.SENDER_ADDR, self.SENDER_PORT), rx_time)
+
+    def test_should_not_count_duplicates_towards_completion(self):
+        # GIVEN
+        receiver, flow = self._create_receiver(count=3)
+
+        # WHEN
+        for seq in (0, 1, 1, 1):
+            self._receive(receiver, measured_msg(7, seq, 1.0), 2.0)
+
+        # THEN
+        self.assertFalse(receiver.was_successful)
+        self.assertEqual(2, flow.received)
+        self.assertEqual(2, flow.duplicates)
+        self.assertEqual(1, flow.lost)
+
+        self._receive(receiver, measured_msg(7, 2, 1.0), 2.0)
+        self.assertTrue(receiver.was_successful)
+
+    def test_should_ignore_messages_of_other_flows(self):
+        # GIVEN
+        receiver, flow = self._create_receiver(count=1)
+
+        # WHEN
+        self._receive(receiver, measured_msg(8, 0, 1.0), 2.0)
+        self._receive(receiver, measured_msg(7, 0, 1.0, payload=b'other'), 2.0)
+        self._receive(receiver, b'payload', 2.0)
+
+        # THEN
+        self.assertEqual(0, flow.received)
+        self.assertFalse(receiver.was_successful)
+
+    def test_should_count_messages_received_after_higher_sequence_number_as_reordered(self):
+        # GIVEN
+        receiver, flow = self._create_receiver(count=5)
+
+        # WHEN
+        for seq in (0, 2, 1, 4, 3):
+            self._receive(receiver, measured_msg(7, seq, 1.0), 2.0)
+
+        # THEN
+        self.assertEqual(2, flow.reordered)
+        self.assertTrue(receiver.was_successful)
+
+    def test_should_report_nearest_rank_latency_percentiles(self):
+        # GIVEN
+        receiver, flow = self._create_receiver(count=10)
+
+        # WHEN
+        for seq in range(10):
+            # latencies of 10, 20, ..., 100 ms in reverse order
+            self._receive(receiver, measured_msg(7, seq, 100.0), 100.0 + (10 - seq) * 0.01)
+
+        # THEN
+        self.assertAlmostEqual(0.01, flow.latency_min)
+        self.assertAlmostEqual(0.05, flow.latency_median)
+        self.assertAlmostEqual(0.09, flow.latency_percentile(90))
+        self.assertAlmostEqual(0.1, flow.latency_max)
+        self.assertAlmostEqual(0.055, flow.latency_avg)
+
+    def test_should_exclude_header_bytes_from_goodput(self):
+        # GIVEN
+        receiver, flow = self._create_receiver(count=2, start_time=10.0)
+        msg_len = wpan.MEASURED_HEADER_SIZE + len(b'payload')
+
+        # WHEN
+        self._receive(receiver, measured_msg(7, 0, 10.0), 11.0)
+        self._receive(receiver, measured_msg(7, 1, 10.5), 12.0)
+
+        # THEN
+        self.assertEqual(2.0, flow.duration)
+        self.assertEqual(2 * msg_len / 2.0, flow.throughput)
+        self.assertEqual(2 * len(b'payload') / 2.0, flow.goodput)
+
+
+class TestTrafficLoop(AsyncEndpointTestCase):
+
+    def _prepare_flow(self, count, rate=None, burst=1):
+        """Prepares a measured flow between two loopback sockets, returns the sender and the receiver"""
+        node = LoopbackNode()
+        dst_port = any_free_port()
+        sender = wpan.AsyncSender(node, '::1', any_free_port(), '::1', dst_port, b'payload', count,
+                                  rate=rate, burst=burst, measured=True)
+        receiver = wpan.AsyncReceiver(node, dst_port)
+        receiver._add_sender(sender.src_addr, sender.src_port, sender.msg, sender.count, sender)
+        return sender, receiver
+
+    def test_should_finish_when_receiver_got_all_messages(self):
+        # GIVEN
+        sender, receiver = self._prepare_flow(count=3)
+
+        # WHEN
+        finished = wpan._run_traffic_loop(5)
+
+        # THEN
+        self.assertTrue(finished)
+        self.assertTrue(sender.was_successful)
+        self.assertTrue(receiver.was_successful)
+        self.assertEqual({}, wpan._socket_map)
+
+    def test_should_pace_bursts_at_rate_without_doubling_first_burst(self):
+        # GIVEN
+        _, receiver = self._prepare_flow(count=6, rate=20, burst=2)
+
+        # WHEN
+        self.assertTrue(wpan._run_traffic_loop(5))
+
+        # THEN
+        tx_times = [wpan._MEASURED_HEADER.unpack_from(msg)[3] for msg, _ in receiver.all_rx_msg]
+        tx_times = [tx_time - tx_times[0] for tx_time in sorted(tx_times)]
+
+        # bursts of two messages every 2 / 20 = 0.1 sec
+        for burst_start in (0, 2, 4):
+            self.assertLess(tx_times[burst_start + 1] - tx_times[burst_start], 0.05)
+        self.assertGreater(tx_times[2], 0.09)
+        self.assertGreater(tx_times[4], 0.19)
+
+    def test_should_back_off_when_send_fails_with_ENOBUFS(self):
+        # GIVEN
+        sender, receiver = self._prepare_flow(count=1)
+        sock = NoBufferSocket(sender._sock, failures=3)
+        sender._sock = sock
+
+        # WHEN
+        self.assertTrue(wpan._run_traffic_loop(5))
+
+        # THEN
+        self.assertEqual(4, len(sock.send_times))
+        for previous, current in zip(sock.send_times, sock.send_times[1:]):
+            self.assertGreaterEqual(current - previous, wpan._ENOBUFS_BACKOFF * 0.9)
+        self.assertTrue(receiver.was_successful)
+
+    def test_should_time_out_when_receiver_does_not_get_all_messages(self):
+        # GIVEN
+        sender, receiver = self._prepare_flow(count=3)
+        sender.close()
+
+        # WHEN
+        start_time = time.time()
+        finished = wpan._run_traffic_loop(0.2)
+
+        # THEN
+        self.assertFalse(finished)
+        self.assertGreaterEqual(time.time() - start_time, 0.2)
+        self.assertFalse(receiver.was_successful)
+
+    def test_should_close_listener_without_senders_on_first_message(self):
+        # GIVEN
+        port = any_free_port()
+        listener = wpan.AsyncReceiver(LoopbackNode(), port)
+        listener._set_listen_timeout(5)
+
+        sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+        sock.sendto(b'hello', ('::1', port))
+        sock.close()
+
+        # WHEN
+        start_time = time.time()
+        finished = wpan._run_traffic_loop(10)
+
+        # THEN
+        self.assertTrue(finished)
+        self.assertLess(time.time() - start_time, 1)
+        self.assertEqual([b'hello'], [msg for msg, _ in listener.all_rx_msg])
+
+
+class PropChangeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self._format_dbus_value = wpan._format_dbus_value
+        self._get_prop_change_monitor = wpan._get_prop_change_monitor
+        self.monitor = FakePropChangeMonitor()
+        wpan._format_dbus_value = format_fake_dbus_value
+        wpan._get_prop_change_monitor = lambda: self.monitor
+
+    def tearDown(self):
+        wpan._format_dbus_value = self._format_dbus_value
+        wpan._get_prop_change_monitor = self._get_prop_change_monitor
+
+
+class TestPropChangeMonitor(PropChangeTestCase):
+
+    def test_should_wake_up_prop_change_waiter_on_signal(self):
+        # GIVEN
+        self.monitor.signal_later(0.1, PROP_NAME, 'associated')
+
+        # WHEN
+        start_time = time.time()
+        change = self.monitor.wait_prop_change(PROP_PATH, PROP_NAME, self.monitor.seq, 5)
+
+        # THEN
+        self.assertEqual((1, 'associated'), change)
+        self.assertLess(time.time() - start_time, 1)
+
+    def test_should_ignore_other_and_earlier_changes_when_waiting_prop_change(self):
+        # GIVEN
+        self.monitor._handle_prop_changed(PROP_NAME, 'offline', path=PROP_PATH)
+        seq = self.monitor.seq
+        self.monitor.signal_later(0, 'NCP:Channel', '11', path=PROP_PATH)
+        self.monitor.signal_later(0, PROP_NAME, 'associated', path='/org/wpantund/wpan2')
+
+        # WHEN
+        change = self.monitor.wait_prop_change(PROP_PATH, PROP_NAME, seq, 0.2)
+
+        # THEN
+        self.assertIsNone(change)
+        self.assertEqual(3, self.monitor.seq)
+
+    def test_should_keep_unformatted_value_as_none(self):
+        # WHEN
+        self.monitor._handle_prop_changed(PROP_NAME, 1, path=PROP_PATH)
+
+        # THEN
+        self.assertEqual((1, None), self.monitor.wait_prop_change(PROP_PATH, PROP_NAME, 0, 0))
+
+    def test_should_wake_up_any_change_waiter_on_signal(self):
+        # GIVEN
+        self.monitor.signal_later(0.1, 'NCP:Channel', '11', path='/org/wpantund/wpan2')
+
+        # WHEN
+        start_time = time.time()
+        self.monitor.wait_any_change(self.monitor.seq, 5)
+
+        # THEN
+        self.assertEqual(1, self.monitor.seq)
+        self.assertLess(time.time() - start_time, 1)
+
+    def test_should_return_from_any_change_wait_on_timeout(self):
+        # WHEN
+        start_time = time.time()
+        self.monitor.wait_any_change(self.monitor.seq, 0.2)
+
+        # THEN
+        self.assertEqual(0, self.monitor.seq)
+        self.assertGreaterEqual(time.time() - start_time, 0.2)
+
+
+class TestNodeWaitFor(PropChangeTestCase):
+
+    def test_should_return_signaled_value_without_reading_property(self):
+        # GIVEN
+        node = FakeWaitNode(['offline'])
+        self.monitor.signal_later(0.1, PROP_NAME, 'associated')
+
+        # WHEN
+        start_time = time.time()
+        value = node.wait_for(PROP_NAME, lambda value: value == 'associated', 5, poll_interval=5)
+
+        # THEN
+        self.assertEqual('associated', value)
+        self.assertEqual(1, node.num_gets)
+        self.assertLess(time.time() - start_time, 1)
+
+    def test_should_read_property_when_signaled_value_is_not_formatted(self):
+        # GIVEN
+        node = FakeWaitNode(['offline', 'associated'])
+        self.monitor.signal_later(0.1, PROP_NAME, 1)
+
+        # WHEN
+        start_time = time.time()
+        value = node.wait_for(PROP_NAME, lambda value: value == 'associated', 5, poll_interval=5)
+
+        # THEN
+        self.assertEqual('associated', value)
+        self.assertEqual(2, node.num_gets)
+        self.assertLess(time.time() - start_time, 1)
+
+    def test_should_poll_property_which_is_not_signaled(self):
+        # GIVEN
+        node = FakeWaitNode(['offline', 'offline', 'associated'])
+
+        # WHEN
+        value = node.wait_for(PROP_NAME, lambda value: value == 'associated', 5, poll_interval=0.1)
+
+        # THEN
+        self.assertEqual('associated', value)
+        self.assertEqual(3, node.num_gets)
+
+    def test_should_poll_property_without_monitor(self):
+        # GIVEN
+        node = FakeWaitNode(['offline', 'associated'], channel=False)
+        self.monitor.signal_later(0, PROP_NAME, 'offline')
+
+        # WHEN
+        value = node.wait_for(PROP_NAME, lambda value: value == 'associated', 5)
+
+        # THEN
+        self.assertEqual('associated', value)
+        self.assertEqual(2, node.num_gets)
+
+    def test_should_raise_verify_error_on_timeout(self):
+        # GIVEN
+        node = FakeWaitNode(['offline'])
+        self.monitor.signal_later(0.1, PROP_NAME, 'detached')
+
+        # THEN
+        with self.assertRaises(wpan.VerifyError):
+            node.wait_for(PROP_NAME, lambda value: value == 'associated', 0.3, poll_interval=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
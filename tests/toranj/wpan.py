@@ -35,8 +35,29 @@ import random
 import weakref
 import subprocess
 import socket
-import asyncore
+import select
+import errno
 import inspect
+import binascii
+import threading
+import struct
+import itertools
+import math
+
+try:
+    import dbus
+    import dbus.lowlevel
+except ImportError:
+    dbus = None
+
+try:
+    import dbus.mainloop.glib
+    try:
+        from gi.repository import GLib
+    except ImportError:
+        import gobject as GLib
+except ImportError:
+    GLib = None
 
 # ----------------------------------------------------------------------------------------------------------------------
 # wpantund properties
@@ -259,6 +280,239 @@ def _log(text, new_line=True, flush=True):
     if flush:
         sys.stdout.flush()
 
+
+if sys.version_info[0] == 2:
+    # The three-argument `raise` is a syntax error on Python 3
+    exec('def _reraise(exc_info):\n    raise exc_info[0], exc_info[1], exc_info[2]\n')
+else:
+    def _reraise(exc_info):
+        raise exc_info[1].with_traceback(exc_info[2])
+
+
+def _run_in_parallel(funcs):
+    """Calls all `funcs` (functions without arguments) in parallel threads and returns their results as a list.
+       Once all of them finished, the exception raised by the first failed function (if any) is raised again, with the
+       traceback of the failed thread.
+    """
+    results = [None] * len(funcs)
+    errors = [None] * len(funcs)
+
+    def run(index):
+        try:
+            results[index] = funcs[index]()
+        except BaseException:
+            errors[index] = sys.exc_info()
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(len(funcs))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for error in errors:
+        if error is not None:
+            _reraise(error)
+    return results
+
+# -----------------------------------------------------------------------------------------------------------------------
+# wpantund D-Bus control channel
+
+
+class _ChannelError(Exception):
+    pass
+
+
+def _format_dbus_value(value, indent=0):
+    """Formats a value received over D-Bus the same way `wpanctl get -v` prints it.
+       Raises `ValueError` for value types `wpanctl` does not print as a plain value.
+    """
+    if isinstance(value, dbus.Boolean):
+        return 'true' if value else 'false'
+    if isinstance(value, (dbus.String, dbus.ObjectPath)):
+        return '"{}"'.format(value)
+    if isinstance(value, dbus.ByteArray):
+        return '[{}]'.format(binascii.hexlify(value).decode('ascii').upper())
+    if isinstance(value, dbus.Byte):
+        return '0x{:02X}'.format(int(value))
+    if isinstance(value, dbus.UInt16):
+        return '0x{:04X}'.format(int(value))
+    if isinstance(value, dbus.UInt64):
+        return '0x{:016X}'.format(int(value))
+    if isinstance(value, (dbus.Int16, dbus.Int32, dbus.UInt32, dbus.Int64)):
+        return '{}'.format(int(value))
+    if isinstance(value, dbus.Double):
+        return '{:f}'.format(value)
+    if isinstance(value, dbus.Dictionary):
+        items = ['\t' * (indent + 1) + _format_dbus_value(key, indent + 2) + ' => '
+                 + _format_dbus_value(item, indent + 2) + '\n' for key, item in value.items()]
+    elif isinstance(value, dbus.Array):
+        items = ['\t' * (indent + 1) + _format_dbus_value(item, indent + 1) + '\n' for item in value]
+    else:
+        raise ValueError('unsupported D-Bus value {!r}'.format(value))
+    if len(items) == 0:
+        return '[]'
+    return '[\n' + ''.join(items) + '\t' * indent + ']'
+
+
+class _WpantundChannel(object):
+    """ A long-lived D-Bus connection to the wpantund instance of a node.
+
+    All requests of a batch are sent before waiting for any reply, so a batch takes a single round trip.
+    """
+
+    _BUS_NAME = 'org.wpantund'
+    _OBJECT_PATH_PREFIX = '/org/wpantund/'
+    _INTERFACE = 'org.wpantund.v1'
+    _TIMEOUT = 60    # reply timeout in seconds
+
+    def __init__(self, interface_name):
+        self._path = self._OBJECT_PATH_PREFIX + interface_name
+        self._bus = None
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return self._path
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._bus is not None:
+            self._bus.close()
+            self._bus = None
+
+    def _send(self, method, args, signature):
+        if self._bus is None:
+            self._bus = dbus.SystemBus(private=True)
+
+        msg = dbus.lowlevel.MethodCallMessage(
+            self._BUS_NAME, self._path, self._INTERFACE, method)
+        msg.append(signature=signature, *args)
+        replies = []
+        pending_call = self._bus.send_message_with_reply(
+            msg, replies.append, self._TIMEOUT, require_main_loop=False)
+        return pending_call, replies
+
+    def request(self, requests):
+        """Sends a list of `(method, args, signature)` requests and returns their replies (the values following the
+           wpantund status) in the same order. Raises `_ChannelError` if any of the requests failed.
+        """
+        with self._lock:
+            try:
+                pending = [self._send(*request) for request in requests]
+                replies = []
+                for pending_call, reply in pending:
+                    pending_call.block()
+                    replies.append(reply[0])
+            except dbus.exceptions.DBusException as e:
+                # The connection may be unusable (e.g. wpantund restarted), reconnect on next request.
+                self._close()
+                raise _ChannelError(str(e))
+
+        results = []
+        for (method, args, _), reply in zip(requests, replies):
+            if isinstance(reply, dbus.lowlevel.ErrorMessage):
+                raise _ChannelError('{}{} failed: {} {}'.format(
+                    method, tuple(args), reply.get_error_name(), reply.get_args_list()))
+            values = reply.get_args_list(byte_arrays=True)
+            if values[0] != 0:
+                raise _ChannelError('{}{} failed: status {}'.format(method, tuple(args), values[0]))
+            results.append(values[1:])
+        return results
+
+
+class _PropChangeMonitor(object):
+    """ Receives the `PropChanged` signals of all wpantund instances and keeps the last signaled value of each
+    property.
+
+    Signals are received on a separate D-Bus connection served by a GLib main loop running in a daemon thread.
+    """
+
+    _SIGNAL_NAME = 'PropChanged'
+
+    def __init__(self):
+        # map from (object path, property name) to (sequence number, formatted value or None)
+        self._changes = {}
+        self._seq = 0
+        self._cond = threading.Condition()
+
+        dbus.mainloop.glib.threads_init()
+        self._bus = dbus.SystemBus(mainloop=dbus.mainloop.glib.DBusGMainLoop(), private=True)
+        self._bus.add_signal_receiver(
+            self._handle_prop_changed,
+            signal_name=self._SIGNAL_NAME,
+            dbus_interface=_WpantundChannel._INTERFACE,
+            path_keyword='path',
+            byte_arrays=True)
+
+        self._loop = GLib.MainLoop()
+        thread = threading.Thread(target=self._loop.run)
+        thread.daemon = True
+        thread.start()
+
+    def _handle_prop_changed(self, prop_name, value, path=None):
+        try:
+            value = _format_dbus_value(value)
+        except ValueError:
+            value = None  # the new value must be read with `wpanctl`
+        with self._cond:
+            self._seq += 1
+            self._changes[(path, str(prop_name))] = (self._seq, value)
+            self._cond.notify_all()
+
+    @property
+    def seq(self):
+        """The sequence number of the last received signal"""
+        with self._cond:
+            return self._seq
+
+    def wait_prop_change(self, path, prop_name, seq, timeout):
+        """Waits until property `prop_name` of object `path` changes after sequence number `seq`.
+           Returns `(seq, value)` of the change (`value` is None if it could not be formatted), or None on timeout.
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                change = self._changes.get((path, prop_name))
+                if change is not None and change[0] > seq:
+                    return change
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def wait_any_change(self, seq, timeout):
+        """Waits until any property of any node changes after sequence number `seq` or `timeout` expires"""
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._seq <= seq:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+
+_prop_change_monitor = None
+_prop_change_monitor_lock = threading.Lock()
+
+
+def _get_prop_change_monitor():
+    """Returns the `_PropChangeMonitor` (started on first use) or None if property change signals are not available"""
+    global _prop_change_monitor
+    with _prop_change_monitor_lock:
+        if _prop_change_monitor is None:
+            if GLib is None or not any(node._channel is not None for node in Node._all_nodes):
+                return None
+            try:
+                _prop_change_monitor = _PropChangeMonitor()
+            except dbus.exceptions.DBusException as e:
+                _log('Property change signals are not available: {}'.format(e))
+                _prop_change_monitor = False
+        return _prop_change_monitor or None
+
 # -----------------------------------------------------------------------------------------------------------------------
 # Node class
 
@@ -283,6 +537,11 @@ class Node(object):
     # Otherwise, the posix NCP `ot-ncp-ftd` is used
     _POSIX_APP_ENV_VAR = 'TORANJ_POSIX_APP_RCP_MODEL'
 
+    # Environment variable used to determine how to get/set/add/remove properties
+    # If set to 1, a D-Bus connection to wpantund is kept open (if python `dbus` module is available).
+    # Otherwise (default), a `wpanctl` process is run for each of them.
+    _DBUS_ENV_VAR = 'TORANJ_DBUS'
+
     # determines if the wpantund logs are saved in file or sent to stdout
     _TUND_LOG_TO_FILE = True
     # name of wpantund log file (if # name of wpantund _TUND_LOG_TO_FILE is
@@ -341,11 +600,19 @@ class Node(object):
 
         self._wpanctl_cmd = self._WPANCTL + ' -I ' + self._interface_name + ' '
 
+        if dbus is not None and os.environ.get(self._DBUS_ENV_VAR, '0') in ['1', 'yes']:
+            self._channel = _WpantundChannel(self._interface_name)
+        else:
+            self._channel = None
+
         # map from local_port to `AsyncReceiver` object
         self._recvers = weakref.WeakValueDictionary()
+        self._ready = False
         Node._all_nodes.add(self)
 
     def __del__(self):
+        if self._channel is not None:
+            self._channel.close()
         self._wpantund_process.poll()
         if self._wpantund_process.returncode is None:
             self._wpantund_process.terminate()
@@ -394,21 +661,60 @@ class Node(object):
             result = result[:-1]
 
         if self._verbose:
-            if '\n' in result:
-                _log(':')
-                for line in result.splitlines():
-                    _log('     ' + line)
-            else:
-                _log(' -> \'{}\''.format(result))
+            self._log_wpanctl_result(result)
 
         return result
 
+    def _log_wpanctl_result(self, result):
+        if '\n' in result:
+            _log(':')
+            for line in result.splitlines():
+                _log('     ' + line)
+        else:
+            _log(' -> \'{}\''.format(result))
+
+    def _request(self, cmds, requests):
+        """Sends `requests` (see `_WpantundChannel.request()`) matching the wpanctl commands `cmds` over the D-Bus
+           channel. Failures are reported as a `subprocess.CalledProcessError`, as if `wpanctl` had failed.
+        """
+        if self._verbose:
+            _log('$ Node{}.wpanctl(\'{}\')'.format(self._index, '; '.join(cmds)), new_line=False)
+
+        try:
+            return self._channel.request(requests)
+        except _ChannelError as e:
+            if self._verbose:
+                _log(' -> error: {}'.format(e))
+            raise subprocess.CalledProcessError(1, '; '.join(cmds), output=str(e))
+
     # ------------------------------------------------------------------------------------------------------------------
     # APIs matching `wpanctl` commands.
 
     def get(self, prop_name, value_only=True):
+        if value_only and self._channel is not None:
+            return self.get_props([prop_name])[0]
         return self.wpanctl('get ' + ('-v ' if value_only else '') + prop_name)
 
+    def get_props(self, prop_names):
+        """Gets the values of a list of properties (in a single round trip to wpantund) and returns them as a list"""
+        cmds = ['get -v ' + prop_name for prop_name in prop_names]
+        if self._channel is None:
+            return [self.wpanctl(cmd) for cmd in cmds]
+
+        replies = self._request(cmds, [('PropGet', [prop_name], 's') for prop_name in prop_names])
+
+        results = []
+        for cmd, reply in zip(cmds, replies):
+            try:
+                results.append(_format_dbus_value(reply[0]))
+            except ValueError:
+                results.append(self.wpanctl(cmd))
+
+        if self._verbose:
+            self._log_wpanctl_result('\n'.join(results))
+
+        return results
+
     def set(self, prop_name, value, binary_data=False):
         return self._update_prop('set', prop_name, value, binary_data)
 
@@ -418,9 +724,27 @@ class Node(object):
     def remove(self, prop_name, value, binary_data=False):
         return self._update_prop('remove', prop_name, value, binary_data)
 
+    _PROP_METHODS = {'set': 'PropSet', 'add': 'PropInsert', 'remove': 'PropRemove'}
+
     def _update_prop(self, action, prop_name, value, binary_data):
-        return self.wpanctl(action + ' ' + prop_name + ' ' + ('-d ' if binary_data else '')
-                            + '-v ' + value)  # use -v to handle values starting with `-`.
+        cmd = (action + ' ' + prop_name + ' ' + ('-d ' if binary_data else '')
+               + '-v ' + value)  # use -v to handle values starting with `-`.
+
+        if self._channel is None:
+            return self.wpanctl(cmd)
+
+        if binary_data:
+            try:
+                value = dbus.ByteArray(binascii.unhexlify(value))
+            except (TypeError, ValueError):
+                return self.wpanctl(cmd)
+
+        self._request([cmd], [(self._PROP_METHODS[action], [prop_name, value], 'sv')])
+
+        if self._verbose:
+            self._log_wpanctl_result('')
+
+        return ''
 
     def reset(self):
         return self.wpanctl('reset')
@@ -574,6 +898,40 @@ class Node(object):
     def joiner_attach(self):
         return self.wpanctl('joiner --attach')
 
+    _WAIT_FOR_POLL_INTERVAL = 1     # read interval (in seconds) of properties when change signals are available
+    _WAIT_FOR_DELAY = 0.1           # read interval (in seconds) of properties otherwise
+
+    def wait_for(self, prop_name, predicate, timeout, poll_interval=_WAIT_FOR_POLL_INTERVAL):
+        """Waits until `predicate(value)` returns True for the value of property `prop_name` (as returned by `get()`).
+           Wakes up as soon as wpantund signals a change of the property. As not all properties are signaled, the
+           property is also read again every `poll_interval` seconds.
+           Returns the value, or raises a `VerifyError` if `timeout` (in seconds) expires.
+        """
+        monitor = _get_prop_change_monitor() if self._channel is not None else None
+        start_time = time.time()
+        seq = monitor.seq if monitor is not None else 0
+        value = self.get(prop_name)
+
+        while not predicate(value):
+            remaining = start_time + timeout - time.time()
+            if remaining <= 0:
+                raise VerifyError('wait_for({}) on Node{} timed out ({} sec), last value: {}'.format(
+                    prop_name, self._index, timeout, value))
+
+            if monitor is None:
+                time.sleep(min(remaining, self._WAIT_FOR_DELAY))
+                value = self.get(prop_name)
+                continue
+
+            change = monitor.wait_prop_change(self._channel.path, prop_name, seq, min(remaining, poll_interval))
+            if change is not None and change[1] is not None:
+                seq, value = change
+            else:
+                seq = monitor.seq
+                value = self.get(prop_name)
+
+        return value
+
     # ------------------------------------------------------------------------------------------------------------------
     # Helper methods
 
@@ -586,13 +944,16 @@ class Node(object):
         if not node.is_associated():
             return "{} is not associated".format(node)
 
+        name, channel, panid, xpanid, key = node.get_props(
+            [WPAN_NAME, WPAN_CHANNEL, WPAN_PANID, WPAN_XPANID, WPAN_KEY])
+
         return self.join(
-            node.get(WPAN_NAME)[1:-1],
-            channel=node.get(WPAN_CHANNEL),
+            name[1:-1],
+            channel=channel,
             node_type=node_type,
-            panid=node.get(WPAN_PANID),
-            xpanid=node.get(WPAN_XPANID),
-            key=node.get(WPAN_KEY)[1:-1] if should_set_key else None)
+            panid=panid,
+            xpanid=xpanid,
+            key=key[1:-1] if should_set_key else None)
 
     def whitelist_node(self, node):
         """Adds a given node (of type `Node`) to the whitelist of `self` and enables whitelisting on `self`"""
@@ -611,12 +972,12 @@ class Node(object):
         """Checks if node is in the scan results
            `scan_result` must be an array of `ScanResult` object (see `parse_scan_result`).
         """
-        joinable = (self.get(WPAN_NETWORK_ALLOW_JOIN) == 'true')
-        panid = self.get(WPAN_PANID)
-        xpanid = self.get(WPAN_XPANID)[2:]
-        name = self.get(WPAN_NAME)[1:-1]
-        channel = self.get(WPAN_CHANNEL)
-        ext_address = self.get(WPAN_EXT_ADDRESS)[1:-1]
+        joinable, panid, xpanid, name, channel, ext_address = self.get_props(
+            [WPAN_NETWORK_ALLOW_JOIN, WPAN_PANID, WPAN_XPANID, WPAN_NAME, WPAN_CHANNEL, WPAN_EXT_ADDRESS])
+        joinable = (joinable == 'true')
+        xpanid = xpanid[2:]
+        name = name[1:-1]
+        ext_address = ext_address[1:-1]
 
         for item in scan_result:
             if all(
@@ -673,41 +1034,83 @@ class Node(object):
             cmd, shell=True, stderr=subprocess.STDOUT)
         return result
 
+    _INIT_RETRY_INTERVAL = 0.4      # interval (in seconds) between attempts to initialize the node
+
+    def _init(self, disable_logs, wait_time):
+        """Issues a `wpanctl.leave` (retrying until wpantund is ready or `wait_time` expires)"""
+        start_time = time.time()
+        while True:
+            try:
+                self._wpantund_process.poll()
+                if self._wpantund_process.returncode is not None:
+                    print('Node {} wpantund instance has terminated unexpectedly'.format(self))
+                if disable_logs:
+                    self.set(WPAN_OT_LOG_LEVEL, '0')
+                self.leave()
+            except subprocess.CalledProcessError as e:
+                if (self._verbose):
+                    _log(' -> \'{}\' exit code: {}'.format(e.output, e.returncode))
+                interval = time.time() - start_time
+                if interval > wait_time:
+                    print('Took too long to init node {} ({}>{} sec)'.format(self, interval, wait_time))
+                    raise
+            except BaseException:
+                raise
+            else:
+                break
+            time.sleep(self._INIT_RETRY_INTERVAL)
+        self._ready = True
+
+    @property
+    def ready(self):
+        """Indicates if the node was initialized by `init_all_nodes()`"""
+        return self._ready
+
     # ------------------------------------------------------------------------------------------------------------------
     # class methods
 
     @classmethod
     def init_all_nodes(cls, disable_logs=True, wait_time=15):
-        """Issues a `wpanctl.leave` on all `Node` objects and waits for them to be ready"""
+        """Issues a `wpanctl.leave` on all `Node` objects and waits for them to be ready.
+           All nodes are initialized in parallel.
+        """
         random.seed(123456)
-        time.sleep(0.5)
-        for node in Node._all_nodes:
-            start_time = time.time()
-            while True:
-                try:
-                    node._wpantund_process.poll()
-                    if node._wpantund_process.returncode is not None:
-                        print('Node {} wpantund instance has terminated unexpectedly'.format(node))
-                    if disable_logs:
-                        node.set(WPAN_OT_LOG_LEVEL, '0')
-                    node.leave()
-                except subprocess.CalledProcessError as e:
-                    if (node._verbose):
-                        _log(' -> \'{}\' exit code: {}'.format(e.output, e.returncode))
-                    interval = time.time() - start_time
-                    if interval > wait_time:
-                        print('Took too long to init node {} ({}>{} sec)'.format(node, interval, wait_time))
-                        raise
-                except BaseException:
-                    raise
-                else:
-                    break
-                time.sleep(0.4)
+        _run_in_parallel([lambda node=node: node._init(disable_logs, wait_time) for node in Node._all_nodes])
+
+    @classmethod
+    def join_all(cls, joins):
+        """Joins nodes in parallel. `joins` is a list of `(node, parent, node_type)` tuples, `node` joins the network
+           of `parent` (see `join_node()`) as `node_type`. A node joins as soon as its parent is associated, i.e., once
+           the parent's own join (if it is also in the list) finished. Returns the list of `join_node()` results.
+           Raises `Node._NodeError` if a parent is not associated or failed to join.
+        """
+        joined = dict((node, threading.Event()) for node, _, _ in joins)
+        failed = set()
+
+        def join(node, parent, node_type):
+            try:
+                if parent in joined:
+                    joined[parent].wait()
+                    if parent in failed:
+                        raise Node._NodeError('{} cannot join {}, it failed to join'.format(node, parent))
+                if not parent.is_associated():
+                    raise Node._NodeError('{} cannot join {}, it is not associated'.format(node, parent))
+                result = node.join_node(parent, node_type)
+            except BaseException:
+                failed.add(node)
+                raise
+            finally:
+                joined[node].set()
+            return result
+
+        return _run_in_parallel([lambda entry=entry: join(*entry) for entry in joins])
 
     @classmethod
     def finalize_all_nodes(cls):
         """Finalizes all previously created `Node` instances (stops the wpantund process)"""
         for node in Node._all_nodes:
+            if node._channel is not None:
+                node._channel.close()
             node._wpantund_process.terminate()
             node._wpantund_process.wait()
 
@@ -725,7 +1128,7 @@ class Node(object):
     class _NodeError(Exception):
         pass
 
-    def prepare_tx(self, src, dst, data=40, count=1, mcast_hops=None):
+    def prepare_tx(self, src, dst, data=40, count=1, mcast_hops=None, rate=None, burst=1, measured=False):
         """Prepares an IPv6 msg transmission.
 
         - `src` and `dst` can be either a string containing IPv6 address, or a tuple (ipv6 address as string, port),
@@ -734,6 +1137,11 @@ class Node(object):
            random message with the given length will be used).
         - `count` gives number of times the message will be sent (default is 1).
         - `mcast_hops` specifies multicast hop limit (only applicable for multicast tx).
+        - `rate` specifies the number of messages sent per second (default is as fast as possible).
+        - `burst` specifies the number of messages sent back to back each time (default is 1).
+        - `measured` if True, a sequence number and the send time are added at the start of each message so that the
+           receiver can measure per-message latency, reordering and loss (see `FlowStats`). If `data` is an int, the
+           message length still matches it (but is at least `MEASURED_HEADER_SIZE`).
 
         Returns an `AsyncSender` object.
 
@@ -753,6 +1161,8 @@ class Node(object):
             dst_port = random.randint(49152, 65535)
 
         if isinstance(data, int):
+            if measured:
+                data = max(data - MEASURED_HEADER_SIZE, 0)
             # create a random message with the given length.
             all_chars = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,><?;:[]=-+)(*&^%$#@'
             msg = ''.join(random.choice(all_chars) for _ in range(data))
@@ -767,7 +1177,10 @@ class Node(object):
             dst_port,
             msg,
             count,
-            mcast_hops)
+            mcast_hops,
+            rate,
+            burst,
+            measured)
 
     def _get_receiver(self, local_port):
         # Gets or creates a receiver (an `AsyncReceiver`) tied to given port
@@ -793,7 +1206,8 @@ class Node(object):
             sender.src_addr,
             sender.src_port,
             sender.msg,
-            sender.count)
+            sender.count,
+            sender)
         return receiver
 
     def prepare_listener(self, local_port, timeout=1):
@@ -807,15 +1221,12 @@ class Node(object):
         """Called to perform all previously prepared async rx/listen and tx operations"""
         try:
             start_time = time.time()
-            while asyncore.socket_map:
+            if not _run_traffic_loop(timeout):
                 elapsed_time = time.time() - start_time
-                if elapsed_time > timeout:
-                    print('Performing aysnc tx/tx took too long ({}>{} sec)'.format(elapsed_time, timeout))
-                    raise Node._NodeError(
-                        'perform_tx_rx timed out ({}>{} sec)'.format(
-                            elapsed_time, timeout))
-                # perform a single asyncore loop
-                asyncore.loop(timeout=0.5, count=1)
+                print('Performing aysnc tx/tx took too long ({}>{} sec)'.format(elapsed_time, timeout))
+                raise Node._NodeError(
+                    'perform_tx_rx timed out ({}>{} sec)'.format(
+                        elapsed_time, timeout))
         except BaseException:
             print('Failed to perform async rx/tx')
             raise
@@ -826,6 +1237,22 @@ class Node(object):
 
 _SO_BINDTODEVICE = 25
 
+# map from socket file descriptor to `AsyncSender`/`AsyncReceiver` objects with a pending tx/rx operation
+_socket_map = {}
+
+# maximum time (in seconds) waiting for socket events in a single `_run_traffic_loop()` iteration
+_MAX_LOOP_WAIT = 0.5
+
+# time (in seconds) a sender waits before retrying a send that failed with ENOBUFS (the socket stays writable)
+_ENOBUFS_BACKOFF = 0.005
+
+# Header added at the start of messages sent in measured mode: magic, flow id, sequence number, send time
+_MEASURED_MAGIC = b'TJMF'
+_MEASURED_HEADER = struct.Struct('!4sHId')
+MEASURED_HEADER_SIZE = _MEASURED_HEADER.size
+
+_flow_ids = itertools.count(1)
+
 
 def _is_ipv6_addr_link_local(ip_addr):
     """Indicates if a given IPv6 address is link-local"""
@@ -839,7 +1266,86 @@ def _create_socket_address(ip_address, port):
     return socket.getaddrinfo(ip_address, port)[0][4]
 
 
-class AsyncSender(asyncore.dispatcher):
+def _create_socket(node):
+    """Creates a non-blocking UDP6 socket bound to the node's interface"""
+    sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
+    sock.setsockopt(
+        socket.SOL_SOCKET,
+        _SO_BINDTODEVICE,
+        (node.interface_name + '\0').encode())
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.setblocking(False)
+    return sock
+
+
+def _run_traffic_loop(timeout):
+    """Runs all pending tx/rx operations in `_socket_map` until they are all finished or `timeout` (sec) expires.
+       Returns False if the operations did not finish in time.
+    """
+    start_time = time.time()
+    while _socket_map:
+        now = time.time()
+        if now - start_time > timeout:
+            return False
+
+        wait_time = min(start_time + timeout - now, _MAX_LOOP_WAIT)
+        readers = []
+        writers = []
+        for endpoint in list(_socket_map.values()):
+            if endpoint._readable(now):
+                readers.append(endpoint)
+            if endpoint._writable(now):
+                writers.append(endpoint)
+            deadline = endpoint._next_deadline(now)
+            if deadline is not None:
+                wait_time = min(wait_time, max(deadline - now, 0))
+
+        if not readers and not writers:
+            time.sleep(wait_time)
+            continue
+
+        try:
+            readable, writable, _ = select.select(readers, writers, [], wait_time)
+        except select.error as e:
+            if e.args[0] == errno.EINTR:
+                continue
+            raise
+
+        for endpoint in readable:
+            endpoint._handle_read()
+        for endpoint in writable:
+            if endpoint.fileno() in _socket_map:
+                endpoint._handle_write()
+    return True
+
+
+class _AsyncEndpoint(object):
+    """ Base class of `AsyncSender` and `AsyncReceiver`, an UDP6 socket registered in `_socket_map`"""
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._fd = sock.fileno()
+        _socket_map[self._fd] = self
+
+    def fileno(self):
+        return self._fd
+
+    def _readable(self, now):
+        return False
+
+    def _writable(self, now):
+        return False
+
+    def _next_deadline(self, now):
+        """Returns the time at which the endpoint has to be checked again without any socket event (or None)"""
+        return None
+
+    def close(self):
+        _socket_map.pop(self._fd, None)
+        self._sock.close()
+
+
+class AsyncSender(_AsyncEndpoint):
     """ An IPv6 async message sender - use `Node.prepare_tx()` to create one"""
 
     def __init__(
@@ -851,7 +1357,10 @@ class AsyncSender(asyncore.dispatcher):
             dst_port,
             msg,
             count,
-            mcast_hops=None):
+            mcast_hops=None,
+            rate=None,
+            burst=1,
+            measured=False):
         self._node = node
         self._src_addr = src_addr
         self._src_port = src_port
@@ -859,17 +1368,19 @@ class AsyncSender(asyncore.dispatcher):
         self._dst_port = dst_port
         self._msg = msg
         self._count = count
+        self._rate = rate
+        self._burst = burst
+        self._measured = measured
+        self._flow_id = next(_flow_ids) & 0xffff
         self._dst_sock_addr = _create_socket_address(dst_addr, dst_port)
-        self._tx_buffer = self._msg
         self._tx_counter = 0
+        self._tx_bytes = 0
+        self._start_time = None
+        self._end_time = None
+        self._next_tx_time = 0
 
         # Create a socket, bind it to the node's interface
-        sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
-        sock.setsockopt(
-            socket.SOL_SOCKET,
-            _SO_BINDTODEVICE,
-            node.interface_name + '\0')
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock = _create_socket(node)
 
         # Set the IPV6_MULTICAST_HOPS
         if mcast_hops is not None:
@@ -888,7 +1399,7 @@ class AsyncSender(asyncore.dispatcher):
             src_sock_addr = _create_socket_address(src_addr, src_port)
         sock.bind(src_sock_addr)
 
-        asyncore.dispatcher.__init__(self, sock)
+        _AsyncEndpoint.__init__(self, sock)
 
     # Property getters
 
@@ -920,77 +1431,292 @@ class AsyncSender(asyncore.dispatcher):
     def count(self):
         return self._count
 
+    @property
+    def measured(self):
+        return self._measured
+
+    @property
+    def flow_id(self):
+        """Identifies the messages of this sender in measured mode"""
+        return self._flow_id
+
+    @property
+    def tx_count(self):
+        """Number of messages sent so far"""
+        return self._tx_counter
+
+    @property
+    def start_time(self):
+        """Time the first message was sent (or None)"""
+        return self._start_time
+
+    @property
+    def end_time(self):
+        """Time the last message was sent (or None)"""
+        return self._end_time
+
+    @property
+    def tx_rate(self):
+        """Achieved transmit rate in bytes/sec (or None if less than two messages were sent)"""
+        if self._tx_counter < 2 or self._end_time == self._start_time:
+            return None
+        return self._tx_bytes / (self._end_time - self._start_time)
+
     @property
     def was_successful(self):
         """Indicates if the transmission of IPv6 messages finished successfully"""
         return self._tx_counter == self._count
 
-    # asyncore.dispatcher callbacks
+    # `_run_traffic_loop()` callbacks
 
-    def readable(self):
-        return False
+    def _writable(self, now):
+        return now >= self._next_tx_time
 
-    def writable(self):
-        return True
+    def _next_deadline(self, now):
+        return self._next_tx_time if self._next_tx_time > now else None
 
-    def handle_write(self):
-        sent_len = self.sendto(self._tx_buffer, self._dst_sock_addr)
+    def _handle_write(self):
+        now = time.time()
+        if self._start_time is None:
+            self._start_time = now
+            self._next_tx_time = now
 
-        if self._node._verbose:
-            if sent_len < 30:
-                info_text = '{} bytes ("{}")'.format(
-                    sent_len, self._tx_buffer[:sent_len])
+        for _ in range(self._burst):
+            if self._measured:
+                msg = _MEASURED_HEADER.pack(_MEASURED_MAGIC, self._flow_id, self._tx_counter, time.time()) + self._msg
             else:
-                info_text = '{} bytes'.format(sent_len)
-            _log(
-                '- Node{} sent {} to [{}]:{} from [{}]:{}'.format(
-                    self._node._index,
-                    info_text,
-                    self._dst_addr,
-                    self._dst_port,
-                    self._src_addr,
-                    self._src_port))
+                msg = self._msg
+            try:
+                sent_len = self._sock.sendto(msg, self._dst_sock_addr)
+            except socket.error as e:
+                if e.errno == errno.ENOBUFS:
+                    self._next_tx_time = time.time() + _ENOBUFS_BACKOFF
+                    return
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return  # try again when the socket is writable
+                raise
 
-        self._tx_buffer = self._tx_buffer[sent_len:]
+            if self._node._verbose:
+                if sent_len < 30:
+                    info_text = '{} bytes ("{}")'.format(
+                        sent_len, msg[:sent_len])
+                else:
+                    info_text = '{} bytes'.format(sent_len)
+                _log(
+                    '- Node{} sent {} to [{}]:{} from [{}]:{}'.format(
+                        self._node._index,
+                        info_text,
+                        self._dst_addr,
+                        self._dst_port,
+                        self._src_addr,
+                        self._src_port))
 
-        if len(self._tx_buffer) == 0:
             self._tx_counter += 1
-            if self._tx_counter < self._count:
-                self._tx_buffer = self._msg
-            else:
-                self.handle_close()
+            self._tx_bytes += sent_len
+            self._end_time = time.time()
+            if self._tx_counter >= self._count:
+                self.close()
+                return
 
-    def handle_close(self):
-        self.close()
+        if self._rate is not None:
+            self._next_tx_time = max(self._next_tx_time + float(self._burst) / self._rate, now)
 
 # - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - - -
 
 
-class AsyncReceiver(asyncore.dispatcher):
-    """ An IPv6 async message receiver - use `prepare_rx()` to create one"""
+def _percentile(sorted_values, percent):
+    """Returns the `percent` percentile (nearest rank) of a sorted list, or None if the list is empty"""
+    if not sorted_values:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values))) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
 
-    _MAX_RECV_SIZE = 2048
 
-    class _SenderInfo(object):
-        def __init__(self, sender_addr, sender_port, msg, count):
-            self._sender_addr = sender_addr
-            self._sender_port = sender_port
-            self._msg = msg
-            self._count = count
-            self._rx_counter = 0
+class FlowStats(object):
+    """ Statistics of the messages received from one sender (a flow) - see `AsyncReceiver.get_flow_stats()`.
+
+    Latency, reordering and duplicates are only measured if the sender was prepared with `measured=True`.
+    """
+
+    def __init__(self, sender_addr, sender_port, msg, count, sender=None):
+        self._sender_addr = sender_addr
+        self._sender_port = sender_port
+        self._msg = msg
+        self._count = count
+        self._sender = sender
+        self._flow_id = sender.flow_id if sender is not None and sender.measured else None
+        self._rx_counter = 0
+        self._rx_bytes = 0
+        self._first_rx_time = None
+        self._last_rx_time = None
+        # measured mode
+        self._rx_seqs = set()
+        self._max_seq = None
+        self._reordered = 0
+        self._duplicates = 0
+        self._latencies = []
+        self._sorted_latencies = None
+
+    def _add_rx(self, msg_len, rx_time):
+        if self._first_rx_time is None:
+            self._first_rx_time = rx_time
+        self._last_rx_time = rx_time
+        self._rx_counter += 1
+        self._rx_bytes += msg_len
+
+    def _matches(self, msg):
+        """Checks if a received message belongs to this flow. Returns the measured header fields `(seq, tx_time)`,
+           an empty tuple for a matching message when not measured, or None if the message does not match.
+        """
+        if self._flow_id is None:
+            return () if msg == self._msg else None
+        if len(msg) < MEASURED_HEADER_SIZE:
+            return None
+        magic, flow_id, seq, tx_time = _MEASURED_HEADER.unpack_from(msg)
+        if magic != _MEASURED_MAGIC or flow_id != self._flow_id or msg[MEASURED_HEADER_SIZE:] != self._msg:
+            return None
+        return (seq, tx_time)
+
+    def _add_measured_rx(self, seq, tx_time, msg_len, rx_time):
+        """Records a message received in measured mode, returns False if it is a duplicate"""
+        if seq in self._rx_seqs:
+            self._duplicates += 1
+            return False
+        self._rx_seqs.add(seq)
+        if self._max_seq is not None and seq < self._max_seq:
+            self._reordered += 1
+        else:
+            self._max_seq = seq
+        self._latencies.append(rx_time - tx_time)
+        self._sorted_latencies = None
+        self._add_rx(msg_len, rx_time)
+        return True
+
+    def _did_recv_all(self):
+        return self._rx_counter >= self._count
+
+    @property
+    def sender_addr(self):
+        return self._sender_addr
+
+    @property
+    def sender_port(self):
+        return self._sender_port
+
+    @property
+    def expected(self):
+        """Number of messages expected from the sender"""
+        return self._count
+
+    @property
+    def received(self):
+        return self._rx_counter
+
+    @property
+    def lost(self):
+        return max(self._count - self._rx_counter, 0)
+
+    @property
+    def loss_rate(self):
+        return float(self.lost) / self._count if self._count else 0.0
+
+    @property
+    def rx_bytes(self):
+        return self._rx_bytes
+
+    @property
+    def duration(self):
+        """Time from the first message sent (or received if the sender is unknown) to the last one received"""
+        if self._last_rx_time is None:
+            return None
+        start_time = self._first_rx_time
+        if self._sender is not None and self._sender.start_time is not None:
+            start_time = self._sender.start_time
+        return self._last_rx_time - start_time
+
+    @property
+    def throughput(self):
+        """Received bytes/sec over `duration` (or None if it cannot be determined)"""
+        duration = self.duration
+        if not duration:
+            return None
+        return self._rx_bytes / duration
+
+    @property
+    def goodput(self):
+        """Received payload bytes/sec over `duration`, excluding the measured mode header and duplicates"""
+        duration = self.duration
+        if not duration:
+            return None
+        header_bytes = self._rx_counter * MEASURED_HEADER_SIZE if self._flow_id is not None else 0
+        return (self._rx_bytes - header_bytes) / duration
+
+    @property
+    def measured(self):
+        return self._flow_id is not None
+
+    @property
+    def reordered(self):
+        """Number of messages received after a message with a higher sequence number (measured mode)"""
+        return self._reordered
+
+    @property
+    def duplicates(self):
+        """Number of duplicate messages received (measured mode)"""
+        return self._duplicates
+
+    @property
+    def latencies(self):
+        """One-way latency (in seconds) of each received message, in order of reception (measured mode)"""
+        return list(self._latencies)
+
+    def latency_percentile(self, percent):
+        """Returns the `percent` percentile of the one-way latency in seconds (or None if nothing was received)"""
+        if self._sorted_latencies is None:
+            self._sorted_latencies = sorted(self._latencies)
+        return _percentile(self._sorted_latencies, percent)
+
+    @property
+    def latency_min(self):
+        return self.latency_percentile(0)
+
+    @property
+    def latency_median(self):
+        return self.latency_percentile(50)
+
+    @property
+    def latency_max(self):
+        return self.latency_percentile(100)
+
+    @property
+    def latency_avg(self):
+        if not self._latencies:
+            return None
+        return sum(self._latencies) / len(self._latencies)
+
+    def __repr__(self):
+        text = 'FlowStats(from [{}]:{}, received {}/{}, lost {}, duration {}, throughput {}'.format(
+            self._sender_addr, self._sender_port, self._rx_counter, self._count, self.lost, self.duration,
+            self.throughput)
+        if self.measured:
+            text += ', reordered {}, duplicates {}, latency min/avg/p50/p90/p99/max {}/{}/{}/{}/{}/{}'.format(
+                self._reordered, self._duplicates, self.latency_min, self.latency_avg, self.latency_median,
+                self.latency_percentile(90), self.latency_percentile(99), self.latency_max)
+        return text + ')'
 
-        def _check_received(self, msg, sender_addr, sender_port):
-            if self._msg == msg and self._sender_addr == sender_addr and self._sender_port == sender_port:
-                self._rx_counter += 1
-            return self._did_recv_all()
 
-        def _did_recv_all(self):
-            return self._rx_counter >= self._count
+class AsyncReceiver(_AsyncEndpoint):
+    """ An IPv6 async message receiver - use `prepare_rx()` to create one"""
+
+    _MAX_RECV_SIZE = 2048
 
     def __init__(self, node, local_port):
         self._node = node
         self._local_port = local_port
-        self._senders = []        # list of `_SenderInfo` objects
+        # map from (sender address, sender port) to list of `FlowStats` objects (one per sender)
+        self._flows = {}
+        self._all_flows = []
+        self._num_pending_flows = 0
         # contains all received messages as a list of (pkt, (src_addr,
         # src_port))
         self._all_rx = []
@@ -999,23 +1725,21 @@ class AsyncReceiver(asyncore.dispatcher):
         self._start_time = 0
 
         # Create a socket, bind it to the node's interface
-        sock = socket.socket(socket.AF_INET6, socket.SOCK_DGRAM)
-        sock.setsockopt(
-            socket.SOL_SOCKET,
-            _SO_BINDTODEVICE,
-            node.interface_name + '\0')
-        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock = _create_socket(node)
 
         # Bind the socket to any IPv6 address with the given local port
         local_sock_addr = _create_socket_address('::', local_port)
         sock.bind(local_sock_addr)
 
-        asyncore.dispatcher.__init__(self, sock)
+        _AsyncEndpoint.__init__(self, sock)
 
-    def _add_sender(self, sender_addr, sender_port, msg, count):
-        self._senders.append(
-            AsyncReceiver._SenderInfo(
-                sender_addr, sender_port, msg, count))
+    def _add_sender(self, sender_addr, sender_port, msg, count, sender=None):
+        flow = FlowStats(sender_addr, sender_port, msg, count, sender)
+        self._flows.setdefault((sender_addr, sender_port), []).append(flow)
+        self._all_flows.append(flow)
+        if not flow._did_recv_all():
+            self._num_pending_flows += 1
+        return flow
 
     def _set_listen_timeout(self, timeout):
         self._timeout = timeout
@@ -1038,28 +1762,51 @@ class AsyncReceiver(asyncore.dispatcher):
     @property
     def was_successful(self):
         """Indicates if all expected IPv6 messages were received successfully"""
-        return len(self._senders) == 0 or all(
-            [sender._did_recv_all() for sender in self._senders])
+        return self._num_pending_flows == 0
+
+    @property
+    def flow_stats(self):
+        """Returns a list of `FlowStats`, one per sender, in the order of `prepare_rx()` calls"""
+        return list(self._all_flows)
+
+    def get_flow_stats(self, sender):
+        """Returns the `FlowStats` of the messages received from a given `AsyncSender`"""
+        for flow in self._flows.get((sender.src_addr, sender.src_port), []):
+            if flow._sender is sender:
+                return flow
+        return None
 
-    # asyncore.dispatcher callbacks
+    # `_run_traffic_loop()` callbacks
 
-    def readable(self):
+    def _readable(self, now):
         if not self._started:
-            self._start_time = time.time()
+            self._start_time = now
             self._started = True
-        if self._timeout != 0 and time.time() - self._start_time >= self._timeout:
-            self.handle_close()
+        if self._timeout != 0 and now - self._start_time >= self._timeout:
+            self.close()
             if self._node._verbose:
                 _log('- Node{} finished listening on port {} for {} sec, received {} msg(s)'.format(
                     self._node._index, self._local_port, self._timeout, len(self._all_rx)))
             return False
         return True
 
-    def writable(self):
-        return False
-
-    def handle_read(self):
-        (msg, src_sock_addr) = self.recvfrom(AsyncReceiver._MAX_RECV_SIZE)
+    def _next_deadline(self, now):
+        if self._timeout != 0 and self._started:
+            return self._start_time + self._timeout
+        return None
+
+    def _handle_read(self):
+        # Read all queued messages
+        while self.fileno() in _socket_map:
+            try:
+                (msg, src_sock_addr) = self._sock.recvfrom(AsyncReceiver._MAX_RECV_SIZE)
+            except socket.error as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    return
+                raise
+            self._handle_msg(msg, src_sock_addr, time.time())
+
+    def _handle_msg(self, msg, src_sock_addr, rx_time):
         src_addr = src_sock_addr[0]
         src_port = src_sock_addr[1]
 
@@ -1083,12 +1830,24 @@ class AsyncReceiver(asyncore.dispatcher):
 
         self._all_rx.append((msg, (src_addr, src_port)))
 
-        if all([sender._check_received(msg, src_addr, src_port)
-                for sender in self._senders]):
-            self.handle_close()
+        for flow in self._flows.get((src_addr, src_port), []):
+            header = flow._matches(msg)
+            if header is None:
+                continue
+            if header:
+                if not flow._add_measured_rx(header[0], header[1], len(msg), rx_time):
+                    continue
+            else:
+                flow._add_rx(len(msg), rx_time)
+            if flow._rx_counter == flow._count:
+                self._num_pending_flows -= 1
+
+        # A listener without senders closes on its first message
+        if self._num_pending_flows == 0:
+            self.close()
 
-    def handle_close(self):
-        self.close()
+    def close(self):
+        _AsyncEndpoint.close(self)
         # remove the receiver from the node once the socket is closed
         self._node._remove_recver(self)
 
@@ -1101,6 +1860,10 @@ class VerifyError(Exception):
 
 _is_in_verify_within = False
 
+# Minimum interval between two attempts of `verify_within()` as a fraction of its `delay_time`, so that a burst of
+# property change signals does not rerun the condition checker back to back.
+_VERIFY_WITHIN_MIN_INTERVAL_RATIO = 0.25
+
 
 def verify(condition):
     """Verifies that a `condition` is true, otherwise raises a VerifyError"""
@@ -1117,13 +1880,18 @@ def verify(condition):
 def verify_within(condition_checker_func, wait_time, delay_time=0.1):
     """Verifies that a given function `condition_checker_func` passes successfully within a given wait timeout.
        `wait_time` is maximum time waiting for condition_checker to pass (in seconds).
-       `delay_time` specifies a delay interval added between failed attempts (in seconds).
+       `delay_time` specifies a delay interval added between failed attempts (in seconds). If wpantund property
+       change signals are available, the next attempt starts as soon as a property of a node changes, but not
+       earlier than a quarter of `delay_time` after the previous attempt.
     """
     global _is_in_verify_within
     start_time = time.time()
     old_is_in_verify_within = _is_in_verify_within
     _is_in_verify_within = True
+    monitor = _get_prop_change_monitor()
     while True:
+        seq = monitor.seq if monitor is not None else 0
+        attempt_time = time.time()
         try:
             condition_checker_func()
         except VerifyError as e:
@@ -1136,7 +1904,13 @@ def verify_within(condition_checker_func, wait_time, delay_time=0.1):
         else:
             break
         if delay_time != 0:
-            time.sleep(delay_time)
+            if monitor is not None:
+                monitor.wait_any_change(seq, delay_time)
+                min_gap = attempt_time + delay_time * _VERIFY_WITHIN_MIN_INTERVAL_RATIO - time.time()
+                if min_gap > 0:
+                    time.sleep(min_gap)
+            else:
+                time.sleep(delay_time)
     _is_in_verify_within = old_is_in_verify_within
 
 # -----------------------------------------------------------------------------------------------------------------------